@@ -1,6 +1,7 @@
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.utils import timezone
+from accounts.device_key_cache import device_key_cache, last_used_tracker
 from accounts.models import DeviceAPIKey
 
 
@@ -17,17 +18,20 @@ class DeviceAPIKeyAuthentication(BaseAuthentication):
         if not api_key:
             return None  # Let other auth methods handle it
         
-        try:
-            device_key = DeviceAPIKey.objects.select_related('device', 'device__user').get(
-                key=api_key,
-                is_active=True
-            )
-        except DeviceAPIKey.DoesNotExist:
-            raise AuthenticationFailed('Invalid or inactive API key')
+        device_key = device_key_cache.get(api_key)
+        if device_key is None:
+            try:
+                device_key = DeviceAPIKey.objects.select_related('device', 'device__user').get(
+                    key=api_key,
+                    is_active=True,
+                    device__user__is_active=True
+                )
+            except DeviceAPIKey.DoesNotExist:
+                raise AuthenticationFailed('Invalid or inactive API key')
+            device_key_cache.set(api_key, device_key, device_key_cache.version(device_key.device_id))
         
-        # Update last_used timestamp
-        device_key.last_used = timezone.now()
-        device_key.save(update_fields=['last_used'])
+        # Record last_used; written to the database in bulk every flush window
+        last_used_tracker.touch(device_key.pk, timezone.now())
         
         # Return (user, auth) tuple
         # We return the device's owner as the authenticated user
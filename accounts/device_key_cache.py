@@ -0,0 +1,151 @@
+"""
+In-process cache for device API key authentication
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, DateTimeField, Value, When
+from core.periodic import FlushTimer
+import logging
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'device-api-key:version:{}'
+
+
+class DeviceKeyCache:
+    """
+    LRU cache of active DeviceAPIKey rows (with device and user loaded).
+    
+    Entries expire after ``ttl`` seconds. Each entry also remembers the
+    device's version stamp in the shared Django cache; saving or deleting
+    a key, its device or its owner replaces the stamp (see
+    accounts.signals), so every process drops its entry on the next
+    ``get`` rather than when the TTL runs out.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, DeviceAPIKey, version)
+        self._keys_by_device: Dict[int, str] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: str):
+        """Cached DeviceAPIKey for ``key``, or None on miss/expiry/invalidation"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, device_key, version = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        
+        if self.version(device_key.device_id) != version:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._remove(key)
+            return None
+        return device_key
+    
+    def set(self, key: str, device_key, version=None):
+        """Cache ``device_key``; ``version`` is the device's stamp when it was loaded"""
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, device_key, version)
+            self._keys_by_device[device_key.device_id] = key
+            
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+    
+    @staticmethod
+    def version(device_pk: int):
+        return cache.get(VERSION_KEY.format(device_pk))
+    
+    def invalidate_device(self, device_pk: int):
+        """Drop the cached key of a device (old key included after regenerate) in every process"""
+        cache.set(VERSION_KEY.format(device_pk), uuid.uuid4().hex, None)
+        with self._lock:
+            key = self._keys_by_device.get(device_pk)
+            if key is not None:
+                self._remove(key)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_device.clear()
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            device_pk = entry[1].device_id
+            if self._keys_by_device.get(device_pk) == key:
+                del self._keys_by_device[device_pk]
+
+
+class LastUsedTracker:
+    """
+    Coalesce DeviceAPIKey.last_used writes.
+    
+    Authentications only record a timestamp in memory; pending timestamps
+    are written with a single UPDATE every ``flush_interval`` seconds by a
+    background timer (see core.periodic), when a Celery pool process shuts
+    down and on interpreter exit.
+    """
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, object] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.timer = FlushTimer(self.flush, flush_interval, 'device-key-last-used')
+    
+    def touch(self, device_key_pk: int, when):
+        self.timer.ensure_started()
+        with self._lock:
+            self._pending[device_key_pk] = when
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write pending timestamps; returns the number of keys updated"""
+        from .models import DeviceAPIKey
+        
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        
+        if not pending:
+            return 0
+        
+        try:
+            DeviceAPIKey.objects.filter(pk__in=pending).update(
+                last_used=Case(
+                    *(When(pk=pk, then=Value(when)) for pk, when in pending.items()),
+                    output_field=DateTimeField()
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to flush last_used for {len(pending)} device API keys: {e}")
+            return 0
+        
+        return len(pending)
+
+
+device_key_cache = DeviceKeyCache(
+    max_size=getattr(settings, 'DEVICE_API_KEY_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'DEVICE_API_KEY_CACHE_TTL', 60),
+)
+last_used_tracker = LastUsedTracker(
+    flush_interval=getattr(settings, 'DEVICE_API_KEY_LAST_USED_FLUSH_INTERVAL', 60),
+)
@@ -37,6 +37,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'username', 'date_joined', 'device_count')
     
     def get_device_count(self, obj):
+        # Annotated by UserProfileView; other callers count directly
+        if hasattr(obj, 'num_devices'):
+            return obj.num_devices
         return obj.devices.count()
 
 
@@ -57,13 +60,14 @@ class UserDeviceSerializer(serializers.ModelSerializer):
         }
     
     def get_latest_reading(self, obj):
-        latest = obj.readings.first()
-        if latest:
-            return {
-                'data': latest.data,
-                'timestamp': latest.timestamp
-            }
-        return None
+        # Device viewsets annotate the current-state snapshot in the list
+        # query; a single device falls back to one indexed lookup
+        if hasattr(obj, 'current_reading'):
+            return obj.current_reading
+        from observations.models import CurrentState
+        return CurrentState.objects.filter(
+            source='device', station=obj.device_id
+        ).values_list('snapshot', flat=True).first()
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
@@ -89,3 +93,15 @@ class DeviceDataCreateSerializer(serializers.ModelSerializer):
         if value.user != self.context['request'].user:
             raise serializers.ValidationError("You don't have permission to add data to this device.")
         return value
+
+
+class DeviceReadingBatchItemSerializer(serializers.Serializer):
+    """One reading of a batch upload; the device is resolved by the view"""
+    device_id = serializers.CharField(required=False)
+    data = serializers.JSONField()
+    recorded_at = serializers.DateTimeField()
+    
+    def validate_data(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Reading data must be a JSON object.")
+        return value
@@ -0,0 +1,28 @@
+"""
+Signal handlers for the accounts app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .device_key_cache import device_key_cache
+from .models import CustomUser, DeviceAPIKey, UserDevice
+
+
+@receiver([post_save, post_delete], sender=DeviceAPIKey)
+def invalidate_device_api_key(sender, instance, **kwargs):
+    """Evict a key that was regenerated, deactivated or deleted"""
+    device_key_cache.invalidate_device(instance.device_id)
+
+
+@receiver([post_save, post_delete], sender=UserDevice)
+def invalidate_device(sender, instance, **kwargs):
+    """Evict the key of a device whose details changed"""
+    device_key_cache.invalidate_device(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user_devices(sender, instance, update_fields=None, **kwargs):
+    """Evict the keys of a user's devices when the account may have been deactivated"""
+    if update_fields is not None and 'is_active' not in update_fields:
+        return  # e.g. last_login on every login
+    for device_pk in UserDevice.objects.filter(user_id=instance.pk).values_list('pk', flat=True):
+        device_key_cache.invalidate_device(device_pk)
@@ -0,0 +1,253 @@
+import json
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .authentication import DeviceAPIKeyAuthentication
+from .device_key_cache import DeviceKeyCache, device_key_cache
+from .models import CustomUser, DeviceAPIKey, UserDevice, DeviceData
+
+
+class QueryCountTests(TestCase):
+    """Device and profile endpoints must not issue queries per device or reading"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='owner', email='owner@example.com', password='secret123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def add_devices(self, count, readings_per_device=3):
+        start = UserDevice.objects.count()
+        for index in range(start, start + count):
+            device = UserDevice.objects.create(
+                user=self.user,
+                name=f'Device {index}',
+                device_type='weather_station',
+                device_id=f'QC-{index}',
+                latitude=21.0 + index / 100,
+                longitude=105.8,
+                is_public=True,
+            )
+            for value in range(readings_per_device):
+                DeviceData.objects.create(device=device, data={'temperature': value})
+    
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def assert_constant_queries(self, url, max_queries):
+        self.add_devices(1)
+        small, _ = self.count_queries(url)
+        self.add_devices(15, readings_per_device=10)
+        large, response = self.count_queries(url)
+        
+        self.assertEqual(small, large, f'{url} query count grows with data ({small} -> {large})')
+        self.assertLessEqual(large, max_queries)
+        return response
+    
+    def test_device_list(self):
+        response = self.assert_constant_queries('/api/v1/auth/devices/', max_queries=2)
+        
+        devices = response.json()['results']
+        self.assertTrue(all(device['latest_reading'] for device in devices))
+        self.assertEqual(devices[0]['latest_reading']['data'], {'temperature': 9})
+    
+    def test_public_device_list(self):
+        self.assert_constant_queries('/api/v1/auth/public-devices/', max_queries=2)
+    
+    def test_public_action(self):
+        self.assert_constant_queries('/api/v1/auth/devices/public/', max_queries=1)
+    
+    def test_profile(self):
+        response = self.assert_constant_queries('/api/v1/auth/profile/', max_queries=1)
+        self.assertEqual(response.json()['device_count'], 16)
+    
+    def test_device_detail_latest_reading(self):
+        self.add_devices(1)
+        device = UserDevice.objects.get()
+        DeviceData.objects.create(device=device, data={'temperature': 42})
+        
+        queries, response = self.count_queries(f'/api/v1/auth/devices/{device.pk}/')
+        self.assertEqual(queries, 1)
+        self.assertEqual(response.json()['latest_reading']['data'], {'temperature': 42})
+
+
+class DeviceKeyCacheTests(TestCase):
+    """Cached device keys are dropped in every process when they change"""
+    
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = CustomUser.objects.create_user(username='sensor-owner', password='secret123')
+        self.device = UserDevice.objects.create(
+            user=self.user, name='Sensor', device_type='weather_station', device_id='KEY-1',
+            latitude=21.0, longitude=105.8,
+        )
+        self.device_key = DeviceAPIKey.objects.create(device=self.device)
+    
+    def authenticate(self, key=None):
+        request = APIRequestFactory().get('/', HTTP_X_DEVICE_API_KEY=key or self.device_key.key)
+        return DeviceAPIKeyAuthentication().authenticate(request)
+    
+    def test_hit_skips_the_database(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate()
+        self.assertEqual(user, self.user)
+    
+    def test_change_evicts_entries_of_other_processes(self):
+        other = DeviceKeyCache(max_size=10, ttl=60)
+        other.set(self.device_key.key, self.device_key, other.version(self.device.pk))
+        self.assertIsNotNone(other.get(self.device_key.key))
+        
+        self.device_key.is_active = False
+        self.device_key.save()
+        
+        self.assertIsNone(other.get(self.device_key.key))
+    
+    def test_regenerated_key_is_rejected(self):
+        old_key = self.device_key.key
+        self.authenticate()
+        
+        self.device_key.regenerate()
+        
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(old_key)
+        self.authenticate(self.device_key.key)
+    
+    def test_deactivated_owner_is_rejected(self):
+        self.authenticate()
+        
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class BatchReadingsTests(TestCase):
+    """Bulk reading uploads to /auth/devices/readings/batch/"""
+    
+    url = '/api/v1/auth/devices/readings/batch/'
+    
+    def setUp(self):
+        device_key_cache.clear()
+        self.user = CustomUser.objects.create_user(username='batch-owner', password='secret123')
+        self.devices = [
+            UserDevice.objects.create(
+                user=self.user, name=f'Station {index}', device_type='weather_station',
+                device_id=f'BATCH-{index}', latitude=21.0, longitude=105.8,
+            )
+            for index in range(2)
+        ]
+        other = CustomUser.objects.create_user(username='someone-else', password='secret123')
+        self.foreign = UserDevice.objects.create(
+            user=other, name='Not mine', device_type='weather_station',
+            device_id='FOREIGN-1', latitude=21.0, longitude=105.8,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def reading(self, device_id, temperature=25.0, **fields):
+        return dict({'device_id': device_id, 'data': {'temperature': temperature},
+                     'recorded_at': '2026-10-17T10:00:00Z'}, **fields)
+    
+    def test_all_valid_readings_are_created(self):
+        readings = [self.reading('BATCH-0'), self.reading('BATCH-1'), self.reading('BATCH-0', 26.0)]
+        
+        response = self.client.post(self.url, readings, format='json')
+        
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (3, 0))
+        self.assertEqual(
+            [(result['index'], result['device_id']) for result in body['results']],
+            [(0, 'BATCH-0'), (1, 'BATCH-1'), (2, 'BATCH-0')]
+        )
+        self.assertEqual(DeviceData.objects.filter(device=self.devices[0]).count(), 2)
+        self.assertTrue(all(device.last_seen for device in UserDevice.objects.filter(user=self.user)))
+    
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps(self.reading(f'BATCH-{index}')) for index in range(2)) + '\n\n'
+        
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(DeviceData.objects.count(), 2)
+        
+        response = self.client.post(self.url, '{"device_id": "BATCH-0"}\nnot json\n',
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.json()['detail'])
+    
+    def test_mixed_batch_reports_each_item(self):
+        readings = [
+            self.reading('BATCH-0'),
+            {'device_id': 'BATCH-0', 'data': {'temperature': 20.0}},
+            'not an object',
+            self.reading('BATCH-1', data=[1, 2]),
+            self.reading('UNKNOWN-1'),
+        ]
+        
+        response = self.client.post(self.url, readings, format='json')
+        
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (1, 4))
+        results = body['results']
+        self.assertEqual([result['status'] for result in results], ['created'] + ['error'] * 4)
+        self.assertIn('recorded_at', results[1]['errors'])
+        self.assertIn('non_field_errors', results[2]['errors'])
+        self.assertIn('data', results[3]['errors'])
+        self.assertIn('device_id', results[4]['errors'])
+        self.assertEqual(DeviceData.objects.count(), 1)
+    
+    def test_empty_and_oversized_batches_are_rejected(self):
+        for body in ([], {'readings': []}, {'reading': [self.reading('BATCH-0')]}):
+            self.assertEqual(self.client.post(self.url, body, format='json').status_code, 400)
+        
+        with override_settings(DEVICE_READINGS_BATCH_MAX_ITEMS=2):
+            response = self.client.post(self.url, [self.reading('BATCH-0')] * 3, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('max 2', response.json()['error'])
+        self.assertFalse(DeviceData.objects.exists())
+    
+    def test_unknown_and_foreign_devices_are_rejected(self):
+        response = self.client.post(
+            self.url, [self.reading('UNKNOWN-1'), self.reading('FOREIGN-1'), self.reading(None)], format='json'
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+        for result in response.json()['results']:
+            self.assertIn('device_id', result['errors'])
+        self.assertFalse(DeviceData.objects.exists())
+    
+    def test_device_key_posts_only_for_its_own_device(self):
+        device_key = DeviceAPIKey.objects.create(device=self.devices[0])
+        client = APIClient(HTTP_X_DEVICE_API_KEY=device_key.key)
+        readings = [
+            {'data': {'temperature': 20.0}, 'recorded_at': '2026-10-17T10:00:00Z'},
+            self.reading('BATCH-1'),
+        ]
+        
+        response = client.post(self.url, readings, format='json')
+        
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.json()['results'][0]['device_id'], 'BATCH-0')
+        self.assertEqual(list(DeviceData.objects.values_list('device__device_id', flat=True)), ['BATCH-0'])
+    
+    def test_inactive_device_key_is_rejected(self):
+        device_key = DeviceAPIKey.objects.create(device=self.devices[0], is_active=False)
+        client = APIClient(HTTP_X_DEVICE_API_KEY=device_key.key)
+        
+        response = client.post(self.url, [self.reading('BATCH-0')], format='json')
+        
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(DeviceData.objects.exists())
@@ -1,23 +1,29 @@
 from rest_framework import viewsets, status, generics, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
 from django.db.models import Q, Count
 from datetime import timedelta
 from django.utils import timezone
 from google.oauth2 import id_token
 from google.auth.transport import requests as google_requests
+from observations.current_state import latest_snapshot, update_current_state
 
 from .models import CustomUser, UserDevice, DeviceData, DeviceAPIKey
+from .parsers import NDJSONParser
 from .serializers import (
     UserRegistrationSerializer, 
     UserProfileSerializer,
     UserDeviceSerializer,
     DeviceDataSerializer,
-    DeviceDataCreateSerializer
+    DeviceDataCreateSerializer,
+    DeviceReadingBatchItemSerializer
 )
 
 
@@ -177,7 +183,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
     
     def get_object(self):
-        return self.request.user
+        # Load the user with its device count in one query
+        return CustomUser.objects.annotate(
+            num_devices=Count('devices')
+        ).get(pk=self.request.user.pk)
 
 
 @api_view(['POST'])
@@ -234,7 +243,9 @@ class UserDeviceViewSet(viewsets.ModelViewSet):
         if status:
             queryset = queryset.filter(status=status)
         
-        return queryset.select_related('user').prefetch_related('readings')
+        return queryset.select_related('user').annotate(
+            current_reading=latest_snapshot('device', 'device_id')
+        )
     
     def perform_create(self, serializer):
         """Automatically set the user when creating a device"""
@@ -278,6 +289,108 @@ class UserDeviceViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED
         )
     
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='readings/batch',
+        parser_classes=[JSONParser, NDJSONParser]
+    )
+    def batch_readings(self, request):
+        """
+        Add many readings, for one or more devices, in one request.
+        
+        Body is a JSON array (or ``{"readings": [...]}``) or an NDJSON stream
+        (Content-Type: application/x-ndjson) of
+        ``{"device_id": "WS-A3B5C7", "data": {...}, "recorded_at": "..."}``.
+        ``device_id`` may be omitted when authenticating with a device API key.
+        Valid readings are stored even if others fail; the response lists the
+        status of every item in request order.
+        """
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('readings')
+        if not isinstance(items, list) or not items:
+            return Response({
+                'error': 'Expected a non-empty list of readings'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_items = getattr(settings, 'DEVICE_READINGS_BATCH_MAX_ITEMS', 5000)
+        if len(items) > max_items:
+            return Response({
+                'error': f'Too many readings in one batch (max {max_items})'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # A device API key may only post readings for its own device
+        device_key = request.auth if isinstance(request.auth, DeviceAPIKey) else None
+        default_device_id = device_key.device.device_id if device_key else None
+        
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {'index': index, 'status': 'error',
+                                  'errors': {'non_field_errors': ['Reading must be a JSON object.']}}
+                continue
+            
+            serializer = DeviceReadingBatchItemSerializer(data=item)
+            if not serializer.is_valid():
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+                continue
+            
+            reading = serializer.validated_data
+            reading.setdefault('device_id', default_device_id)
+            valid.append((index, reading))
+        
+        # Resolve and authorize every referenced device with a single query
+        device_ids = {reading['device_id'] for _, reading in valid if reading['device_id']}
+        devices = UserDevice.objects.filter(user=request.user, device_id__in=device_ids)
+        if device_key:
+            devices = devices.filter(pk=device_key.device_id)
+        devices = {device.device_id: device for device in devices}
+        
+        rows = []
+        for index, reading in valid:
+            device = devices.get(reading['device_id'])
+            if device is None:
+                error = ('device_id is required' if not reading['device_id']
+                         else "Device not found or you don't have permission to add data to it.")
+                results[index] = {'index': index, 'status': 'error',
+                                  'errors': {'device_id': [error]}}
+                continue
+            rows.append((index, DeviceData(
+                device=device,
+                data=reading['data'],
+                recorded_at=reading['recorded_at']
+            )))
+        
+        if rows:
+            now = timezone.now()
+            with transaction.atomic():
+                DeviceData.objects.bulk_create([row for _, row in rows])
+                update_current_state([row for _, row in rows])
+                UserDevice.objects.filter(
+                    pk__in={row.device_id for _, row in rows}
+                ).update(last_seen=now)
+            
+            for index, row in rows:
+                results[index] = {'index': index, 'status': 'created',
+                                  'device_id': row.device.device_id, 'id': row.pk}
+        
+        created = len(rows)
+        failed = len(items) - created
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        
+        return Response({
+            'created': created,
+            'failed': failed,
+            'results': results
+        }, status=response_status)
+    
     @action(detail=True, methods=['get'])
     def readings(self, request, pk=None):
         """Get readings for this device"""
@@ -305,7 +418,9 @@ class UserDeviceViewSet(viewsets.ModelViewSet):
         devices = UserDevice.objects.filter(
             is_public=True,
             status='active'
-        ).select_related('user')
+        ).select_related('user').annotate(
+            current_reading=latest_snapshot('device', 'device_id')
+        )
         
         serializer = self.get_serializer(devices, many=True)
         return Response(serializer.data)
@@ -413,7 +528,9 @@ class PublicDeviceViewSet(viewsets.ReadOnlyModelViewSet):
         return UserDevice.objects.filter(
             is_public=True,
             status='active'
-        ).select_related('user').prefetch_related('readings')
+        ).select_related('user').annotate(
+            current_reading=latest_snapshot('device', 'device_id')
+        )
     
     @action(detail=True, methods=['get'])
     def readings(self, request, pk=None):
@@ -13,6 +13,7 @@ django.setup()
 
 from entities.models import WeatherStation, AirQualitySensor, PublicService
 from observations.models import WeatherObservation, AirQualityObservation
+from observations.writers import ObservationWriter
 
 def create_weather_stations():
     stations = [
@@ -39,6 +40,7 @@ def create_weather_stations():
         },
     ]
     
+    weather_writer = ObservationWriter(WeatherObservation)
     for data in stations:
         station, created = WeatherStation.objects.get_or_create(
             station_id=data['station_id'],
@@ -51,7 +53,7 @@ def create_weather_stations():
             now = datetime.now()
             for i in range(5):
                 obs_time = now - timedelta(hours=i)
-                WeatherObservation.objects.create(
+                weather_writer.add(
                     observation_id=f"weather-{station.id}-{i}",
                     location_name=station.name,
                     latitude=station.latitude,
@@ -65,6 +67,7 @@ def create_weather_stations():
                     source='sample'
                 )
             print("  Added 5 observations")
+    weather_writer.close()
 
 def create_air_quality_sensors():
     sensors = [
@@ -84,6 +87,7 @@ def create_air_quality_sensors():
         },
     ]
     
+    aq_writer = ObservationWriter(AirQualityObservation)
     for data in sensors:
         sensor, created = AirQualitySensor.objects.get_or_create(
             sensor_id=data['sensor_id'],
@@ -97,7 +101,7 @@ def create_air_quality_sensors():
             for i in range(5):
                 obs_time = now - timedelta(hours=i)
                 pm25 = 45 + i * 5
-                AirQualityObservation.objects.create(
+                aq_writer.add(
                     observation_id=f"aqi-{sensor.id}-{i}",
                     location_name=sensor.name,
                     latitude=sensor.latitude,
@@ -113,6 +117,7 @@ def create_air_quality_sensors():
                     source='sample'
                 )
             print("  Added 5 observations")
+    aq_writer.close()
 
 def create_public_services():
     services = [
@@ -14,6 +14,7 @@ django.setup()
 
 from entities.models import WeatherStation, AirQualitySensor, PublicService
 from observations.models import WeatherObservation, AirQualityObservation
+from observations.writers import ObservationWriter
 
 # Major cities and locations across Vietnam
 VIETNAM_LOCATIONS = [
@@ -73,6 +74,7 @@ VIETNAM_LOCATIONS = [
 def create_weather_stations():
     print("🌤️  Creating weather stations across Vietnam...")
     count = 0
+    weather_writer = ObservationWriter(WeatherObservation)
     for i, location in enumerate(VIETNAM_LOCATIONS):
         station_id = f"weather-vn-{i+1:03d}"
         station, created = WeatherStation.objects.get_or_create(
@@ -91,7 +93,7 @@ def create_weather_stations():
             for j in range(3):
                 obs_time = now - timedelta(hours=j)
                 temp_base = 28 if 'Miền Nam' in location['region'] else 25
-                WeatherObservation.objects.create(
+                weather_writer.add(
                     observation_id=f"{station_id}-obs-{j}",
                     location_name=station.name,
                     latitude=station.latitude,
@@ -104,11 +106,13 @@ def create_weather_stations():
                     observed_at=obs_time,
                     source='sample'
                 )
+    weather_writer.close()
     print(f"   ✅ Created {count} new weather stations")
 
 def create_air_quality_sensors():
     print("💨 Creating air quality sensors...")
     count = 0
+    aq_writer = ObservationWriter(AirQualityObservation)
     # Add AQI sensors to major cities only (more realistic)
     major_cities = [loc for loc in VIETNAM_LOCATIONS 
                     if any(city in loc['name'] for city in ['Hà Nội', 'Hải Phòng', 'Đà Nẵng', 
@@ -133,7 +137,7 @@ def create_air_quality_sensors():
             for j in range(3):
                 obs_time = now - timedelta(hours=j)
                 pm25 = random.uniform(20, 80)  # Realistic AQI range for Vietnam
-                AirQualityObservation.objects.create(
+                aq_writer.add(
                     observation_id=f"{sensor_id}-obs-{j}",
                     location_name=sensor.name,
                     latitude=sensor.latitude,
@@ -148,6 +152,7 @@ def create_air_quality_sensors():
                     observed_at=obs_time,
                     source='sample'
                 )
+    aq_writer.close()
     print(f"   ✅ Created {count} new air quality sensors")
 
 def create_public_services():
@@ -0,0 +1,456 @@
+"""
+Asynchronous Orion-LD Context Broker client (asyncio + httpx)
+
+``AsyncOrionLDClient`` has the same operations as ``OrionLDClient``
+(entities, batch operations, paged ``iter_*`` streams as async
+iterators, subscriptions, temporal queries), with batch chunks sent
+concurrently. Synchronous code (Celery tasks) uses it through
+``run_async``, e.g. the air quality sync's batch upsert.
+"""
+import asyncio
+import weakref
+from urllib.parse import urljoin
+import httpx
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from django.conf import settings
+from .orion_client import (
+    RETRY_METHODS,
+    RETRY_STATUS_CODES,
+    build_query_params,
+    build_temporal_params,
+    chunked,
+    get_timeout,
+    merge_batch_result,
+    parse_subscription_id,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# One pooled AsyncClient and concurrency semaphore per event loop; httpx and
+# asyncio primitives cannot be shared across loops.
+_loop_state = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    """Return the shared (client, semaphore) pair for the running event loop"""
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    
+    if state is None or state[0].is_closed:
+        limits = httpx.Limits(
+            max_connections=getattr(settings, 'ORION_LD_POOL_MAXSIZE', 20),
+            max_keepalive_connections=getattr(settings, 'ORION_LD_POOL_CONNECTIONS', 10),
+        )
+        client = httpx.AsyncClient(limits=limits)
+        semaphore = asyncio.Semaphore(
+            getattr(settings, 'ORION_LD_ASYNC_MAX_CONCURRENCY', 50)
+        )
+        state = (client, semaphore)
+        _loop_state[loop] = state
+    
+    return state
+
+
+async def close_async_client():
+    """Close the shared client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    state = _loop_state.pop(loop, None)
+    if state is not None:
+        await state[0].aclose()
+
+
+def run_async(call: Callable[['AsyncOrionLDClient'], Awaitable[T]]) -> T:
+    """
+    Run ``call(client)`` to completion from synchronous code, on its own
+    event loop, and close that loop's pooled client afterwards.
+    """
+    async def main():
+        try:
+            return await call(AsyncOrionLDClient())
+        finally:
+            await close_async_client()
+    
+    return asyncio.run(main())
+
+
+class AsyncOrionLDClient:
+    """
+    Async counterpart of OrionLDClient.
+    
+    Methods mirror the blocking client (same arguments, same return values)
+    so callers can fan out many broker requests with ``asyncio.gather``; the
+    number of in-flight requests is capped by ORION_LD_ASYNC_MAX_CONCURRENCY.
+    """
+    
+    def __init__(self, base_url: str = None):
+        self.base_url = base_url or settings.ORION_LD_URL
+        self.headers = {
+            "Content-Type": "application/ld+json",
+            "Accept": "application/ld+json"
+        }
+    
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        operation: str = 'default',
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request with the operation's timeout and the shared retry policy"""
+        client, semaphore = get_async_client()
+        connect, read = get_timeout(operation)
+        kwargs.setdefault('headers', self.headers)
+        kwargs.setdefault('timeout', httpx.Timeout(read, connect=connect))
+        
+        max_retries = getattr(settings, 'ORION_LD_MAX_RETRIES', 3)
+        backoff = getattr(settings, 'ORION_LD_RETRY_BACKOFF', 0.5)
+        retryable = method in RETRY_METHODS
+        
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                # A failed connect never reached the broker, so it is always safe to retry
+                can_retry = retryable or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if not can_retry or attempt >= max_retries:
+                    raise
+            else:
+                if (
+                    response.status_code not in RETRY_STATUS_CODES
+                    or not retryable
+                    or attempt >= max_retries
+                ):
+                    return response
+            
+            await asyncio.sleep(backoff * (2 ** attempt))
+            attempt += 1
+    
+    async def create_entity(self, entity: Dict[str, Any]) -> bool:
+        """Create a new entity in Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities"
+        
+        try:
+            response = await self._request('POST', url, json=entity)
+            response.raise_for_status()
+            logger.info(f"Created entity: {entity.get('id')}")
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to create entity: {e}")
+            if isinstance(e, httpx.HTTPStatusError):
+                logger.error(f"Response: {e.response.text}")
+            return False
+    
+    async def get_entity(self, entity_id: str) -> Optional[Dict[str, Any]]:
+        """Get an entity from Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}"
+        
+        try:
+            response = await self._request('GET', url)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get entity {entity_id}: {e}")
+            return None
+    
+    async def get_entities(self, entity_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch many entities concurrently; missing entities come back as None"""
+        return await asyncio.gather(
+            *(self.get_entity(entity_id) for entity_id in entity_ids)
+        )
+    
+    async def update_entity(
+        self,
+        entity_id: str,
+        attributes: Dict[str, Any]
+    ) -> bool:
+        """Update entity attributes"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}/attrs"
+        
+        try:
+            response = await self._request('PATCH', url, json=attributes)
+            response.raise_for_status()
+            logger.info(f"Updated entity: {entity_id}")
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to update entity {entity_id}: {e}")
+            return False
+    
+    async def delete_entity(self, entity_id: str) -> bool:
+        """Delete an entity from Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}"
+        
+        try:
+            response = await self._request('DELETE', url)
+            response.raise_for_status()
+            logger.info(f"Deleted entity: {entity_id}")
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to delete entity {entity_id}: {e}")
+            return False
+    
+    async def batch_create(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Create entities in concurrent batches (entityOperations/create)"""
+        return await self._batch_operation('create', entities, chunk_size)
+    
+    async def batch_upsert(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        replace: bool = False
+    ) -> Dict[str, List]:
+        """Upsert entities with all chunks sent concurrently"""
+        params = {"options": "replace" if replace else "update"}
+        return await self._batch_operation('upsert', entities, chunk_size, params=params)
+    
+    async def batch_update(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Update attributes of existing entities in concurrent batches (entityOperations/update)"""
+        return await self._batch_operation('update', entities, chunk_size)
+    
+    async def batch_delete(
+        self,
+        entity_ids: Iterable[str],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Delete entities by id in concurrent batches (entityOperations/delete)"""
+        headers = dict(self.headers, **{"Content-Type": "application/json"})
+        return await self._batch_operation('delete', entity_ids, chunk_size, headers=headers)
+    
+    async def _batch_operation(
+        self,
+        operation: str,
+        items: Iterable[Any],
+        chunk_size: Optional[int] = None,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, List]:
+        """Send ``items`` to an entityOperations endpoint, all chunks at once (see OrionLDClient)"""
+        url = f"{self.base_url}/ngsi-ld/v1/entityOperations/{operation}"
+        chunk_size = chunk_size or getattr(settings, 'ORION_LD_BATCH_SIZE', 100)
+        result = {"success": [], "errors": []}
+        
+        async def send(chunk):
+            ids = [item if isinstance(item, str) else item.get('id') for item in chunk]
+            try:
+                response = await self._request(
+                    'POST', url, operation='batch', json=chunk, params=params,
+                    headers=headers or self.headers
+                )
+            except httpx.HTTPError as e:
+                logger.error(f"Batch {operation} of {len(chunk)} entities failed: {e}")
+                result["errors"].extend(
+                    {"entityId": entity_id, "error": {"title": str(e)}}
+                    for entity_id in ids
+                )
+                return
+            merge_batch_result(result, response, ids, operation)
+        
+        await asyncio.gather(*(send(chunk) for chunk in chunked(items, chunk_size)))
+        logger.info(
+            f"Batch {operation}: {len(result['success'])} succeeded, "
+            f"{len(result['errors'])} failed"
+        )
+        return result
+    
+    async def query_entities(
+        self,
+        entity_type: Optional[str] = None,
+        q: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        georel: Optional[str] = None,
+        geometry: Optional[str] = None,
+        coordinates: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Query entities from Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities"
+        params = build_query_params(
+            entity_type, q, limit, offset, georel, geometry, coordinates
+        )
+        
+        try:
+            response = await self._request('GET', url, operation='query', params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to query entities: {e}")
+            return []
+    
+    def iter_entities(
+        self,
+        entity_type: Optional[str] = None,
+        q: Optional[str] = None,
+        page_size: Optional[int] = None,
+        georel: Optional[str] = None,
+        geometry: Optional[str] = None,
+        coordinates: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every matching entity, page by page (``async for``; see OrionLDClient.iter_entities)"""
+        url = f"{self.base_url}/ngsi-ld/v1/entities"
+        params = build_query_params(entity_type, q, georel=georel,
+                                    geometry=geometry, coordinates=coordinates)
+        headers = None
+        if context:
+            headers = dict(self.headers, Link=(
+                f'<{context}>; rel="http://www.w3.org/ns/json-ld#context"; type="application/ld+json"'
+            ))
+        return self._paginate(url, params, 'query', page_size, headers=headers)
+    
+    async def create_subscription(self, subscription: Dict[str, Any]) -> Optional[str]:
+        """Create a subscription in Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/subscriptions"
+        
+        try:
+            response = await self._request('POST', url, json=subscription)
+            response.raise_for_status()
+            
+            subscription_id = parse_subscription_id(response.headers.get('Location', ''))
+            logger.info(f"Created subscription: {subscription_id}")
+            return subscription_id
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to create subscription: {e}")
+            return None
+    
+    async def get_subscription(self, subscription_id: str) -> Optional[Dict[str, Any]]:
+        """Get a subscription from Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
+        
+        try:
+            response = await self._request('GET', url)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get subscription {subscription_id}: {e}")
+            return None
+    
+    async def subscription_exists(self, subscription_id: str) -> bool:
+        """Whether Orion-LD still has a subscription; only a 404 means False, other failures raise"""
+        url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
+        response = await self._request('GET', url)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+    
+    async def delete_subscription(self, subscription_id: str) -> bool:
+        """Delete a subscription from Orion-LD"""
+        url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
+        
+        try:
+            response = await self._request('DELETE', url)
+            response.raise_for_status()
+            logger.info(f"Deleted subscription: {subscription_id}")
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to delete subscription {subscription_id}: {e}")
+            return False
+    
+    async def get_temporal_entities(
+        self,
+        entity_id: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        time_rel: str = "between",
+        time_at: Optional[str] = None,
+        end_time_at: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Query temporal entities"""
+        url = f"{self.base_url}/ngsi-ld/v1/temporal/entities"
+        params = build_temporal_params(
+            entity_id, entity_type, time_rel, time_at, end_time_at, limit
+        )
+        
+        try:
+            response = await self._request('GET', url, operation='temporal', params=params)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to query temporal entities: {e}")
+            return []
+    
+    def iter_temporal_entities(
+        self,
+        entity_id: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        time_rel: str = "between",
+        time_at: Optional[str] = None,
+        end_time_at: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream every matching temporal entity, page by page (see iter_entities)"""
+        url = f"{self.base_url}/ngsi-ld/v1/temporal/entities"
+        params = build_temporal_params(entity_id, entity_type, time_rel, time_at, end_time_at)
+        return self._paginate(url, params, 'temporal', page_size)
+    
+    async def _fetch_page(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        operation: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
+        """Fetch one page; returns (entities, total count, next page URL)"""
+        response = await self._request('GET', url, operation=operation, params=params,
+                                       headers=headers or self.headers)
+        response.raise_for_status()
+        
+        total = response.headers.get('NGSILD-Results-Count')
+        next_link = response.links.get('next', {}).get('url')
+        return (
+            response.json(),
+            int(total) if total is not None else None,
+            urljoin(url, next_link) if next_link else None
+        )
+    
+    async def _paginate(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        operation: str,
+        page_size: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same paging as OrionLDClient._paginate; the next page is requested
+        as a task while the current one is being consumed.
+        """
+        page_size = page_size or getattr(settings, 'ORION_LD_PAGE_SIZE', 500)
+        params = dict(params, limit=page_size, offset=0, count="true")
+        task = asyncio.ensure_future(self._fetch_page(url, params, operation, headers))
+        offset = 0
+        
+        try:
+            while task is not None:
+                try:
+                    entities, total, next_url = await task
+                except httpx.HTTPError as e:
+                    logger.error(f"Failed to fetch page at offset {offset} of {url}: {e}")
+                    raise
+                
+                offset += len(entities)
+                task = None
+                
+                if next_url:
+                    task = asyncio.ensure_future(self._fetch_page(next_url, None, operation, headers))
+                elif entities and (offset < total if total is not None else len(entities) >= page_size):
+                    next_params = dict(params, offset=offset)
+                    task = asyncio.ensure_future(self._fetch_page(url, next_params, operation, headers))
+                
+                for entity in entities:
+                    yield entity
+        finally:
+            if task is not None:
+                task.cancel()
@@ -0,0 +1,170 @@
+"""
+Stable content hashes and bucketed digests of NGSI-LD entities
+
+``content_hash`` hashes the canonical form of an entity: ``@context``
+dropped, attribute and type names reduced to their short name (the
+broker may return them expanded), integral floats as ints and
+timestamps as UTC with millisecond precision. The same entity stored
+locally and returned by Orion-LD therefore hashes the same.
+
+``DigestTree`` folds (entity id, content hash) pairs into per-bucket
+digests (bucket = leading hex digits of the hashed id) with XOR, so
+digests do not depend on the order entities are seen in and two trees
+can be compared bucket by bucket before comparing any entity. Only the
+pairs of differing buckets are then collected (``in_buckets``) and
+compared (``diff_hashes``).
+"""
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+HASH_LENGTH = 32  # hex chars (128 bits)
+BUCKET_CHARS = 2  # 256 buckets per entity type
+
+IGNORED_KEYS = ('@context', 'createdAt', 'modifiedAt')
+
+
+def short_name(name: str) -> str:
+    """``https://.../dataModel.Parking/availableSpotNumber`` -> ``availableSpotNumber``"""
+    return name.rsplit('/', 1)[-1].rsplit('#', 1)[-1]
+
+
+def _timestamp(value: Any) -> Any:
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        return value
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key == 'observedAt' or (key == '@value' and value.get('@type') == 'DateTime'):
+                result[key] = _timestamp(item)
+            else:
+                result[key] = _canonical(item)
+        return result
+    return value
+
+
+def canonical(entity: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical form of an NGSI-LD entity used for hashing"""
+    result = {}
+    for name, value in entity.items():
+        if name in IGNORED_KEYS:
+            continue
+        if name == 'type' and isinstance(value, str):
+            result['type'] = short_name(value)
+        elif name == 'id':
+            result['id'] = value
+        else:
+            result[short_name(name)] = _canonical(value)
+    return result
+
+
+def content_hash(entity: Optional[Dict[str, Any]]) -> str:
+    """Stable hash of an entity's content ('' for no data)"""
+    if not entity:
+        return ''
+    encoded = json.dumps(canonical(entity), sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:HASH_LENGTH]
+
+
+def bucket_of(entity_id: str) -> str:
+    return hashlib.sha256(entity_id.encode()).hexdigest()[:BUCKET_CHARS]
+
+
+class DigestTree:
+    """
+    Per-bucket XOR digests of (entity id, content hash) pairs.
+    
+    Only the digests are kept (256 integers), not the pairs, so a tree of
+    any number of entities is built in constant memory from a stream.
+    """
+    
+    def __init__(self, pairs: Iterable[Tuple[str, str]] = ()):
+        self.buckets: Dict[str, int] = {}
+        self.count = 0
+        for entity_id, digest in pairs:
+            self.add(entity_id, digest)
+    
+    def add(self, entity_id: str, digest: str):
+        leaf = int(hashlib.sha256(f"{entity_id}\n{digest}".encode()).hexdigest()[:HASH_LENGTH], 16)
+        bucket = bucket_of(entity_id)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) ^ leaf
+        self.count += 1
+    
+    @property
+    def root(self) -> int:
+        root = 0
+        for digest in self.buckets.values():
+            root ^= digest
+        return root
+    
+    def differing_buckets(self, other: 'DigestTree') -> Set[str]:
+        return {
+            bucket for bucket in self.buckets.keys() | other.buckets.keys()
+            if self.buckets.get(bucket, 0) != other.buckets.get(bucket, 0)
+        }
+
+
+def in_buckets(pairs: Iterable[Tuple[str, str]], buckets: Set[str]) -> Dict[str, str]:
+    """{entity id: content hash} of the streamed pairs that fall in ``buckets``"""
+    return {entity_id: digest for entity_id, digest in pairs if bucket_of(entity_id) in buckets}
+
+
+def diff_hashes(mine: Dict[str, str], theirs: Dict[str, str]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """(ids only in ``mine``, ids only in ``theirs``, ids in both with different hashes)"""
+    changed = {entity_id for entity_id in mine.keys() & theirs.keys() if mine[entity_id] != theirs[entity_id]}
+    return mine.keys() - theirs.keys(), theirs.keys() - mine.keys(), changed
+
+
+class ContentHashField(models.CharField):
+    """
+    ``content_hash`` of the model's JSON ``source_field``, recomputed on
+    every save (bulk_create included) so it always matches the data.
+    """
+    
+    def __init__(self, *args, source_field='data', **kwargs):
+        self.source_field = source_field
+        kwargs.setdefault('max_length', HASH_LENGTH)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('default', '')
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source_field != 'data':
+            kwargs['source_field'] = self.source_field
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        value = content_hash(getattr(model_instance, self.source_field))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def backfill_content_hash(model, batch_size: int = 2000) -> int:
+    """Fill the content_hash column of existing rows (used by migrations)"""
+    rows = []
+    updated = 0
+    for row in model.objects.only('pk', 'data').iterator(chunk_size=batch_size):
+        row.content_hash = content_hash(row.data)
+        rows.append(row)
+        if len(rows) >= batch_size:
+            updated += model.objects.bulk_update(rows, ['content_hash'], batch_size=batch_size)
+            rows = []
+    if rows:
+        updated += model.objects.bulk_update(rows, ['content_hash'], batch_size=batch_size)
+    return updated
@@ -0,0 +1,287 @@
+"""
+Geohash spatial index and distance queries for located models
+"""
+import math
+from functools import reduce
+from operator import or_
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.db import models
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_DECODE = {char: index for index, char in enumerate(GEOHASH_ALPHABET)}
+MAX_PRECISION = 12
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 9) -> str:
+    """Encode a coordinate as a geohash of ``precision`` characters"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_range[0] = mid
+            else:
+                value <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    
+    for char in geohash:
+        value = GEOHASH_DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            target[1 - bit] = mid
+            even = not even
+    
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def cell_size_degrees(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of a geohash cell"""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> Optional[List[str]]:
+    """
+    Geohash prefixes whose cells together cover the circle around a point.
+    
+    Uses the finest precision whose cells are at least ``radius_km`` on
+    each side, so the cell containing the point plus its 8 neighbours is
+    enough. Returns None when the radius is too large (or too close to a
+    pole) for a prefix filter to help.
+    """
+    # Cells are narrowest at the edge of the circle farthest from the equator
+    edge_lat = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.9)
+    km_per_lon_degree = KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+    
+    precision = 0
+    for candidate in range(1, MAX_PRECISION + 1):
+        height, width = cell_size_degrees(candidate)
+        if height * KM_PER_DEGREE < radius_km or width * km_per_lon_degree < radius_km:
+            break
+        precision = candidate
+    
+    if precision < 2:
+        return None
+    
+    center = geohash_encode(latitude, longitude, precision)
+    min_lat, max_lat, min_lon, max_lon = geohash_bounds(center)
+    height, width = max_lat - min_lat, max_lon - min_lon
+    mid_lat, mid_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    
+    cells = set()
+    for dlat in (-height, 0, height):
+        cell_lat = mid_lat + dlat
+        if not -90 < cell_lat < 90:
+            continue
+        for dlon in (-width, 0, width):
+            cell_lon = (mid_lon + dlon + 180) % 360 - 180
+            cells.add(geohash_encode(cell_lat, cell_lon, precision))
+    
+    return sorted(cells)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_expression(
+    latitude: float,
+    longitude: float,
+    lat_field: str = 'latitude',
+    lon_field: str = 'longitude'
+):
+    """ORM expression for the haversine distance (km) from a point to each row"""
+    half_dlat = Radians(F(lat_field) - Value(latitude)) / 2
+    half_dlon = Radians(F(lon_field) - Value(longitude)) / 2
+    a = (
+        Power(Sin(half_dlat), 2)
+        + Value(math.cos(math.radians(latitude))) * Cos(Radians(F(lat_field))) * Power(Sin(half_dlon), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0), output_field=FloatField()))
+
+
+def nearby(
+    queryset: models.QuerySet,
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    limit: Optional[int] = None,
+    geohash_field: str = 'geohash'
+) -> models.QuerySet:
+    """
+    Rows within ``radius_km`` of a point, nearest first.
+    
+    Rows are pre-filtered on the indexed geohash prefix of the covering
+    cells, then filtered and ordered by exact haversine distance, which is
+    available as ``distance`` (km) on each row. ``limit`` returns only the
+    k nearest. With the PostGIS backend the radius filter and distance run
+    on the indexed geo_point column instead.
+    """
+    from .postgis import distance_km, postgis_enabled, within_distance
+    
+    if postgis_enabled(queryset.model):
+        queryset = queryset.filter(
+            within_distance(queryset.model, latitude, longitude, radius_km * 1000)
+        ).annotate(
+            distance=distance_km(queryset.model, latitude, longitude)
+        ).order_by('distance')
+        return queryset[:limit] if limit else queryset
+    
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        queryset = queryset.filter(reduce(or_, (
+            Q(**{f'{geohash_field}__startswith': cell}) for cell in cells
+        )))
+    
+    queryset = queryset.annotate(
+        distance=distance_expression(latitude, longitude)
+    ).filter(distance__lte=radius_km).order_by('distance')
+    
+    if limit:
+        queryset = queryset[:limit]
+    return queryset
+
+
+class GeohashField(models.CharField):
+    """
+    Geohash of the model's latitude/longitude, recomputed on every save
+    (bulk_create included) so the spatial index never goes stale.
+    """
+    
+    def __init__(self, *args, lat_field='latitude', lon_field='longitude', **kwargs):
+        self.lat_field = lat_field
+        self.lon_field = lon_field
+        kwargs.setdefault('max_length', MAX_PRECISION)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('default', '')
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('db_index', True)
+        super().__init__(*args, **kwargs)
+    
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.lat_field != 'latitude':
+            kwargs['lat_field'] = self.lat_field
+        if self.lon_field != 'longitude':
+            kwargs['lon_field'] = self.lon_field
+        return name, path, args, kwargs
+    
+    def pre_save(self, model_instance, add):
+        value = compute_geohash(
+            getattr(model_instance, self.lat_field),
+            getattr(model_instance, self.lon_field),
+        )
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def compute_geohash(latitude, longitude) -> str:
+    """Geohash stored for a row ('' when the row has no location)"""
+    if latitude is None or longitude is None:
+        return ''
+    precision = getattr(settings, 'GEOHASH_PRECISION', 9)
+    return geohash_encode(float(latitude), float(longitude), precision)
+
+
+def backfill_geohash(model, batch_size: int = 2000) -> int:
+    """Fill the geohash column of existing rows (used by migrations)"""
+    rows = []
+    updated = 0
+    for row in model.objects.only('pk', 'latitude', 'longitude').iterator(chunk_size=batch_size):
+        row.geohash = compute_geohash(row.latitude, row.longitude)
+        rows.append(row)
+        if len(rows) >= batch_size:
+            updated += model.objects.bulk_update(rows, ['geohash'], batch_size=batch_size)
+            rows = []
+    if rows:
+        updated += model.objects.bulk_update(rows, ['geohash'], batch_size=batch_size)
+    return updated
+
+
+def point_in_ring(latitude: float, longitude: float, ring: List[List[float]]) -> bool:
+    """Ray casting test against one GeoJSON linear ring ([lon, lat] pairs)"""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > latitude) != (yj > latitude):
+            if longitude < (xj - xi) * (latitude - yi) / (yj - yi) + xi:
+                inside = not inside
+        j = i
+    return inside
+
+
+def point_in_geometry(latitude: float, longitude: float, geometry: dict) -> bool:
+    """True when a point lies in a GeoJSON Polygon/MultiPolygon (holes excluded)"""
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    else:
+        polygons = geometry['coordinates']
+    
+    for rings in polygons:
+        if point_in_ring(latitude, longitude, rings[0]) and not any(
+            point_in_ring(latitude, longitude, hole) for hole in rings[1:]
+        ):
+            return True
+    return False
+
+
+def geometry_bounds(geometry: dict) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a GeoJSON Polygon/MultiPolygon"""
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    else:
+        polygons = geometry['coordinates']
+    
+    points = [point for rings in polygons for point in rings[0]]
+    lons = [point[0] for point in points]
+    lats = [point[1] for point in points]
+    return min(lats), max(lats), min(lons), max(lons)
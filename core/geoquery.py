@@ -0,0 +1,162 @@
+"""
+Local evaluation of NGSI-LD geo-queries (georel / geometry / coordinates)
+"""
+import json
+from typing import Any, Dict, Optional
+from django.db import models
+from .geo import distance_expression, geometry_bounds, nearby, point_in_geometry
+from .postgis import intersects, postgis_enabled, within_distance
+
+RELATIONS = ('near', 'within', 'intersects', 'disjoint', 'equals')
+AREA_GEOMETRIES = ('Polygon', 'MultiPolygon')
+
+
+class GeoQueryError(ValueError):
+    """Invalid or unsupported NGSI-LD geo-query"""
+
+
+def parse_geo_query(georel: str, geometry: str, coordinates: str) -> Dict[str, Any]:
+    """
+    Parse NGSI-LD geo-query parameters, e.g.::
+    
+        georel=near;maxDistance==2000  geometry=Point  coordinates=[106.7,10.8]
+        georel=within  geometry=Polygon  coordinates=[[[106.6,10.7],...]]
+    
+    Distances are in metres and coordinates in [longitude, latitude] order.
+    """
+    if not georel or not geometry or not coordinates:
+        raise GeoQueryError("georel, geometry and coordinates are required together")
+    
+    relation, *modifiers = georel.split(';')
+    if relation not in RELATIONS:
+        raise GeoQueryError(f"Unsupported georel: {relation}")
+    
+    try:
+        parsed_coordinates = json.loads(coordinates)
+    except ValueError:
+        raise GeoQueryError("coordinates must be a JSON array")
+    
+    query = {
+        'relation': relation,
+        'geometry': {'type': geometry, 'coordinates': parsed_coordinates},
+        'max_distance': None,
+        'min_distance': None,
+    }
+    
+    for modifier in modifiers:
+        name, _, value = modifier.partition('==')
+        if name not in ('maxDistance', 'minDistance'):
+            raise GeoQueryError(f"Unsupported georel modifier: {name}")
+        try:
+            query['max_distance' if name == 'maxDistance' else 'min_distance'] = float(value)
+        except ValueError:
+            raise GeoQueryError(f"{name} must be a number")
+    
+    if relation == 'near':
+        if geometry != 'Point':
+            raise GeoQueryError("near requires a Point geometry")
+        if query['max_distance'] is None and query['min_distance'] is None:
+            raise GeoQueryError("near requires maxDistance or minDistance")
+    elif geometry == 'Point':
+        if relation == 'disjoint':
+            raise GeoQueryError("disjoint requires a Polygon or MultiPolygon geometry")
+    elif geometry not in AREA_GEOMETRIES:
+        raise GeoQueryError(f"Unsupported geometry: {geometry}")
+    
+    if geometry == 'Point' and not _is_position(parsed_coordinates):
+        raise GeoQueryError("Point coordinates must be [longitude, latitude]")
+    if geometry in AREA_GEOMETRIES and not _is_area(query['geometry']):
+        raise GeoQueryError(f"Invalid {geometry} coordinates")
+    
+    return query
+
+
+def _is_position(value) -> bool:
+    return (
+        isinstance(value, list) and len(value) >= 2
+        and all(isinstance(number, (int, float)) for number in value[:2])
+    )
+
+
+def _is_area(shape: Dict[str, Any]) -> bool:
+    polygons = [shape['coordinates']] if shape['type'] == 'Polygon' else shape['coordinates']
+    if not isinstance(polygons, list) or not polygons:
+        return False
+    return all(
+        isinstance(rings, list) and rings and all(
+            isinstance(ring, list) and len(ring) >= 4 and all(_is_position(point) for point in ring)
+            for ring in rings
+        )
+        for rings in polygons
+    )
+
+
+def apply_geo_query(
+    queryset: models.QuerySet,
+    georel: str,
+    geometry: str,
+    coordinates: str
+) -> models.QuerySet:
+    """
+    Filter a queryset of a located model with an NGSI-LD geo-query.
+    
+    Uses the PostGIS geo_point column when enabled, otherwise the geohash
+    index plus exact distance / point-in-polygon checks.
+    """
+    query = parse_geo_query(georel, geometry, coordinates)
+    model = queryset.model
+    shape = query['geometry']
+    
+    if query['relation'] == 'near':
+        longitude, latitude = shape['coordinates'][:2]
+        return _near(queryset, latitude, longitude, query['max_distance'], query['min_distance'])
+    
+    if shape['type'] == 'Point':
+        # within / intersects / equals a point: same location
+        longitude, latitude = shape['coordinates'][:2]
+        return queryset.filter(latitude=latitude, longitude=longitude)
+    
+    if postgis_enabled(model):
+        return queryset.filter(intersects(model, shape, negate=query['relation'] == 'disjoint'))
+    
+    inside_ids = _ids_in_area(queryset, shape)
+    if query['relation'] == 'disjoint':
+        return queryset.filter(latitude__isnull=False).exclude(pk__in=inside_ids)
+    return queryset.filter(pk__in=inside_ids)
+
+
+def _near(
+    queryset: models.QuerySet,
+    latitude: float,
+    longitude: float,
+    max_distance: Optional[float],
+    min_distance: Optional[float]
+) -> models.QuerySet:
+    model = queryset.model
+    
+    if max_distance is not None:
+        queryset = nearby(queryset, latitude, longitude, max_distance / 1000)
+    
+    if min_distance is not None:
+        if postgis_enabled(model):
+            queryset = queryset.exclude(within_distance(model, latitude, longitude, min_distance))
+        else:
+            if max_distance is None:
+                queryset = queryset.annotate(distance=distance_expression(latitude, longitude))
+            queryset = queryset.filter(distance__gte=min_distance / 1000)
+    
+    return queryset
+
+
+def _ids_in_area(queryset: models.QuerySet, shape: Dict[str, Any]):
+    """Primary keys of rows inside a polygon: bounding box in SQL, exact test in Python"""
+    min_lat, max_lat, min_lon, max_lon = geometry_bounds(shape)
+    candidates = queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon)
+    ).values_list('pk', 'latitude', 'longitude')
+    
+    return [
+        pk for pk, latitude, longitude in candidates
+        if point_in_geometry(latitude, longitude, shape)
+    ]
@@ -0,0 +1,90 @@
+"""
+Management command to benchmark NGSI-LD serialization throughput
+"""
+import time
+from django.core.management.base import BaseCommand
+from entities.serializers import PublicServiceNGSILDSerializer
+from infrastructure.serializers import (
+    WaterSupplyPointNGSILDSerializer,
+    DrainagePointNGSILDSerializer,
+    StreetLightNGSILDSerializer,
+    EnergyMeterNGSILDSerializer,
+    TelecomTowerNGSILDSerializer,
+)
+from observations.serializers import WeatherObservationNGSILDSerializer, AirQualityObservationNGSILDSerializer
+from traffic.serializers import (
+    BusStationNGSILDSerializer,
+    TrafficFlowNGSILDSerializer,
+    TrafficIncidentNGSILDSerializer,
+    ParkingSpotNGSILDSerializer,
+)
+
+SERIALIZERS = [
+    BusStationNGSILDSerializer,
+    TrafficFlowNGSILDSerializer,
+    TrafficIncidentNGSILDSerializer,
+    ParkingSpotNGSILDSerializer,
+    WaterSupplyPointNGSILDSerializer,
+    DrainagePointNGSILDSerializer,
+    StreetLightNGSILDSerializer,
+    EnergyMeterNGSILDSerializer,
+    TelecomTowerNGSILDSerializer,
+    WeatherObservationNGSILDSerializer,
+    AirQualityObservationNGSILDSerializer,
+    PublicServiceNGSILDSerializer,
+]
+
+
+def _best(func, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure NGSI-LD serialization throughput (entities/sec) of the DRF '
+        'serializers over model instances versus the values_list mappings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000, help='Rows per model (default 5000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is kept')
+
+    def handle(self, *args, **options):
+        limit, repeat = options['limit'], options['repeat']
+        self.stdout.write(
+            f"{'model':<24}{'rows':>7}  {'serializer/s':>13}{'mapping/s':>13}{'speedup':>9}"
+            f"  {'end-to-end serializer/s':>24}{'mapping/s':>13}{'speedup':>9}"
+        )
+
+        for serializer_class in SERIALIZERS:
+            model = serializer_class.Meta.model
+            mapping = serializer_class.mapping
+            queryset = model.objects.order_by('pk')[:limit]
+
+            # Serialization only: rows/instances already fetched
+            instances = list(queryset)
+            rows = list(queryset.values_list(*mapping.columns))
+            count = len(rows)
+            if not count:
+                self.stdout.write(f"{model.__name__:<24}{0:>7}  (no rows, skipped)")
+                continue
+            serializer_time = _best(lambda: serializer_class(instances, many=True).data, repeat)
+            mapping_time = _best(lambda: [mapping.to_entity(row) for row in rows], repeat)
+
+            # End to end: query, model instantiation (serializer path only) and serialization
+            full_serializer_time = _best(lambda: serializer_class(queryset.all(), many=True).data, repeat)
+            full_mapping_time = _best(lambda: mapping.to_entities(queryset.all()), repeat)
+
+            self.stdout.write(
+                f"{model.__name__:<24}{count:>7}  "
+                f"{count / serializer_time:>13,.0f}{count / mapping_time:>13,.0f}"
+                f"{serializer_time / mapping_time:>8.1f}x  "
+                f"{count / full_serializer_time:>24,.0f}{count / full_mapping_time:>13,.0f}"
+                f"{full_serializer_time / full_mapping_time:>8.1f}x"
+            )
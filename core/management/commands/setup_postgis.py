@@ -0,0 +1,29 @@
+"""
+Management command to create the optional PostGIS geo_point columns
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.postgis import setup_postgis
+
+
+class Command(BaseCommand):
+    help = 'Create (or drop) PostGIS geo_point mirror columns and GiST indexes for located models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop the geo_point columns and indexes'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('PostGIS requires the PostgreSQL database backend')
+
+        tables = setup_postgis(drop=options['drop'])
+        action = 'Dropped' if options['drop'] else 'Created'
+        for table in tables:
+            self.stdout.write(f'  {table}')
+        self.stdout.write(self.style.SUCCESS(f'{action} geo_point on {len(tables)} tables'))
+        if not options['drop']:
+            self.stdout.write('Set GEO_BACKEND=postgis to route geo queries through PostGIS.')
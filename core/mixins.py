@@ -0,0 +1,96 @@
+"""
+Reusable viewset mixins
+"""
+from django.db import transaction
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from .geo import nearby
+from .geoquery import GeoQueryError, apply_geo_query
+
+
+def get_nearby_params(request, default_radius: float):
+    """Parse lat, lon, radius (km) and limit query params for nearby lookups"""
+    lat = request.query_params.get('lat', None)
+    lon = request.query_params.get('lon', None)
+    
+    if not lat or not lon:
+        raise ValidationError({"error": "lat and lon parameters are required"})
+    
+    try:
+        lat = float(lat)
+        lon = float(lon)
+        radius = float(request.query_params.get('radius', default_radius))
+        limit = int(request.query_params.get('limit', 0)) or None
+    except ValueError:
+        raise ValidationError({"error": "lat, lon, radius and limit must be numbers"})
+    
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180 or radius <= 0:
+        raise ValidationError({"error": "lat/lon out of range or radius not positive"})
+    
+    return lat, lon, radius, limit
+
+
+def with_distance(data, rows):
+    """Add each row's ``distance`` (km) to its serialized item"""
+    for item, row in zip(data, rows):
+        item['distance'] = round(row.distance, 3)
+    return data
+
+
+class NearbyMixin:
+    """
+    Adds ``GET .../nearby/?lat=&lon=&radius=&limit=`` to a viewset of a
+    model with a geohash column: rows within ``radius`` km, nearest first,
+    each with its ``distance`` in km.
+    
+    The list endpoint also accepts NGSI-LD geo-queries
+    (``georel``/``geometry``/``coordinates``), evaluated locally.
+    """
+    nearby_default_radius = 5  # km
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        
+        if self.action == 'list' and 'georel' in params:
+            try:
+                queryset = apply_geo_query(
+                    queryset,
+                    params.get('georel'),
+                    params.get('geometry'),
+                    params.get('coordinates')
+                )
+            except GeoQueryError as e:
+                raise ValidationError({"error": str(e)})
+        
+        return queryset
+    
+    def get_nearby_queryset(self):
+        return self.get_queryset()
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Find rows near a point, ordered by distance"""
+        lat, lon, radius, limit = get_nearby_params(request, self.nearby_default_radius)
+        rows = list(nearby(self.get_nearby_queryset(), lat, lon, radius, limit=limit))
+        serializer = self.get_serializer(rows, many=True)
+        return Response(with_distance(serializer.data, rows))
+
+
+class AtomicWriteMixin:
+    """
+    Handle unsafe requests in one database transaction, so a model change
+    and the Orion-LD outbox rows its signals queue commit (or roll back)
+    together. Error responses roll the transaction back.
+    """
+    
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with transaction.atomic():
+            response = super().dispatch(request, *args, **kwargs)
+            if getattr(response, 'exception', False):
+                transaction.set_rollback(True)
+        return response
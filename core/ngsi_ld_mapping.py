@@ -0,0 +1,273 @@
+"""
+Declarative NGSI-LD mappings built into row functions
+
+An ``EntityMapping`` describes how a model's columns become an NGSI-LD
+entity (``Property``, ``GeoPoint``, ``Address`` attributes whose values
+come from columns, constants or small functions). When the mapping is
+created, every spec is turned once into a reader: a small function that
+takes a ``values_list`` tuple, with the column positions already
+resolved. ``to_entity`` then builds the whole entity by calling the
+readers, and every entity shares the same ``@context``.
+
+``MappedNGSILDSerializer`` keeps the DRF serializer interface for single
+instances; list exports use ``mapping.to_entities(queryset)``, which
+reads tuples with ``values_list`` and never instantiates models.
+
+Value specs: a plain string is a column name, ``Column(name, default)``
+is ``value or default``, ``Const`` a literal, ``Float``/``Iso`` common
+conversions, ``Call(func, *specs)`` anything else, and a dict is a
+nested object of specs.
+"""
+from copy import deepcopy
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from .ngsi_ld import NGSILDContext
+
+# Shared by every mapped entity: do not mutate
+CONTEXT = (NGSILDContext.CORE_CONTEXT, NGSILDContext.SMART_DATA_MODELS)
+
+_NO_DEFAULT = object()
+
+Reader = Callable[[tuple], Any]
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class _Columns:
+    """The columns a mapping reads, in ``values_list`` order"""
+    
+    def __init__(self, entity_type: str):
+        self.entity_type = entity_type
+        self.names: List[str] = []
+    
+    def reader(self, name: str) -> Reader:
+        if name not in self.names:
+            self.names.append(name)
+        return itemgetter(self.names.index(name))
+
+
+def _constant(value: Any) -> Reader:
+    if isinstance(value, (list, dict)):
+        # A fresh copy per entity
+        return lambda row: deepcopy(value)
+    return lambda row: value
+
+
+def _reader(spec, columns: _Columns) -> Reader:
+    """Reader of a value spec: a column name, a dict of specs or a ``Spec``"""
+    if isinstance(spec, str):
+        return columns.reader(spec)
+    if isinstance(spec, dict):
+        items = [(key, _reader(item, columns)) for key, item in spec.items()]
+        return lambda row: {key: read(row) for key, read in items}
+    return spec.reader(columns)
+
+
+class Spec:
+    def reader(self, columns: _Columns) -> Reader:
+        raise NotImplementedError
+
+
+class Column(Spec):
+    """A column, replaced by ``default`` when falsy"""
+    
+    def __init__(self, name: str, default: Any = _NO_DEFAULT):
+        self.name = name
+        self.default = default
+    
+    def reader(self, columns):
+        read = columns.reader(self.name)
+        if self.default is _NO_DEFAULT:
+            return read
+        default = _constant(self.default)
+        return lambda row: read(row) or default(row)
+
+
+class Const(Spec):
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def reader(self, columns):
+        return _constant(self.value)
+
+
+class Float(Spec):
+    """``float(column)``, or ``default`` when the column is falsy (if given)"""
+    
+    def __init__(self, name: str, default: Any = _NO_DEFAULT):
+        self.name = name
+        self.default = default
+    
+    def reader(self, columns):
+        read = columns.reader(self.name)
+        if self.default is _NO_DEFAULT:
+            return lambda row: float(read(row))
+        default = _constant(self.default)
+        
+        def to_float(row):
+            value = read(row)
+            return float(value) if value else default(row)
+        return to_float
+
+
+class Iso(Spec):
+    """ISO 8601 string of a date/time column (None when empty)"""
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def reader(self, columns):
+        read = columns.reader(self.name)
+        return lambda row: _iso(read(row))
+
+
+class Call(Spec):
+    """``func(*values)`` for values that need more than a conversion"""
+    
+    def __init__(self, func: Callable, *args):
+        self.func = func
+        self.args = args
+    
+    def reader(self, columns):
+        func = self.func
+        reads = [_reader(arg, columns) for arg in self.args]
+        return lambda row: func(*[read(row) for read in reads])
+
+
+class Attribute:
+    """
+    An NGSI-LD attribute; ``optional`` ones are left out when their value
+    (or the column named by ``optional``) is falsy
+    """
+    
+    optional: Union[bool, str] = False
+    value: Any = None
+    
+    def reader(self, columns: _Columns) -> Reader:
+        raise NotImplementedError
+
+
+class Property(Attribute):
+    def __init__(self, value, unit=None, observed_at: Optional[str] = None, optional: Union[bool, str] = False):
+        self.value = value
+        self.unit = unit
+        self.observed_at = observed_at
+        self.optional = optional
+    
+    def reader(self, columns):
+        read_value = _reader(self.value, columns)
+        extra = []
+        if self.unit is not None:
+            # Unit codes are constants unless given as a spec
+            unit = self.unit if isinstance(self.unit, Spec) else Const(self.unit)
+            extra.append(("unitCode", unit.reader(columns)))
+        if self.observed_at:
+            extra.append(("observedAt", Iso(self.observed_at).reader(columns)))
+        
+        if not extra:
+            return lambda row: {"type": "Property", "value": read_value(row)}
+        
+        def to_property(row):
+            attribute = {"type": "Property", "value": read_value(row)}
+            for key, read in extra:
+                attribute[key] = read(row)
+            return attribute
+        return to_property
+
+
+class GeoPoint(Attribute):
+    def __init__(self, longitude: str = 'longitude', latitude: str = 'latitude'):
+        self.longitude = longitude
+        self.latitude = latitude
+    
+    def reader(self, columns):
+        longitude = columns.reader(self.longitude)
+        latitude = columns.reader(self.latitude)
+        return lambda row: {
+            "type": "GeoProperty",
+            "value": {"type": "Point", "coordinates": [longitude(row), latitude(row)]},
+        }
+
+
+def Address(street=Column('address', ''), locality=Column('city', ''), country: str = 'VN') -> Property:
+    """PostalAddress property (``street=None`` leaves out streetAddress)"""
+    value = {}
+    if street is not None:
+        value['streetAddress'] = street
+    value['addressLocality'] = locality
+    value['addressCountry'] = Const(country)
+    return Property(value)
+
+
+class EntityId(Spec):
+    """``id_field`` when set, otherwise ``urn:ngsi-ld:<type>:<key>``"""
+    
+    def __init__(self, id_field: Optional[str] = 'entity_id', key: str = 'id'):
+        self.id_field = id_field
+        self.key = key
+    
+    def reader(self, columns):
+        prefix = f"urn:ngsi-ld:{columns.entity_type}:"
+        key = columns.reader(self.key)
+        if self.id_field is None:
+            return lambda row: prefix + str(key(row))
+        entity_id = columns.reader(self.id_field)
+        return lambda row: entity_id(row) or prefix + str(key(row))
+
+
+class EntityMapping:
+    """Column -> NGSI-LD entity mapping of one model, built into ``to_entity``"""
+    
+    def __init__(self, entity_type: str, attributes: Dict[str, Attribute], id: Spec = None):
+        self.entity_type = entity_type
+        self.attributes = attributes
+        columns = _Columns(entity_type)
+        
+        read_id = (id or EntityId()).reader(columns)
+        required = []
+        optional = []
+        for name, attribute in attributes.items():
+            if attribute.optional:
+                test = attribute.optional if isinstance(attribute.optional, str) else attribute.value
+                optional.append((name, _reader(test, columns), attribute.reader(columns)))
+            else:
+                required.append((name, attribute.reader(columns)))
+        
+        def to_entity(row: tuple) -> dict:
+            entity = {"@context": CONTEXT, "id": read_id(row), "type": entity_type}
+            for name, read in required:
+                entity[name] = read(row)
+            for name, test, read in optional:
+                if test(row):
+                    entity[name] = read(row)
+            return entity
+        
+        self.to_entity: Callable[[tuple], dict] = to_entity
+        self.columns = tuple(columns.names)
+        self._getter = attrgetter(*(name.replace('__', '.') for name in self.columns))
+    
+    def from_instance(self, instance) -> dict:
+        values = self._getter(instance)
+        return self.to_entity(values if len(self.columns) > 1 else (values,))
+    
+    def iter_entities(self, queryset, chunk_size: int = 2000) -> Iterator[dict]:
+        to_entity = self.to_entity
+        for row in queryset.values_list(*self.columns).iterator(chunk_size=chunk_size):
+            yield to_entity(row)
+    
+    def to_entities(self, queryset) -> List[dict]:
+        to_entity = self.to_entity
+        return [to_entity(row) for row in queryset.values_list(*self.columns)]
+
+
+class MappedNGSILDSerializer:
+    """
+    Base of NGSI-LD serializers defined by an ``EntityMapping``; mixed
+    into ``serializers.ModelSerializer`` subclasses as ``mapping``.
+    """
+    mapping: EntityMapping = None
+    
+    def to_representation(self, instance):
+        return self.mapping.from_instance(instance)
@@ -1,30 +1,264 @@
 """
 Orion-LD Context Broker client
 """
+import os
+import threading
 import requests
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Methods that are safe to retry on 5xx responses / read errors. POST is only
+# retried when the connection could not be established (request never sent).
+RETRY_METHODS = frozenset(['GET', 'HEAD', 'PATCH', 'PUT', 'DELETE', 'OPTIONS'])
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide pooled session used for all Orion-LD calls.
+    
+    The session is created lazily and re-created after a fork (Celery prefork
+    workers) so that pooled sockets are never shared between processes.
+    """
+    global _session, _session_pid
+    
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+    
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+    return _session
+
+
+def _build_session() -> requests.Session:
+    """Create a keep-alive session with bounded retries and a sized pool"""
+    max_retries = getattr(settings, 'ORION_LD_MAX_RETRIES', 3)
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=getattr(settings, 'ORION_LD_RETRY_BACKOFF', 0.5),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'ORION_LD_POOL_CONNECTIONS', 10),
+        pool_maxsize=getattr(settings, 'ORION_LD_POOL_MAXSIZE', 20),
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def reset_session():
+    """Close the pooled session (e.g. in tests or on settings change)"""
+    global _session, _session_pid
+    
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    Connection pool metrics for the current process.
+    
+    ``requests`` is the number of HTTP requests sent, ``connections`` the
+    number of TCP connections opened to serve them; everything else was
+    served from a kept-alive connection.
+    """
+    stats = {"requests": 0, "connections": 0, "reused": 0, "reuse_ratio": 0.0, "pools": 0}
+    
+    if _session is None or _session_pid != os.getpid():
+        return stats
+    
+    seen = set()
+    for adapter in _session.adapters.values():
+        if id(adapter) in seen:
+            continue
+        seen.add(id(adapter))
+        
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["pools"] += 1
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+    
+    stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+    if stats["requests"]:
+        stats["reuse_ratio"] = round(stats["reused"] / stats["requests"], 4)
+    return stats
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split an iterable into lists of at most ``size`` items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_timeout(operation: str = 'default') -> Tuple[float, float]:
+    """Return the (connect, read) timeout configured for an operation"""
+    timeouts = getattr(settings, 'ORION_LD_TIMEOUTS', {})
+    default = timeouts.get('default', (3.05, 10))
+    return tuple(timeouts.get(operation, default))
+
+
+def build_query_params(
+    entity_type: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    georel: Optional[str] = None,
+    geometry: Optional[str] = None,
+    coordinates: Optional[str] = None
+) -> Dict[str, Any]:
+    """Build query parameters for GET /ngsi-ld/v1/entities"""
+    params = {
+        "limit": limit,
+        "offset": offset
+    }
+    
+    if entity_type:
+        params["type"] = entity_type
+    
+    if q:
+        params["q"] = q
+    
+    if georel and geometry and coordinates:
+        params["georel"] = georel
+        params["geometry"] = geometry
+        params["coordinates"] = coordinates
+    
+    return params
+
+
+def build_temporal_params(
+    entity_id: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    time_rel: str = "between",
+    time_at: Optional[str] = None,
+    end_time_at: Optional[str] = None,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """Build query parameters for GET /ngsi-ld/v1/temporal/entities"""
+    params = {
+        "timerel": time_rel,
+        "limit": limit
+    }
+    
+    if entity_id:
+        params["id"] = entity_id
+    
+    if entity_type:
+        params["type"] = entity_type
+    
+    if time_at:
+        params["timeAt"] = time_at
+    
+    if end_time_at:
+        params["endTimeAt"] = end_time_at
+    
+    return params
+
+
+def parse_subscription_id(location: str) -> Optional[str]:
+    """Extract the subscription id from a Location header"""
+    return location.split('/')[-1] if location else None
+
+
+def merge_batch_result(
+    result: Dict[str, List],
+    response,
+    ids: List[str],
+    operation: str
+):
+    """
+    Merge one broker response (requests or httpx) into the accumulated
+    BatchOperationResult
+    """
+    # 201/204: every entity of the chunk was processed (201 bodies only
+    # list the newly created ids, updated ones are not repeated)
+    if response.status_code in (200, 201, 204):
+        result["success"].extend(ids)
+        return
+    
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    
+    # 207 Multi-Status (or 400 when everything failed) carries a
+    # BatchOperationResult with per-entity outcome
+    if isinstance(body, dict) and ("success" in body or "errors" in body):
+        result["success"].extend(body.get("success") or [])
+        result["errors"].extend(body.get("errors") or [])
+        return
+    
+    logger.error(
+        f"Batch {operation} failed with status {response.status_code}: {response.text}"
+    )
+    error = body if isinstance(body, dict) else {"title": response.text, "status": response.status_code}
+    result["errors"].extend({"entityId": entity_id, "error": error} for entity_id in ids)
+
 
 class OrionLDClient:
     """Client for interacting with Orion-LD Context Broker"""
     
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, session: requests.Session = None):
         self.base_url = base_url or settings.ORION_LD_URL
+        self.session = session or get_session()
         self.headers = {
             "Content-Type": "application/ld+json",
             "Accept": "application/ld+json"
         }
     
+    def _request(
+        self,
+        method: str,
+        url: str,
+        operation: str = 'default',
+        **kwargs
+    ) -> requests.Response:
+        """Send a request through the pooled session with the operation's timeout"""
+        kwargs.setdefault('headers', self.headers)
+        kwargs.setdefault('timeout', get_timeout(operation))
+        return self.session.request(method, url, **kwargs)
+    
     def create_entity(self, entity: Dict[str, Any]) -> bool:
         """Create a new entity in Orion-LD"""
         url = f"{self.base_url}/ngsi-ld/v1/entities"
         
         try:
-            response = requests.post(url, json=entity, headers=self.headers)
+            response = self._request('POST', url, json=entity)
             response.raise_for_status()
             logger.info(f"Created entity: {entity.get('id')}")
             return True
@@ -39,7 +273,7 @@ class OrionLDClient:
         url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._request('GET', url)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -55,7 +289,7 @@ class OrionLDClient:
         url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}/attrs"
         
         try:
-            response = requests.patch(url, json=attributes, headers=self.headers)
+            response = self._request('PATCH', url, json=attributes)
             response.raise_for_status()
             logger.info(f"Updated entity: {entity_id}")
             return True
@@ -68,7 +302,7 @@ class OrionLDClient:
         url = f"{self.base_url}/ngsi-ld/v1/entities/{entity_id}"
         
         try:
-            response = requests.delete(url, headers=self.headers)
+            response = self._request('DELETE', url)
             response.raise_for_status()
             logger.info(f"Deleted entity: {entity_id}")
             return True
@@ -76,6 +310,90 @@ class OrionLDClient:
             logger.error(f"Failed to delete entity {entity_id}: {e}")
             return False
     
+    def batch_create(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Create entities in batches (entityOperations/create)"""
+        return self._batch_operation('create', entities, chunk_size)
+    
+    def batch_upsert(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None,
+        replace: bool = False
+    ) -> Dict[str, List]:
+        """
+        Create or update entities in batches (entityOperations/upsert).
+        Existing entities get their attributes updated unless ``replace`` is set.
+        """
+        params = {"options": "replace" if replace else "update"}
+        return self._batch_operation('upsert', entities, chunk_size, params=params)
+    
+    def batch_update(
+        self,
+        entities: Iterable[Dict[str, Any]],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Update attributes of existing entities in batches (entityOperations/update)"""
+        return self._batch_operation('update', entities, chunk_size)
+    
+    def batch_delete(
+        self,
+        entity_ids: Iterable[str],
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, List]:
+        """Delete entities by id in batches (entityOperations/delete)"""
+        headers = dict(self.headers, **{"Content-Type": "application/json"})
+        return self._batch_operation('delete', entity_ids, chunk_size, headers=headers)
+    
+    def _batch_operation(
+        self,
+        operation: str,
+        items: Iterable[Any],
+        chunk_size: Optional[int] = None,
+        params: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Dict[str, List]:
+        """
+        Send ``items`` to an entityOperations endpoint in chunks.
+        
+        Returns a merged BatchOperationResult:
+        ``{"success": [entity ids], "errors": [{"entityId": ..., "error": {...}}]}``
+        """
+        url = f"{self.base_url}/ngsi-ld/v1/entityOperations/{operation}"
+        chunk_size = chunk_size or getattr(settings, 'ORION_LD_BATCH_SIZE', 100)
+        result = {"success": [], "errors": []}
+        
+        for chunk in chunked(items, chunk_size):
+            ids = [item if isinstance(item, str) else item.get('id') for item in chunk]
+            
+            try:
+                response = self._request(
+                    'POST',
+                    url,
+                    operation='batch',
+                    json=chunk,
+                    params=params,
+                    headers=headers or self.headers
+                )
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Batch {operation} of {len(chunk)} entities failed: {e}")
+                result["errors"].extend(
+                    {"entityId": entity_id, "error": {"title": str(e)}}
+                    for entity_id in ids
+                )
+                continue
+            
+            merge_batch_result(result, response, ids, operation)
+        
+        logger.info(
+            f"Batch {operation}: {len(result['success'])} succeeded, "
+            f"{len(result['errors'])} failed"
+        )
+        return result
+    
     def query_entities(
         self,
         entity_type: Optional[str] = None,
@@ -88,42 +406,57 @@ class OrionLDClient:
     ) -> List[Dict[str, Any]]:
         """Query entities from Orion-LD"""
         url = f"{self.base_url}/ngsi-ld/v1/entities"
-        
-        params = {
-            "limit": limit,
-            "offset": offset
-        }
-        
-        if entity_type:
-            params["type"] = entity_type
-        
-        if q:
-            params["q"] = q
-        
-        if georel and geometry and coordinates:
-            params["georel"] = georel
-            params["geometry"] = geometry
-            params["coordinates"] = coordinates
+        params = build_query_params(
+            entity_type, q, limit, offset, georel, geometry, coordinates
+        )
         
         try:
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self._request('GET', url, operation='query', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to query entities: {e}")
             return []
     
+    def iter_entities(
+        self,
+        entity_type: Optional[str] = None,
+        q: Optional[str] = None,
+        page_size: Optional[int] = None,
+        georel: Optional[str] = None,
+        geometry: Optional[str] = None,
+        coordinates: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream every matching entity, page by page.
+        
+        Unlike query_entities this never truncates at ``limit`` and never
+        holds more than two pages in memory. Broker errors are raised
+        instead of ending the stream early. ``context`` is sent as the
+        JSON-LD context Link header, so types and attributes outside the
+        core context are matched and returned by their short names.
+        """
+        url = f"{self.base_url}/ngsi-ld/v1/entities"
+        params = build_query_params(entity_type, q, georel=georel,
+                                    geometry=geometry, coordinates=coordinates)
+        headers = None
+        if context:
+            headers = dict(self.headers, Link=(
+                f'<{context}>; rel="http://www.w3.org/ns/json-ld#context"; type="application/ld+json"'
+            ))
+        return self._paginate(url, params, 'query', page_size, headers=headers)
+    
     def create_subscription(self, subscription: Dict[str, Any]) -> Optional[str]:
         """Create a subscription in Orion-LD"""
         url = f"{self.base_url}/ngsi-ld/v1/subscriptions"
         
         try:
-            response = requests.post(url, json=subscription, headers=self.headers)
+            response = self._request('POST', url, json=subscription)
             response.raise_for_status()
             
             # Get subscription ID from Location header
-            location = response.headers.get('Location', '')
-            subscription_id = location.split('/')[-1] if location else None
+            subscription_id = parse_subscription_id(response.headers.get('Location', ''))
             
             logger.info(f"Created subscription: {subscription_id}")
             return subscription_id
@@ -136,19 +469,31 @@ class OrionLDClient:
         url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
         
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._request('GET', url)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to get subscription {subscription_id}: {e}")
             return None
     
+    def subscription_exists(self, subscription_id: str) -> bool:
+        """
+        Whether Orion-LD still has a subscription. Unlike get_subscription,
+        only a 404 means False; other failures raise RequestException.
+        """
+        url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
+        response = self._request('GET', url)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+    
     def delete_subscription(self, subscription_id: str) -> bool:
         """Delete a subscription from Orion-LD"""
         url = f"{self.base_url}/ngsi-ld/v1/subscriptions/{subscription_id}"
         
         try:
-            response = requests.delete(url, headers=self.headers)
+            response = self._request('DELETE', url)
             response.raise_for_status()
             logger.info(f"Deleted subscription: {subscription_id}")
             return True
@@ -167,28 +512,86 @@ class OrionLDClient:
     ) -> List[Dict[str, Any]]:
         """Query temporal entities"""
         url = f"{self.base_url}/ngsi-ld/v1/temporal/entities"
-        
-        params = {
-            "timerel": time_rel,
-            "limit": limit
-        }
-        
-        if entity_id:
-            params["id"] = entity_id
-        
-        if entity_type:
-            params["type"] = entity_type
-        
-        if time_at:
-            params["timeAt"] = time_at
-        
-        if end_time_at:
-            params["endTimeAt"] = end_time_at
+        params = build_temporal_params(
+            entity_id, entity_type, time_rel, time_at, end_time_at, limit
+        )
         
         try:
-            response = requests.get(url, params=params, headers=self.headers)
+            response = self._request('GET', url, operation='temporal', params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to query temporal entities: {e}")
             return []
+    
+    def iter_temporal_entities(
+        self,
+        entity_id: Optional[str] = None,
+        entity_type: Optional[str] = None,
+        time_rel: str = "between",
+        time_at: Optional[str] = None,
+        end_time_at: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream every matching temporal entity, page by page (see iter_entities)"""
+        url = f"{self.base_url}/ngsi-ld/v1/temporal/entities"
+        params = build_temporal_params(entity_id, entity_type, time_rel, time_at, end_time_at)
+        return self._paginate(url, params, 'temporal', page_size)
+    
+    def _fetch_page(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        operation: str,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[int], Optional[str]]:
+        """Fetch one page; returns (entities, total count, next page URL)"""
+        response = self._request('GET', url, operation=operation, params=params,
+                                 headers=headers or self.headers)
+        response.raise_for_status()
+        
+        total = response.headers.get('NGSILD-Results-Count')
+        next_link = response.links.get('next', {}).get('url')
+        return (
+            response.json(),
+            int(total) if total is not None else None,
+            urljoin(url, next_link) if next_link else None
+        )
+    
+    def _paginate(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        operation: str,
+        page_size: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Follow ``Link: rel="next"`` headers when the broker sends them,
+        otherwise ``offset`` + ``count=true``. The next page is requested in
+        the background while the current one is being consumed.
+        """
+        page_size = page_size or getattr(settings, 'ORION_LD_PAGE_SIZE', 500)
+        params = dict(params, limit=page_size, offset=0, count="true")
+        
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._fetch_page, url, params, operation, headers)
+            offset = 0
+            
+            while future is not None:
+                try:
+                    entities, total, next_url = future.result()
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"Failed to fetch page at offset {offset} of {url}: {e}")
+                    raise
+                
+                offset += len(entities)
+                future = None
+                
+                if next_url:
+                    future = executor.submit(self._fetch_page, next_url, None, operation, headers)
+                elif entities and (offset < total if total is not None else len(entities) >= page_size):
+                    next_params = dict(params, offset=offset)
+                    future = executor.submit(self._fetch_page, url, next_params, operation, headers)
+                
+                yield from entities
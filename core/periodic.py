@@ -0,0 +1,63 @@
+"""
+Periodic flushing of in-process write buffers
+
+Counters and timestamps coalesced in memory (device key ``last_used``,
+API key usage) must reach the database even when no further request
+arrives to trigger a flush. ``FlushTimer`` runs the flush every
+``interval`` seconds from a daemon thread, started lazily in each process
+that buffers something (threads do not survive a fork, so gunicorn and
+Celery prefork children start their own). It also flushes when a Celery
+pool process shuts down and on interpreter exit; a hard-killed process
+loses at most one interval.
+"""
+import atexit
+import os
+import threading
+from typing import Callable
+from celery.signals import worker_process_shutdown
+from django.db import connection
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FlushTimer:
+    def __init__(self, flush: Callable[[], int], interval: float, name: str):
+        self.flush = flush
+        self.interval = interval
+        self.name = name
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        atexit.register(self._flush)
+        worker_process_shutdown.connect(self._on_shutdown, weak=False)
+    
+    def ensure_started(self):
+        """Start the flush thread of this process (cheap when already running)"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name=self.name, daemon=True).start()
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def _run(self):
+        pid = os.getpid()
+        while not self._stopped.wait(self.interval) and self._pid == pid:
+            self._flush()
+            # The thread's own connection; do not keep it open between flushes
+            connection.close()
+    
+    def _flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"{self.name} flush failed: {e}")
+    
+    def _on_shutdown(self, **kwargs):
+        self._flush()
@@ -0,0 +1,123 @@
+"""
+Optional PostGIS backend for geo queries
+
+When GEO_BACKEND is "postgis", every located model gets a ``geo_point``
+geography(Point, 4326) column generated from latitude/longitude, with a GiST
+index (created by ``manage.py setup_postgis``). Geo filters then run as
+ST_DWithin / ST_Intersects on that column instead of the geohash pre-filter.
+"""
+from typing import List
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+GEO_POINT_COLUMN = 'geo_point'
+
+# Models mirrored into a geography column
+POSTGIS_MODELS = [
+    'entities.Entity',
+    'entities.WeatherStation',
+    'entities.AirQualitySensor',
+    'entities.TrafficSensor',
+    'entities.PublicService',
+    'traffic.BusStation',
+    'traffic.TrafficFlow',
+    'traffic.TrafficIncident',
+    'traffic.ParkingSpot',
+    'infrastructure.WaterSupplyPoint',
+    'infrastructure.DrainagePoint',
+    'infrastructure.StreetLight',
+    'infrastructure.EnergyMeter',
+    'infrastructure.TelecomTower',
+]
+
+
+def postgis_enabled(model=None) -> bool:
+    """True when geo queries (for ``model``) should use PostGIS"""
+    if getattr(settings, 'GEO_BACKEND', 'geohash') != 'postgis':
+        return False
+    if connection.vendor != 'postgresql':
+        return False
+    return model is None or model._meta.label in POSTGIS_MODELS
+
+
+def _column(model) -> str:
+    qn = connection.ops.quote_name
+    return f"{qn(model._meta.db_table)}.{qn(GEO_POINT_COLUMN)}"
+
+
+def within_distance(model, latitude: float, longitude: float, meters: float) -> RawSQL:
+    """Filter expression: row within ``meters`` of a point (uses the GiST index)"""
+    return RawSQL(
+        f"ST_DWithin({_column(model)}, "
+        f"ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s)",
+        (longitude, latitude, meters),
+        output_field=BooleanField()
+    )
+
+
+def distance_km(model, latitude: float, longitude: float) -> RawSQL:
+    """Expression: geodesic distance in km from a point to each row"""
+    return RawSQL(
+        f"ST_Distance({_column(model)}, "
+        f"ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography) / 1000.0",
+        (longitude, latitude),
+        output_field=FloatField()
+    )
+
+
+def intersects(model, geometry: dict, negate: bool = False) -> RawSQL:
+    """
+    Filter expression: row point intersects a GeoJSON geometry (uses the
+    GiST index). For point rows this also answers within and equals;
+    ``negate`` gives disjoint.
+    """
+    return RawSQL(
+        f"{'NOT ' if negate else ''}ST_Intersects({_column(model)}, "
+        f"ST_SetSRID(ST_GeomFromGeoJSON(%s), 4326)::geography)",
+        (json.dumps(geometry),),
+        output_field=BooleanField()
+    )
+
+
+def setup_postgis(drop: bool = False) -> List[str]:
+    """
+    Create (or drop) the geo_point mirror column and GiST index on every
+    model in POSTGIS_MODELS. Idempotent; returns the affected tables.
+    """
+    qn = connection.ops.quote_name
+    tables = []
+    
+    with connection.cursor() as cursor:
+        if not drop:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+        
+        for label in POSTGIS_MODELS:
+            model = apps.get_model(label)
+            table = model._meta.db_table
+            index = f"{table}_{GEO_POINT_COLUMN}_gist"
+            
+            if drop:
+                cursor.execute(f"DROP INDEX IF EXISTS {qn(index)}")
+                cursor.execute(f"ALTER TABLE {qn(table)} DROP COLUMN IF EXISTS {qn(GEO_POINT_COLUMN)}")
+            else:
+                cursor.execute(
+                    f"ALTER TABLE {qn(table)} ADD COLUMN IF NOT EXISTS {qn(GEO_POINT_COLUMN)} "
+                    f"geography(Point, 4326) GENERATED ALWAYS AS ("
+                    f"ST_SetSRID(ST_MakePoint({qn('longitude')}, {qn('latitude')}), 4326)::geography"
+                    f") STORED"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {qn(index)} "
+                    f"ON {qn(table)} USING GIST ({qn(GEO_POINT_COLUMN)})"
+                )
+            tables.append(table)
+            logger.info(f"{'Dropped' if drop else 'Created'} {GEO_POINT_COLUMN} on {table}")
+    
+    return tables
@@ -0,0 +1,307 @@
+"""
+Local evaluation of NGSI-LD q queries and attrs projection over Entity.data
+
+Supported ``q`` syntax (NGSI-LD 4.9)::
+
+    availableSpotNumber>10
+    status=="open";totalSpotNumber>=50          ; is AND
+    category=="parking"|category=="garage"      | is OR (AND binds tighter)
+    (status=="open"|status=="full");capacity>0  parentheses group
+    totalSpotNumber==10..100                    range (inclusive)
+    category=="parking","garage"                any of
+    name~="^Bai.*"                              regular expression (!~= negates)
+    address[addressLocality]=="Hanoi"           path into a structured value
+    temperature.observedAt>2026-01-01T00:00:00Z attribute metadata / sub-property
+    refDevice                                   attribute exists
+
+A term compares the attribute's ``value`` (``object`` for Relationships
+on string equality). Equality is compiled to jsonb containment
+(``data @> '{...}'``) on PostgreSQL, which the GIN ``jsonb_path_ops``
+index on Entity.data serves; other comparisons use jsonb key paths.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.fields.json import KeyTransform
+
+# Keys of an attribute itself rather than of a sub-property
+ATTRIBUTE_KEYS = ('observedAt', 'unitCode', 'datasetId', 'createdAt', 'modifiedAt', 'lang')
+IDENTITY_KEYS = ('@context', 'id', 'type')
+
+_ATTRIBUTE = re.compile(r'\s*([^\s.\[\]();|=!<>~,"]+(?:\.[^\s.\[\]();|=!<>~,"]+)*)(?:\[([^\]]+)\])?\s*')
+_OPERATOR = re.compile(r'(!~=|~=|==|!=|>=|<=|>|<)')
+_NUMBER = re.compile(r'-?\d+(\.\d+)?([eE][+-]?\d+)?$')
+
+
+class QueryLanguageError(ValueError):
+    """Invalid or unsupported NGSI-LD q query"""
+
+
+class Term:
+    """``path operator value``: path keys from the top of Entity.data down to the compared value"""
+    
+    def __init__(self, path: List[str], operator: Optional[str] = None, value: Any = None):
+        self.path = path
+        self.operator = operator
+        self.value = value
+        # What must exist for the term to apply: the (sub-)attribute itself
+        self.attribute = path[:-1] if path[-1] == 'value' else path
+    
+    def __repr__(self):
+        return f"Term({'.'.join(self.path)} {self.operator or 'exists'} {self.value!r})"
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+    
+    def error(self, message: str) -> QueryLanguageError:
+        return QueryLanguageError(f"{message} at position {self.pos} of q")
+    
+    def peek(self) -> str:
+        while self.pos < len(self.text) and self.text[self.pos].isspace():
+            self.pos += 1
+        return self.text[self.pos] if self.pos < len(self.text) else ''
+    
+    def parse(self):
+        node = self.parse_or()
+        if self.peek():
+            raise self.error(f"Unexpected {self.peek()!r}")
+        return node
+    
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == '|':
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+    
+    def parse_and(self):
+        nodes = [self.parse_primary()]
+        while self.peek() == ';':
+            self.pos += 1
+            nodes.append(self.parse_primary())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+    
+    def parse_primary(self):
+        if self.peek() == '(':
+            self.pos += 1
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise self.error("Missing ')'")
+            self.pos += 1
+            return node
+        return self.parse_term()
+    
+    def parse_term(self) -> Term:
+        match = _ATTRIBUTE.match(self.text, self.pos)
+        if not match:
+            raise self.error("Expected an attribute name")
+        self.pos = match.end()
+        path = attribute_path(match.group(1), match.group(2))
+        
+        operator = _OPERATOR.match(self.text, self.pos)
+        if not operator:
+            return Term(path)
+        self.pos = operator.end()
+        return Term(path, operator.group(1), self.parse_value(operator.group(1)))
+    
+    def parse_value(self, operator: str):
+        """Value text up to the next unquoted ``;``, ``|`` or ``)``"""
+        start = self.pos
+        quoted = False
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == '\\' and quoted:
+                self.pos += 2
+                continue
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char in ';|)':
+                break
+            self.pos += 1
+        if quoted:
+            raise self.error("Unterminated string")
+        raw = self.text[start:self.pos].strip()
+        if not raw:
+            raise self.error(f"Missing value after {operator}")
+        
+        if operator in ('~=', '!~='):
+            return _unquote(raw) if raw.startswith('"') else raw
+        values = _split(raw, ',')
+        if len(values) > 1:
+            if operator not in ('==', '!='):
+                raise self.error("Value lists are only allowed with == and !=")
+            return [parse_scalar(value) for value in values]
+        bounds = _split(raw, '..')
+        if len(bounds) == 2:
+            if operator not in ('==', '!='):
+                raise self.error("Ranges are only allowed with == and !=")
+            return tuple(parse_scalar(bound) for bound in bounds)
+        return parse_scalar(raw)
+
+
+def _split(raw: str, separator: str) -> List[str]:
+    """Split on ``separator`` outside double quotes"""
+    parts, start, quoted, i = [], 0, False, 0
+    while i < len(raw):
+        if raw[i] == '\\' and quoted:
+            i += 2
+            continue
+        if raw[i] == '"':
+            quoted = not quoted
+        elif not quoted and raw.startswith(separator, i):
+            parts.append(raw[start:i].strip())
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    parts.append(raw[start:].strip())
+    return parts
+
+
+def _unquote(raw: str) -> str:
+    if len(raw) < 2 or not raw.endswith('"'):
+        raise QueryLanguageError(f"Invalid string {raw}")
+    return re.sub(r'\\(.)', r'\1', raw[1:-1])
+
+
+def parse_scalar(raw: str) -> Any:
+    """Quoted string, number, true/false, or an unquoted literal (e.g. a dateTime) as a string"""
+    if not raw:
+        raise QueryLanguageError("Empty value in q")
+    if raw.startswith('"'):
+        return _unquote(raw)
+    if raw in ('true', 'false'):
+        return raw == 'true'
+    if _NUMBER.match(raw):
+        number = float(raw)
+        return int(number) if number.is_integer() and '.' not in raw and 'e' not in raw.lower() else number
+    return raw
+
+
+def attribute_path(attribute: str, value_path: Optional[str] = None) -> List[str]:
+    """
+    Keys of Entity.data a q attribute refers to: ``a`` -> a.value,
+    ``a.observedAt`` -> a.observedAt, ``a.b`` (sub-property) -> a.b.value,
+    ``a[x.y]`` -> a.value.x.y.
+    """
+    names = attribute.split('.')
+    path = [names[0]]
+    for name in names[1:]:
+        if name in ATTRIBUTE_KEYS and value_path is None:
+            return path + [name]
+        path.append(name)
+    path.append('value')
+    if value_path:
+        path.extend(key.strip() for key in value_path.split('.'))
+    return path
+
+
+def parse_q(q: str):
+    """Parse a q expression into nested ('and'|'or', [...]) tuples of Terms"""
+    if not q or not q.strip():
+        raise QueryLanguageError("q is empty")
+    return _Parser(q).parse()
+
+
+class _Compiler:
+    """Turns parsed q terms into Q objects for one queryset"""
+    
+    def __init__(self, queryset: models.QuerySet, field: str = 'data'):
+        self.queryset = queryset
+        self.field = field
+        # jsonb @> is what the GIN jsonb_path_ops index serves
+        self.containment = connections[queryset.db].vendor == 'postgresql'
+    
+    def key(self, path: List[str]):
+        expression = self.field
+        for key in path:
+            expression = KeyTransform(key, expression)
+        return expression.resolve_expression(self.queryset.query)
+    
+    def lookup(self, path: List[str], lookup: str, value: Any) -> Q:
+        expression = self.key(path)
+        return Q(expression.get_lookup(lookup)(expression, value))
+    
+    def exists(self, path: List[str]) -> Q:
+        if len(path) == 1:
+            return Q(**{f"{self.field}__has_key": path[0]})
+        parent = self.key(path[:-1])
+        return Q(parent.get_lookup('has_key')(parent, path[-1]))
+    
+    def equals(self, path: List[str], value: Any) -> Q:
+        paths = [path]
+        if path[-1] == 'value' and isinstance(value, str):
+            paths.append(path[:-1] + ['object'])  # Relationship
+        condition = Q()
+        for candidate in paths:
+            if self.containment:
+                document = value
+                for key in reversed(candidate):
+                    document = {key: document}
+                condition |= Q(**{f"{self.field}__contains": document})
+            else:
+                # Guarded so a missing key is false rather than NULL under negation
+                condition |= self.exists(candidate) & self.lookup(candidate, 'exact', value)
+        return condition
+    
+    def match(self, term: Term) -> Q:
+        """Condition for the positive form of a term (``!=``/``!~=`` as ``==``/``~=``)"""
+        value = term.value
+        if term.operator in ('==', '!='):
+            if isinstance(value, list):
+                condition = Q()
+                for item in value:
+                    condition |= self.equals(term.path, item)
+                return condition
+            if isinstance(value, tuple):
+                low, high = value
+                return self.lookup(term.path, 'gte', low) & self.lookup(term.path, 'lte', high)
+            return self.equals(term.path, value)
+        if term.operator in ('~=', '!~='):
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise QueryLanguageError(f"Invalid regular expression {value!r}: {e}")
+            return self.lookup(term.path, 'regex', value)
+        lookup = {'>': 'gt', '>=': 'gte', '<': 'lt', '<=': 'lte'}[term.operator]
+        return self.lookup(term.path, lookup, value)
+    
+    def compile(self, node) -> Q:
+        if isinstance(node, Term):
+            if node.operator is None:
+                return self.exists(node.attribute)
+            if node.operator in ('!=', '!~='):
+                # NGSI-LD: the attribute must exist with a non-matching value
+                return self.exists(node.attribute) & ~self.match(node)
+            return self.match(node)
+        
+        operator, children = node
+        condition = Q()
+        for child in children:
+            compiled = self.compile(child)
+            condition = (condition & compiled) if operator == 'and' else (condition | compiled)
+        return condition
+
+
+def apply_q(queryset: models.QuerySet, q: str, field: str = 'data') -> models.QuerySet:
+    """Filter a queryset of NGSI-LD documents (in JSON ``field``) with a q expression"""
+    return queryset.filter(_Compiler(queryset, field).compile(parse_q(q)))
+
+
+def parse_attrs(attrs: Optional[str]) -> Optional[List[str]]:
+    """``attrs=a,b`` -> ['a', 'b'] (None when not given)"""
+    if not attrs:
+        return None
+    return [name.strip() for name in attrs.split(',') if name.strip()]
+
+
+def project(data: Dict[str, Any], attrs: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Entity with only its identity keys and ``attrs`` (all attributes for None)"""
+    if attrs is None:
+        return data
+    keep = set(attrs).union(IDENTITY_KEYS)
+    return {key: value for key, value in data.items() if key in keep}
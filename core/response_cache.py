@@ -0,0 +1,155 @@
+"""
+Shared response cache for public read-only GET endpoints
+
+``CachedResponseMixin`` stores the rendered body of anonymous GET requests
+to selected viewset actions in the Django cache (Redis in deployments).
+Keys cover the path, query params, ``Accept`` header and format, plus a
+per-model version that ``invalidate_responses`` bumps on every write.
+
+Entries carry an ETag and Last-Modified, so clients revalidating with
+``If-None-Match``/``If-Modified-Since`` get a 304. Each entry is fresh
+for RESPONSE_CACHE_TTL seconds and then served stale for up to
+RESPONSE_CACHE_STALE_TTL more while one request (holding a short lock)
+recomputes it, so a hot key expiring does not send every request to
+the database at once.
+"""
+import hashlib
+import time
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+
+# Request headers that make a response user-specific (or may fail authentication)
+CREDENTIAL_HEADERS = ('HTTP_AUTHORIZATION', 'HTTP_X_DEVICE_API_KEY')
+
+LOCK_POLL_INTERVAL = 0.05  # seconds between checks while another request fills a key
+
+
+def version_key(model) -> str:
+    return f"response-version:{model._meta.label_lower}"
+
+
+def invalidate_responses(model):
+    """Orphan every cached response built from ``model``"""
+    cache.set(version_key(model), time.time_ns(), None)
+
+
+def response_key(model, request, format: Optional[str] = None) -> str:
+    """Cache key of a request: path, sorted query params, Accept header and format suffix"""
+    version = cache.get(version_key(model), 0)
+    parts = [
+        request.path,
+        repr(sorted(request.GET.lists())),
+        request.META.get('HTTP_ACCEPT', '').strip(),
+        format or '',
+    ]
+    digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+    return f"response:{model._meta.label_lower}:{version}:{digest}"
+
+
+def _not_modified(request, entry: dict) -> bool:
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or entry['etag'] in etags or f"W/{entry['etag']}" in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(entry['last_modified']) <= if_modified_since
+
+
+def _build_response(request, entry: dict, status: str) -> HttpResponse:
+    if _not_modified(request, entry):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    response['X-Cache'] = status
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+class CachedResponseMixin:
+    """
+    Serve ``cached_actions`` of a viewset from the shared response cache.
+    
+    Only anonymous GET requests are cached; requests carrying credentials,
+    ``?stream=`` exports and non-200 responses always go through the view.
+    """
+    cached_actions = ('list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail')
+    
+    def get_cache_model(self):
+        return self.queryset.model
+    
+    def is_cacheable(self, request) -> bool:
+        if request.method != 'GET' or not getattr(settings, 'RESPONSE_CACHE_TTL', 0):
+            return False
+        if self.action_map.get('get') not in self.cached_actions:
+            return False
+        if 'stream' in request.GET:
+            return False  # streamed exports are never stored
+        return not any(request.META.get(header) for header in CREDENTIAL_HEADERS)
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        
+        key = response_key(self.get_cache_model(), request, kwargs.get('format'))
+        entry = cache.get(key)
+        now = time.time()
+        if entry is not None and entry['fresh_until'] > now:
+            return _build_response(request, entry, 'HIT')
+        
+        lock_key = f"{key}:lock"
+        lock_timeout = settings.RESPONSE_CACHE_LOCK_TIMEOUT
+        locked = cache.add(lock_key, 1, lock_timeout)
+        if not locked:
+            if entry is not None:
+                return _build_response(request, entry, 'STALE')
+            # Another request is computing this key: wait for its result, or
+            # until it releases the lock without one (errors are not stored)
+            deadline = now + lock_timeout
+            while time.time() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _build_response(request, entry, 'HIT')
+                if cache.get(lock_key) is None:
+                    locked = cache.add(lock_key, 1, lock_timeout)
+                    break
+        
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            entry = self.store_response(key, response, entry)
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        if entry is None:
+            return response
+        return _build_response(request, entry, 'MISS')
+    
+    def store_response(self, key: str, response, previous: Optional[dict]) -> Optional[dict]:
+        """Render and cache a 200 response; returns the entry (None if not cacheable)"""
+        if response.status_code != 200 or response.streaming:
+            return None
+        if hasattr(response, 'render'):
+            response.render()
+        
+        content = response.content
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        now = time.time()
+        # An unchanged body keeps its Last-Modified across re-computations
+        last_modified = previous['last_modified'] if previous and previous['etag'] == etag else now
+        ttl = settings.RESPONSE_CACHE_TTL
+        entry = {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'etag': etag,
+            'last_modified': last_modified,
+            'fresh_until': now + ttl,
+        }
+        cache.set(key, entry, ttl + settings.RESPONSE_CACHE_STALE_TTL)
+        return entry
@@ -0,0 +1,107 @@
+"""
+Streaming NGSI-LD exports
+
+``ngsi_ld_response`` answers an ``ngsi_ld`` list action. By default it
+returns the usual DRF response. With ``?stream=json`` (a JSON-LD array)
+or ``?stream=ndjson`` (one entity per line), rows are read with
+``queryset.iterator(chunk_size=...)``, serialized one at a time and
+written out in buffered chunks, so memory stays flat however large the
+export is. Streams are gzip-compressed when the client accepts gzip.
+
+Serializers with a ``mapping`` (see ``core.ngsi_ld_mapping``) are fed
+``values_list`` rows instead of model instances.
+"""
+from typing import Iterable, Iterator
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_FORMATS = {
+    'json': 'application/ld+json',
+    'ndjson': 'application/x-ndjson',
+}
+
+BUFFER_SIZE = 64 * 1024  # bytes collected before a chunk is sent
+
+# Same output as DRF's JSONRenderer (compact, UTF-8)
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_entities(queryset, serializer_class, chunk_size: int) -> Iterator[dict]:
+    mapping = getattr(serializer_class, 'mapping', None)
+    if mapping is not None:
+        yield from mapping.iter_entities(queryset, chunk_size)
+        return
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield serializer_class(instance).data
+
+
+def _buffered(parts: Iterable[str]) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def json_array(entities: Iterable[dict]) -> Iterator[str]:
+    yield '['
+    for index, entity in enumerate(entities):
+        yield _encoder.encode(entity) if index == 0 else ',' + _encoder.encode(entity)
+    yield ']'
+
+
+def ndjson(entities: Iterable[dict]) -> Iterator[str]:
+    for entity in entities:
+        yield _encoder.encode(entity) + '\n'
+
+
+def get_stream_format(request):
+    """Validated ``?stream=`` format, or None when the response is not streamed"""
+    stream_format = request.query_params.get('stream')
+    if stream_format and stream_format not in STREAM_FORMATS:
+        raise ValidationError({"error": f"stream must be one of: {', '.join(STREAM_FORMATS)}"})
+    return stream_format or None
+
+
+def stream_ngsi_ld(request, queryset, serializer_class, stream_format: str) -> StreamingHttpResponse:
+    """Stream ``queryset`` serialized with ``serializer_class`` as a JSON-LD array or NDJSON"""
+    chunk_size = getattr(settings, 'NGSI_LD_STREAM_CHUNK_SIZE', 2000)
+    return stream_entities(request, iter_entities(queryset, serializer_class, chunk_size), stream_format)
+
+
+def stream_entities(request, entities: Iterable[dict], stream_format: str) -> StreamingHttpResponse:
+    """Stream already-built entities (e.g. straight from Orion-LD) as a JSON-LD array or NDJSON"""
+    parts = json_array(entities) if stream_format == 'json' else ndjson(entities)
+    content = _buffered(parts)
+    
+    gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if gzip:
+        content = compress_sequence(content)
+    
+    response = StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def ngsi_ld_response(request, queryset, serializer_class):
+    """Full NGSI-LD list response, streamed when ``?stream=json|ndjson`` is given"""
+    stream_format = get_stream_format(request)
+    if not stream_format:
+        mapping = getattr(serializer_class, 'mapping', None)
+        if mapping is not None:
+            # Mapping: rows straight from values_list, no model instances
+            return Response(mapping.to_entities(queryset), content_type='application/ld+json')
+        serializer = serializer_class(queryset, many=True)
+        return Response(serializer.data, content_type='application/ld+json')
+    return stream_ngsi_ld(request, queryset, serializer_class, stream_format)
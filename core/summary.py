@@ -0,0 +1,46 @@
+"""
+Single-query dashboard aggregates, cached per city
+
+Summary and statistics endpoints aggregate each model with one query of
+conditional aggregates (``Count(filter=Q(...))``, ``Sum``) and cache the
+result per (namespace, city) for SUMMARY_CACHE_TTL seconds. Writes to a
+namespace's models bump its version (see the apps' signals), which
+orphans every cached entry of that namespace at once.
+"""
+import time
+from typing import Callable, Optional
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+
+def version_key(namespace: str) -> str:
+    return f"summary-version:{namespace}"
+
+
+def cached_summary(namespace: str, name: str, city: Optional[str], compute: Callable[[], dict]) -> dict:
+    """Return the cached result of ``compute()`` for a city, computing it on a miss"""
+    version = cache.get(version_key(namespace), 0)
+    city_key = quote((city or '').strip().lower())
+    key = f"summary:{namespace}:{name}:{city_key}:{version}"
+    
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, getattr(settings, 'SUMMARY_CACHE_TTL', 30))
+    return result
+
+
+def invalidate_summaries(namespace: str):
+    """Drop every cached summary of a namespace"""
+    cache.set(version_key(namespace), time.time_ns(), None)
+
+
+def filter_city(queryset, city: Optional[str]):
+    return queryset.filter(city__icontains=city) if city else queryset
+
+
+def count_if(**filters) -> Count:
+    """Count of rows matching ``filters``, for use in a single ``aggregate()``"""
+    return Count('pk', filter=Q(**filters))
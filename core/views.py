@@ -2,7 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .ngsi_ld import NGSILDContext
-from .orion_client import OrionLDClient
+from .orion_client import OrionLDClient, get_pool_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,4 +36,6 @@ class HealthCheckView(APIView):
             health_status["services"]["orion_ld"] = "unhealthy"
             health_status["status"] = "degraded"
         
+        health_status["orion_ld_pool"] = get_pool_stats()
+        
         return Response(health_status)
@@ -4,7 +4,9 @@ from .models import (
     WeatherStation,
     AirQualitySensor,
     TrafficSensor,
-    PublicService
+    PublicService,
+    OrionOutbox,
+    OrionSubscription
 )
 
 
@@ -42,3 +44,18 @@ class PublicServiceAdmin(admin.ModelAdmin):
     list_display = ['name', 'service_type', 'latitude', 'longitude', 'is_active']
     list_filter = ['service_type', 'is_active']
     search_fields = ['name', 'service_id', 'address']
+
+
+@admin.register(OrionOutbox)
+class OrionOutboxAdmin(admin.ModelAdmin):
+    list_display = ['entity_id', 'operation', 'status', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['operation', 'status']
+    search_fields = ['entity_id', 'last_error']
+    readonly_fields = ['created_at']
+
+
+@admin.register(OrionSubscription)
+class OrionSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['entity_type', 'subscription_id', 'notifications', 'last_notification_at', 'updated_at']
+    search_fields = ['entity_type', 'subscription_id']
+    readonly_fields = ['created_at', 'updated_at']
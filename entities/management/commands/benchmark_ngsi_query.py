@@ -0,0 +1,82 @@
+"""
+Management command to benchmark local NGSI-LD q queries against Orion-LD
+"""
+import time
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from core.orion_client import OrionLDClient
+from core.qlanguage import QueryLanguageError, apply_q, parse_attrs, parse_q, project
+from entities.models import Entity
+from entities.reconcile import QUERY_CONTEXT
+
+# (entity type, q) pairs measured when none are given
+DEFAULT_QUERIES = [
+    ('OffStreetParking', 'availableSpotNumber>10'),
+    ('OffStreetParking', 'availableSpotNumber==0..5;totalSpotNumber>=50'),
+    ('Streetlight', 'status=="on"|status=="defective"'),
+    ('WeatherObserved', 'temperature>30;relativeHumidity>=0.8'),
+]
+
+
+def _best(func, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure NGSI-LD q queries evaluated locally on Entity.data (jsonb) '
+        'versus the same queries sent to Orion-LD'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='entity_type', help='Entity type of --q (default: the built-in query set)')
+        parser.add_argument('--q', help='q expression to measure')
+        parser.add_argument('--attrs', help='attrs projection (applied to local results only)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is kept')
+        parser.add_argument('--local-only', action='store_true', help='Do not query Orion-LD')
+
+    def handle(self, *args, **options):
+        if options['q']:
+            if not options['entity_type']:
+                raise CommandError('--q requires --type')
+            queries = [(options['entity_type'], options['q'])]
+        else:
+            queries = DEFAULT_QUERIES
+        attrs = parse_attrs(options['attrs'])
+        repeat = options['repeat']
+        client = None if options['local_only'] else OrionLDClient()
+
+        self.stdout.write(f"{'type':<20}{'local rows':>11}{'local ms':>10}{'broker rows':>12}{'broker ms':>11}{'speedup':>9}  q")
+        for entity_type, q in queries:
+            try:
+                parse_q(q)
+            except QueryLanguageError as e:
+                raise CommandError(f"{q}: {e}")
+
+            def local():
+                rows = apply_q(Entity.objects.filter(entity_type=entity_type), q).values_list('data', flat=True)
+                return [project(data, attrs) for data in rows]
+
+            local_time, local_rows = _best(local, repeat)
+            line = f"{entity_type:<20}{len(local_rows):>11}{local_time * 1000:>10.1f}"
+
+            if client is None:
+                self.stdout.write(f"{line}{'-':>12}{'-':>11}{'-':>9}  {q}")
+                continue
+            try:
+                broker_time, broker_rows = _best(lambda: list(client.iter_entities(entity_type, q=q, context=QUERY_CONTEXT)), repeat)
+            except requests.exceptions.RequestException as e:
+                self.stdout.write(f"{line}{'error':>12}{'-':>11}{'-':>9}  {q} ({e.__class__.__name__})")
+                continue
+            self.stdout.write(
+                f"{line}{len(broker_rows):>12}{broker_time * 1000:>11.1f}"
+                f"{broker_time / local_time:>8.1f}x  {q}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,32 @@
+"""
+Management command to send pending Orion-LD writes from the outbox
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from entities.models import OrionOutbox
+from entities.outbox import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Send pending Orion-LD writes from the outbox (optionally retrying failed ones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows claimed per batch')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches')
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Requeue rows that gave up after ORION_OUTBOX_MAX_ATTEMPTS first'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = OrionOutbox.objects.filter(status='failed').update(
+                status='pending', attempts=0, next_attempt_at=timezone.now()
+            )
+            self.stdout.write(f"Requeued {requeued} failed rows")
+
+        result = dispatch(options['batch_size'], options['max_batches'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Delivered {result['delivered']} writes, {result['retried']} to retry, {result['failed']} failed"
+        ))
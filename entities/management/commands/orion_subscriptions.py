@@ -0,0 +1,26 @@
+"""
+Management command to register (or remove) the Orion-LD subscriptions
+"""
+from django.core.management.base import BaseCommand
+from entities.subscriptions import ensure_subscriptions, remove_subscriptions
+
+
+class Command(BaseCommand):
+    help = 'Register one Orion-LD subscription per entity type in ORION_SUBSCRIPTIONS (or remove them all)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--remove', action='store_true', help='Delete every registered subscription')
+
+    def handle(self, *args, **options):
+        if options['remove']:
+            removed = remove_subscriptions()
+            self.stdout.write(self.style.SUCCESS(f"Removed {removed} subscriptions"))
+            return
+
+        result = ensure_subscriptions()
+        for outcome in ('created', 'kept', 'removed', 'failed'):
+            if result[outcome]:
+                self.stdout.write(f"{outcome}: {', '.join(result[outcome])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['created'])} subscriptions created, {len(result['kept'])} kept"
+        ))
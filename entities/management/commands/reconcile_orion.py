@@ -0,0 +1,30 @@
+"""
+Management command to find and repair drift between local entities and Orion-LD
+"""
+from django.core.management.base import BaseCommand
+from entities.reconcile import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Compare entity content hashes with Orion-LD and queue writes for the entities that differ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', dest='types', help='Entity type (repeatable; default: all local types)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the drift')
+        parser.add_argument('--delete-extra', action='store_true', help='Also delete entities only found in the broker')
+
+    def handle(self, *args, **options):
+        results = reconcile(
+            options['types'],
+            repair=not options['dry_run'],
+            delete_extra=options['delete_extra'],
+        )
+        for entity_type, summary in results.items():
+            self.stdout.write(
+                f"{entity_type}: {summary['local']} local, {summary['remote']} in broker, "
+                f"{summary['buckets']} buckets differ; {summary['missing']} missing, "
+                f"{summary['changed']} changed, {summary['extra']} extra"
+            )
+        queued = sum(summary['queued'] for summary in results.values())
+        deleted = sum(summary['deleted'] for summary in results.values())
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} repairs and {deleted} deletes"))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entities', '0002_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrionOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_id', models.CharField(max_length=500)),
+                ('operation', models.CharField(choices=[('upsert', 'Upsert entity'), ('update', 'Update attributes'), ('delete', 'Delete entity')], max_length=20)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='entities_or_status_18d8a0_idx'), models.Index(fields=['entity_id', 'status'], name='entities_or_entity__583937_idx')],
+            },
+        ),
+    ]
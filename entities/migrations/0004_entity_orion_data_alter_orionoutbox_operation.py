@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entities', '0003_orionoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='orion_data',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='orionoutbox',
+            name='operation',
+            field=models.CharField(choices=[('upsert', 'Upsert entity'), ('replace', 'Replace entity'), ('update', 'Update attributes'), ('delete', 'Delete entity')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 12:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entities', '0004_entity_orion_data_alter_orionoutbox_operation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrionSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(max_length=200, unique=True)),
+                ('subscription_id', models.CharField(max_length=500)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('notifications', models.IntegerField(default=0)),
+                ('last_notification_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['entity_type'],
+            },
+        ),
+    ]
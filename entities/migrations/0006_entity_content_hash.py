@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:35
+
+import core.digest
+from django.db import migrations
+
+
+def backfill_content_hash(apps, schema_editor):
+    core.digest.backfill_content_hash(apps.get_model('entities', 'Entity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entities', '0005_orionsubscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='content_hash',
+            field=core.digest.ContentHashField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
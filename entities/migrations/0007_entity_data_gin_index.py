@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:10
+
+from django.db import migrations
+
+INDEX_NAME = 'entities_entity_data_gin'
+
+
+def create_data_index(apps, schema_editor):
+    # jsonb containment (data @> ...) for local NGSI-LD q queries (core/qlanguage.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON entities_entity USING gin (data jsonb_path_ops)"
+    )
+
+
+def drop_data_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entities', '0006_entity_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_data_index, drop_data_index),
+    ]
@@ -2,8 +2,11 @@
 Models for storing NGSI-LD entities
 """
 from django.db import models
+from django.utils import timezone
 from django.contrib.postgres.fields import JSONField
 import uuid
+from core.digest import ContentHashField
+from core.geo import GeohashField
 
 
 class Entity(models.Model):
@@ -21,10 +24,17 @@ class Entity(models.Model):
     # Geolocation for spatial queries
     latitude = models.FloatField(null=True, blank=True, db_index=True)
     longitude = models.FloatField(null=True, blank=True, db_index=True)
+    geohash = GeohashField()
     
     # Sync status with Orion-LD
     synced_to_orion = models.BooleanField(default=False)
     last_sync_at = models.DateTimeField(null=True, blank=True)
+    # NGSI-LD data as Orion-LD holds it once queued writes are delivered;
+    # later changes are sent as a diff against it (see entities/outbox.py)
+    orion_data = models.JSONField(null=True, blank=True, editable=False)
+    # Hash of the canonical NGSI-LD data, compared with the broker's by
+    # the drift reconciler (see entities/reconcile.py)
+    content_hash = ContentHashField()
     
     class Meta:
         ordering = ['-created_at']
@@ -32,6 +42,9 @@ class Entity(models.Model):
             models.Index(fields=['entity_type', 'created_at']),
             models.Index(fields=['latitude', 'longitude']),
         ]
+        # PostgreSQL also has a GIN (jsonb_path_ops) index on data for q
+        # queries, created by migration 0007 (not declared here so other
+        # databases still migrate)
     
     def __str__(self):
         return f"{self.entity_type}: {self.entity_id}"
@@ -47,6 +60,7 @@ class WeatherStation(models.Model):
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.TextField(blank=True)
     
     # Status
@@ -82,6 +96,7 @@ class AirQualitySensor(models.Model):
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.TextField(blank=True)
     
     # Status
@@ -117,6 +132,7 @@ class TrafficSensor(models.Model):
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.TextField(blank=True)
     
     # Status
@@ -164,6 +180,7 @@ class PublicService(models.Model):
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.TextField(blank=True)
     
     # Status
@@ -192,3 +209,65 @@ class PublicService(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_service_type_display()})"
+
+
+class OrionOutbox(models.Model):
+    """
+    Pending Orion-LD change, written in the same transaction as the local
+    change and sent by the outbox dispatcher (see entities/outbox.py)
+    """
+    
+    OPERATION_CHOICES = [
+        ('upsert', 'Upsert entity'),
+        ('replace', 'Replace entity'),
+        ('update', 'Update attributes'),
+        ('delete', 'Delete entity'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed'),
+    ]
+    
+    entity_id = models.CharField(max_length=500)
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    payload = models.JSONField(null=True, blank=True)
+    
+    # Delivery state: rows are deleted once delivered; "failed" rows gave up
+    # after ORION_OUTBOX_MAX_ATTEMPTS and no longer block their entity
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['entity_id', 'status']),
+        ]
+    
+    def __str__(self):
+        return f"{self.operation} {self.entity_id} ({self.status})"
+
+
+class OrionSubscription(models.Model):
+    """Orion-LD subscription registered for one entity type (see entities/subscriptions.py)"""
+    
+    entity_type = models.CharField(max_length=200, unique=True)
+    subscription_id = models.CharField(max_length=500)
+    # Hash of the registered subscription: a changed setting re-registers it
+    fingerprint = models.CharField(max_length=64)
+    
+    notifications = models.IntegerField(default=0)
+    last_notification_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['entity_type']
+    
+    def __str__(self):
+        return f"{self.entity_type}: {self.subscription_id}"
@@ -0,0 +1,213 @@
+"""
+Applying Orion-LD notifications to local state
+
+Notified observation entities (WeatherObserved, AirQualityObserved) are
+appended to the observation tables through ``ObservationWriter``
+(``ON CONFLICT DO NOTHING``, so redelivered notifications are no-ops).
+Every other entity is merged into its ``Entity`` row with one bulk
+upsert, and its ``orion_data`` snapshot set to the broker's state.
+
+Entities with pending outbox writes are skipped: their local change is
+newer than what the broker notified and is on its way there.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from core.ngsi_ld_mapping import CONTEXT
+from observations.models import WeatherObservation, AirQualityObservation
+from observations.writers import ObservationWriter
+from .models import Entity, OrionOutbox, OrionSubscription
+from .outbox import normalize
+
+SOURCE = 'orion-ld'
+
+# entity type -> (observation model, {model field: NGSI-LD attribute})
+OBSERVATION_TYPES = {
+    'WeatherObserved': (WeatherObservation, {
+        'temperature': 'temperature',
+        'humidity': 'relativeHumidity',
+        'pressure': 'atmosphericPressure',
+        'wind_speed': 'windSpeed',
+        'wind_direction': 'windDirection',
+        'precipitation': 'precipitation',
+    }),
+    'AirQualityObserved': (AirQualityObservation, {
+        'aqi': 'airQualityIndex',
+        'pm25': 'pm25',
+        'pm10': 'pm10',
+        'no2': 'no2',
+        'o3': 'o3',
+        'co': 'co',
+        'so2': 'so2',
+    }),
+}
+
+ENTITY_FIELDS = [
+    'entity_type', 'data', 'orion_data', 'content_hash', 'latitude', 'longitude', 'geohash',
+    'synced_to_orion', 'last_sync_at', 'updated_at',
+]
+
+
+def attribute_value(entity: Dict[str, Any], name: str) -> Any:
+    """Value of a normalized (or keyValues) attribute"""
+    attribute = entity.get(name)
+    if isinstance(attribute, dict) and 'type' in attribute:
+        attribute = attribute.get('value')
+    if isinstance(attribute, dict) and '@value' in attribute:
+        attribute = attribute['@value']
+    return attribute
+
+
+def point(entity: Dict[str, Any]):
+    """(latitude, longitude) of a GeoProperty Point location, or (None, None)"""
+    location = attribute_value(entity, 'location')
+    if isinstance(location, dict) and location.get('type') == 'Point':
+        try:
+            longitude, latitude = location['coordinates'][:2]
+            return float(latitude), float(longitude)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return None, None
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _observed_at(entity: Dict[str, Any], notified_at: datetime) -> datetime:
+    candidates = [attribute_value(entity, 'dateObserved')]
+    candidates += [attribute.get('observedAt') for attribute in entity.values() if isinstance(attribute, dict)]
+    for candidate in candidates:
+        if isinstance(candidate, str):
+            observed_at = parse_datetime(candidate)
+            if observed_at:
+                return observed_at if timezone.is_aware(observed_at) else timezone.make_aware(observed_at)
+    return notified_at
+
+
+def _location_name(entity: Dict[str, Any]) -> str:
+    address = attribute_value(entity, 'address')
+    if isinstance(address, dict):
+        address = address.get('addressLocality')
+    return str(address or attribute_value(entity, 'name') or '')
+
+
+def _local_id(entity: Dict[str, Any]) -> str:
+    """Entity id without the ``urn:ngsi-ld:<type>:`` prefix (the observation_id we push)"""
+    prefix = f"urn:ngsi-ld:{entity['type']}:"
+    entity_id = entity['id']
+    return entity_id[len(prefix):] if entity_id.startswith(prefix) else entity_id
+
+
+def apply_observations(entity_type: str, entities: List[Dict[str, Any]], notified_at: datetime) -> int:
+    """Append notified observation entities to their observation table"""
+    model, fields = OBSERVATION_TYPES[entity_type]
+    rows = []
+    for entity in entities:
+        latitude, longitude = point(entity)
+        if latitude is None:
+            continue
+        row = {field: _number(attribute_value(entity, attribute)) for field, attribute in fields.items()}
+        row.update(
+            observation_id=_local_id(entity)[:200],
+            latitude=latitude,
+            longitude=longitude,
+            observed_at=_observed_at(entity, notified_at),
+            location_name=_location_name(entity)[:300],
+            source=SOURCE,
+        )
+        if model is WeatherObservation:
+            row['weather_description'] = str(attribute_value(entity, 'weatherType') or '')[:200]
+        rows.append(row)
+    
+    # Observations we pushed come back with their own observation_id, and
+    # redeliveries are not counted again; an entity the broker keeps updating
+    # in place gets one row per observation time
+    seen = set(
+        model.objects.filter(observation_id__in=[row['observation_id'] for row in rows])
+        .values_list('observation_id', 'observed_at')
+    )
+    with ObservationWriter(model) as writer:
+        for row in rows:
+            if (row['observation_id'], row['observed_at']) not in seen:
+                writer.add(**row)
+    return writer.sent
+
+
+def apply_entities(entities: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Merge notified entities into their Entity rows with one bulk upsert"""
+    summary = {'updated': 0, 'unchanged': 0, 'skipped': 0}
+    notified = {entity['id']: entity for entity in entities}
+    pending = set(
+        OrionOutbox.objects.filter(status='pending', entity_id__in=notified).values_list('entity_id', flat=True)
+    )
+    current = dict(Entity.objects.filter(entity_id__in=notified).values_list('entity_id', 'data'))
+    now = timezone.now()
+    
+    rows = []
+    for entity_id, entity in notified.items():
+        if entity_id in pending:
+            summary['skipped'] += 1
+            continue
+        data = dict(current.get(entity_id) or {'@context': list(CONTEXT)}, **entity)
+        if current.get(entity_id) == data:
+            summary['unchanged'] += 1
+            continue
+        latitude, longitude = point(data)
+        rows.append(Entity(
+            entity_id=entity_id,
+            entity_type=data['type'],
+            data=data,
+            orion_data=data,
+            latitude=latitude,
+            longitude=longitude,
+            synced_to_orion=True,
+            last_sync_at=now,
+        ))
+    
+    if rows:
+        Entity.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['entity_id'],
+            update_fields=ENTITY_FIELDS,
+        )
+    summary['updated'] = len(rows)
+    return summary
+
+
+def apply_notification(
+    entities: Iterable[Dict[str, Any]],
+    subscription_id: Optional[str] = None,
+    notified_at: Optional[str] = None
+) -> Dict[str, int]:
+    """Apply the entities of one notification; returns counts per outcome"""
+    notified_time = parse_datetime(notified_at or '') or timezone.now()
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for entity in entities:
+        if isinstance(entity, dict) and entity.get('id') and entity.get('type'):
+            by_type.setdefault(entity['type'], []).append(normalize(entity))
+    
+    summary = {'observations': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    others = []
+    with transaction.atomic():
+        for entity_type, typed in by_type.items():
+            if entity_type in OBSERVATION_TYPES:
+                summary['observations'] += apply_observations(entity_type, typed, notified_time)
+            else:
+                others.extend(typed)
+        if others:
+            for key, value in apply_entities(others).items():
+                summary[key] += value
+        if subscription_id:
+            OrionSubscription.objects.filter(subscription_id=subscription_id).update(
+                notifications=F('notifications') + 1,
+                last_notification_at=timezone.now(),
+            )
+    return summary
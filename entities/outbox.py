@@ -0,0 +1,348 @@
+"""
+Transactional outbox for Orion-LD writes
+
+Views never call Orion-LD while handling a request. They write an
+``OrionOutbox`` row in the same database transaction as the local change
+(``enqueue``/``enqueue_entity``), so a change is either saved together
+with its pending Orion-LD write or not at all. After the commit a
+dispatcher run is scheduled; the periodic ``dispatch_orion_outbox`` task
+picks up anything left behind (Celery down, broker errors, retries).
+
+Changes to a stored entity are queued by ``enqueue_entity`` as a fragment
+of only the attributes that differ from its last queued state
+(``Entity.orion_data``), so frequent small updates (parking occupancy,
+streetlight state) send a few attributes rather than the whole entity.
+
+``dispatch`` claims due rows in id order (``SELECT ... FOR UPDATE SKIP
+LOCKED``, so several workers can drain the outbox at once), keeps the
+per-entity order, coalesces consecutive writes of the same entity and
+sends them with the entityOperations batch endpoints. Delivered rows are
+deleted and their entities marked as synced; failed ones are retried
+with exponential backoff and marked "failed" after
+ORION_OUTBOX_MAX_ATTEMPTS, together with the entity's later writes, which
+are replaced by one full ``replace`` of the entity.
+"""
+import json
+from collections import OrderedDict, deque
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from core.orion_client import OrionLDClient
+from .models import Entity, OrionOutbox
+import logging
+
+logger = logging.getLogger(__name__)
+
+KICK_KEY = 'orion-outbox:kick'
+KICK_INTERVAL = 1  # seconds: commits within this window share one dispatcher run
+
+# Entity keys that are not attributes (always part of an update fragment)
+IDENTITY_KEYS = ('@context', 'id', 'type')
+
+_encoder = JSONEncoder(separators=(',', ':'))
+
+
+def _queue(entity_id: str, operation: str, payload: Optional[Dict[str, Any]]) -> OrionOutbox:
+    row = OrionOutbox.objects.create(entity_id=entity_id, operation=operation, payload=payload)
+    transaction.on_commit(kick_dispatcher)
+    return row
+
+
+def enqueue(entity_id: str, operation: str, payload: Optional[Dict[str, Any]] = None) -> OrionOutbox:
+    """
+    Queue an Orion-LD write in the current transaction.
+    
+    ``upsert``/``replace`` take the full entity, ``update`` a fragment of
+    changed attributes and ``delete`` no payload.
+    """
+    if operation != 'delete':
+        Entity.objects.filter(entity_id=entity_id, synced_to_orion=True).update(synced_to_orion=False)
+    return _queue(entity_id, operation, payload)
+
+
+def normalize(data: Dict[str, Any]) -> Dict[str, Any]:
+    """NGSI-LD data as stored in JSON (dates, decimals and tuples converted)"""
+    return json.loads(_encoder.encode(data))
+
+
+def diff_attributes(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Attributes of ``new`` that are added or changed since ``old``, and the removed ones"""
+    changed = {
+        name: value for name, value in new.items()
+        if name not in IDENTITY_KEYS and old.get(name) != value
+    }
+    removed = [name for name in old if name not in IDENTITY_KEYS and name not in new]
+    return changed, removed
+
+
+def enqueue_entity(entity: Entity, full: bool = False, save: bool = True) -> Optional[OrionOutbox]:
+    """
+    Queue what Orion-LD needs to catch up with a stored entity's data.
+    
+    Only the attributes that changed since the last queued state
+    (``entity.orion_data``) are sent. The whole entity is sent when there
+    is no such state yet, its type changed, attributes were removed
+    (PATCH cannot remove them) or ``full`` is set. Returns None when
+    nothing changed. With ``save=False`` the caller saves the entity's
+    new ``orion_data``.
+    """
+    data = entity.data
+    snapshot = None if full else entity.orion_data
+    
+    if snapshot is None or snapshot.get('type') != data.get('type'):
+        row = _queue(entity.entity_id, 'upsert', data)
+    else:
+        changed, removed = diff_attributes(snapshot, data)
+        if removed:
+            row = _queue(entity.entity_id, 'replace', data)
+        elif changed:
+            fragment = {key: data[key] for key in IDENTITY_KEYS if key in data}
+            fragment.update(changed)
+            row = _queue(entity.entity_id, 'update', fragment)
+        else:
+            return None
+    
+    entity.orion_data = data
+    entity.synced_to_orion = False
+    if save:
+        Entity.objects.filter(pk=entity.pk).update(orion_data=data, synced_to_orion=False)
+    return row
+
+
+def kick_dispatcher():
+    """Schedule a dispatcher run soon (at most one per KICK_INTERVAL)"""
+    try:
+        if not cache.add(KICK_KEY, 1, KICK_INTERVAL):
+            return
+        from .tasks import dispatch_orion_outbox
+        # One connection attempt: a broker outage must not stall the request
+        with dispatch_orion_outbox.app.connection_for_write(transport_options={'max_retries': 0}) as connection:
+            dispatch_orion_outbox.apply_async(connection=connection, retry=False)
+    except Exception as e:
+        # The periodic task still drains the outbox
+        logger.warning(f"Could not schedule Orion-LD outbox dispatch: {e}")
+
+
+def _claim(batch_size: int) -> List[OrionOutbox]:
+    """
+    Lease up to ``batch_size`` due rows. Only entities whose oldest pending
+    row is among them are kept, so an entity's writes never overtake each
+    other (e.g. while an earlier one waits for a retry).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OrionOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if not rows:
+            return []
+        
+        claimed = {row.id for row in rows}
+        heads = dict(
+            OrionOutbox.objects.filter(status='pending', entity_id__in={row.entity_id for row in rows})
+            .values('entity_id')
+            .annotate(first=Min('id'))
+            .values_list('entity_id', 'first')
+        )
+        rows = [row for row in rows if heads[row.entity_id] in claimed]
+        
+        lease = now + timedelta(seconds=settings.ORION_OUTBOX_LEASE)
+        OrionOutbox.objects.filter(id__in=[row.id for row in rows]).update(next_attempt_at=lease)
+    return rows
+
+
+class _Step:
+    """One request's worth of an entity's queued writes"""
+    
+    def __init__(self, row: OrionOutbox):
+        self.operation = row.operation
+        self.payload = row.payload
+        self.rows = [row]
+    
+    def absorb(self, row: OrionOutbox) -> bool:
+        """Fold a later write of the same entity into this step if possible"""
+        if row.operation == 'delete':
+            # Nothing written before a delete needs to reach the broker
+            self.operation, self.payload = 'delete', None
+        elif self.operation == 'delete':
+            return False
+        elif row.operation in ('upsert', 'replace'):
+            # A full entity supersedes earlier writes (and keeps a pending replace)
+            if self.operation != 'replace':
+                self.operation = row.operation
+            self.payload = row.payload
+        else:
+            self.payload = dict(self.payload or {}, **(row.payload or {}))
+        self.rows.append(row)
+        return True
+
+
+def _plan(rows: List[OrionOutbox]) -> Dict[str, deque]:
+    """Group rows per entity (in id order) into coalesced steps"""
+    plan: Dict[str, deque] = OrderedDict()
+    for row in rows:
+        steps = plan.setdefault(row.entity_id, deque())
+        if not steps or not steps[-1].absorb(row):
+            steps.append(_Step(row))
+    return plan
+
+
+def _is_missing(error: Dict[str, Any]) -> bool:
+    return 'ResourceNotFound' in str(error.get('type', '')) or error.get('status') == 404
+
+
+def _send(client: OrionLDClient, steps: Dict[str, _Step]) -> Dict[str, Any]:
+    """Send one step per entity; returns {entity id: error} for the failed ones"""
+    by_operation: Dict[str, List[str]] = {'upsert': [], 'replace': [], 'update': [], 'delete': []}
+    for entity_id, step in steps.items():
+        by_operation[step.operation].append(entity_id)
+    
+    errors = {}
+    if by_operation['upsert']:
+        result = client.batch_upsert([steps[entity_id].payload for entity_id in by_operation['upsert']])
+        errors.update((error['entityId'], error['error']) for error in result['errors'])
+    if by_operation['replace']:
+        result = client.batch_upsert([steps[entity_id].payload for entity_id in by_operation['replace']], replace=True)
+        errors.update((error['entityId'], error['error']) for error in result['errors'])
+    if by_operation['update']:
+        # Only the changed attributes (entityOperations/update is the batch form of PATCH .../attrs)
+        result = client.batch_update([steps[entity_id].payload for entity_id in by_operation['update']])
+        errors.update((error['entityId'], error['error']) for error in result['errors'])
+    if by_operation['delete']:
+        result = client.batch_delete(by_operation['delete'])
+        # Already gone from the broker: the delete has nothing left to do
+        errors.update(
+            (error['entityId'], error['error']) for error in result['errors']
+            if not _is_missing(error['error'])
+        )
+    return errors
+
+
+def _retry_at(attempts: int):
+    backoff = settings.ORION_OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timezone.now() + timedelta(seconds=min(backoff, settings.ORION_OUTBOX_MAX_BACKOFF))
+
+
+def _fail(step: _Step, later: List[_Step], error: Any) -> bool:
+    """Record a failed step; returns True when it gave up for good"""
+    attempts = max(row.attempts for row in step.rows) + 1
+    dead = attempts >= settings.ORION_OUTBOX_MAX_ATTEMPTS
+    
+    OrionOutbox.objects.filter(id__in=[row.id for row in step.rows]).update(
+        attempts=attempts,
+        next_attempt_at=timezone.now() if dead else _retry_at(attempts),
+        last_error=str(error)[:2000],
+        status='failed' if dead else 'pending',
+    )
+    if dead:
+        _give_up(step)
+    else:
+        # Later writes of the entity wait for the failed one
+        later_ids = [row.id for later_step in later for row in later_step.rows]
+        if later_ids:
+            OrionOutbox.objects.filter(id__in=later_ids).update(next_attempt_at=_retry_at(attempts))
+    return dead
+
+
+def _give_up(step: _Step):
+    """
+    After a write gave up, the entity's later fragments would patch a state
+    Orion-LD never reached: they are marked failed too and replaced by one
+    full ``replace`` of the entity as stored now (a ``delete`` if it is gone).
+    A full write that was the entity's last one is not queued again.
+    """
+    entity_id = step.rows[0].entity_id
+    with transaction.atomic():
+        superseded = OrionOutbox.objects.filter(
+            entity_id=entity_id, status='pending', id__gt=max(row.id for row in step.rows)
+        ).update(status='failed', last_error=f"Superseded: outbox row {step.rows[-1].id} gave up")
+        if not superseded and step.operation != 'update':
+            # Orion-LD no longer matches the snapshot: the next change sends the whole entity
+            Entity.objects.filter(entity_id=entity_id).update(orion_data=None)
+            return
+        
+        entity = Entity.objects.filter(entity_id=entity_id).first()
+        if entity is None:
+            _queue(entity_id, 'delete', None)
+            return
+        _queue(entity_id, 'replace', entity.data)
+        Entity.objects.filter(pk=entity.pk).update(orion_data=entity.data, synced_to_orion=False)
+
+
+def dispatch_batch(client: OrionLDClient, batch_size: int) -> Dict[str, int]:
+    """Claim and send one batch of outbox rows"""
+    summary = {'claimed': 0, 'delivered': 0, 'retried': 0, 'failed': 0}
+    rows = _claim(batch_size)
+    if not rows:
+        return summary
+    summary['claimed'] = len(rows)
+    
+    plan = _plan(rows)
+    delivered: List[int] = []
+    synced = set()
+    
+    # Rounds of at most one step per entity keep each entity's order
+    while plan:
+        heads = {entity_id: steps[0] for entity_id, steps in plan.items()}
+        errors = _send(client, heads)
+        
+        for entity_id, step in heads.items():
+            steps = plan[entity_id]
+            steps.popleft()
+            if entity_id in errors:
+                if _fail(step, list(steps), errors[entity_id]):
+                    summary['failed'] += len(step.rows) + sum(len(later.rows) for later in steps)
+                else:
+                    summary['retried'] += len(step.rows)
+                del plan[entity_id]
+                continue
+            
+            delivered.extend(row.id for row in step.rows)
+            if step.operation == 'delete':
+                synced.discard(entity_id)
+            else:
+                synced.add(entity_id)
+            if not steps:
+                del plan[entity_id]
+    
+    if delivered:
+        OrionOutbox.objects.filter(id__in=delivered).delete()
+        summary['delivered'] = len(delivered)
+    if synced:
+        # Entities changed again since this batch was claimed stay unsynced
+        still_pending = OrionOutbox.objects.filter(status='pending', entity_id__in=synced).values('entity_id')
+        Entity.objects.filter(entity_id__in=synced).exclude(entity_id__in=still_pending).update(
+            synced_to_orion=True,
+            last_sync_at=timezone.now(),
+        )
+    return summary
+
+
+def dispatch(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, int]:
+    """Drain due outbox rows in batches until none are left (or ``max_batches``)"""
+    batch_size = batch_size or settings.ORION_OUTBOX_BATCH_SIZE
+    client = OrionLDClient()
+    totals = {'claimed': 0, 'delivered': 0, 'retried': 0, 'failed': 0}
+    batches = 0
+    
+    while max_batches is None or batches < max_batches:
+        summary = dispatch_batch(client, batch_size)
+        batches += 1
+        for key, value in summary.items():
+            totals[key] += value
+        if summary['claimed'] < batch_size:
+            break
+    
+    if totals['claimed']:
+        logger.info(
+            f"Orion-LD outbox: {totals['delivered']} delivered, "
+            f"{totals['retried']} to retry, {totals['failed']} failed"
+        )
+    return totals
@@ -0,0 +1,167 @@
+"""
+Drift reconciliation between local entities and Orion-LD
+
+Writes reach the broker through the outbox, but the broker can still
+drift: it lost data, an outbox row gave up, someone wrote to it
+directly. ``reconcile`` finds and repairs such drift per entity type:
+
+1. the local digest tree is built by streaming the stored
+   ``content_hash`` column (no entity data is loaded);
+2. the broker's entities are streamed page by page and hashed on the
+   fly into the same tree shape;
+3. equal bucket digests end the comparison; otherwise both sides are
+   streamed a second time, keeping only the hashes of entities in
+   differing buckets, which are then compared entity by entity. Only
+   per-bucket digests and the drifted buckets' ids are held in memory;
+4. entities missing from the broker or differing there are queued in
+   the outbox as full writes, in one bulk insert. Entities with pending
+   outbox writes are left alone (their change is on its way), as are
+   entities changed locally while the broker was being read.
+
+Broker-only entities are reported, and deleted only with
+``delete_extra`` (other producers may legitimately own them).
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from django.db import transaction
+from django.db.models import F
+from core.digest import DigestTree, content_hash, diff_hashes, in_buckets
+from core.ngsi_ld import NGSILDContext
+from core.ngsi_ld_mapping import CONTEXT
+from core.orion_client import OrionLDClient
+from .models import Entity, OrionOutbox
+from .outbox import kick_dispatcher
+import logging
+
+logger = logging.getLogger(__name__)
+
+# User context sent with broker queries so types resolve to our short names
+QUERY_CONTEXT = next((url for url in CONTEXT if url != NGSILDContext.CORE_CONTEXT), None)
+
+CHUNK_SIZE = 1000
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def local_pairs(entity_type: str) -> Iterator[Tuple[str, str]]:
+    rows = Entity.objects.filter(entity_type=entity_type).values_list('entity_id', 'content_hash')
+    return rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def remote_pairs(client: OrionLDClient, entity_type: str, page_size: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    for entity in client.iter_entities(entity_type, page_size=page_size, context=QUERY_CONTEXT):
+        if entity.get('id'):
+            yield entity['id'], content_hash(entity)
+
+
+def _repairable(entity_ids: Set[str], local: Dict[str, str]) -> Set[str]:
+    """Drop entities with pending outbox writes or changed since ``local`` was read"""
+    ids = sorted(entity_ids)
+    keep = set()
+    for chunk in _chunks(ids):
+        pending = set(
+            OrionOutbox.objects.filter(status='pending', entity_id__in=chunk).values_list('entity_id', flat=True)
+        )
+        current = Entity.objects.filter(entity_id__in=chunk).values_list('entity_id', 'content_hash')
+        keep.update(
+            entity_id for entity_id, digest in current
+            if entity_id not in pending and local.get(entity_id) == digest
+        )
+    return keep
+
+
+def _queue_writes(entity_ids: Set[str], operation_for: Dict[str, str]) -> int:
+    """Queue full writes of ``entity_ids`` with one bulk insert per chunk"""
+    queued = 0
+    with transaction.atomic():
+        for chunk in _chunks(sorted(entity_ids)):
+            rows = [
+                OrionOutbox(entity_id=entity_id, operation=operation_for[entity_id], payload=data)
+                for entity_id, data in Entity.objects.filter(entity_id__in=chunk).values_list('entity_id', 'data')
+            ]
+            OrionOutbox.objects.bulk_create(rows)
+            # The queued full entity is the new snapshot later diffs are taken against
+            Entity.objects.filter(entity_id__in=chunk).update(orion_data=F('data'), synced_to_orion=False)
+            queued += len(rows)
+        if queued:
+            transaction.on_commit(kick_dispatcher)
+    return queued
+
+
+def _queue_deletes(entity_ids: Set[str]) -> int:
+    rows = [OrionOutbox(entity_id=entity_id, operation='delete') for entity_id in sorted(entity_ids)]
+    with transaction.atomic():
+        OrionOutbox.objects.bulk_create(rows, batch_size=CHUNK_SIZE)
+        if rows:
+            transaction.on_commit(kick_dispatcher)
+    return len(rows)
+
+
+def reconcile_type(
+    client: OrionLDClient,
+    entity_type: str,
+    repair: bool = True,
+    delete_extra: bool = False,
+    page_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """Compare one entity type with the broker and queue the repairs"""
+    local = DigestTree(local_pairs(entity_type))
+    remote = DigestTree(remote_pairs(client, entity_type, page_size))
+    buckets = local.differing_buckets(remote)
+    
+    mine: Dict[str, str] = {}
+    theirs: Dict[str, str] = {}
+    if buckets:
+        mine = in_buckets(local_pairs(entity_type), buckets)
+        theirs = in_buckets(remote_pairs(client, entity_type, page_size), buckets)
+    missing, extra, changed = diff_hashes(mine, theirs)
+    
+    summary = {
+        'local': local.count,
+        'remote': remote.count,
+        'buckets': len(buckets),
+        'missing': len(missing),
+        'changed': len(changed),
+        'extra': len(extra),
+        'queued': 0,
+        'deleted': 0,
+        'skipped': 0,
+    }
+    if not repair:
+        return summary
+    
+    drifted = missing | changed
+    repairable = _repairable(drifted, mine) if drifted else set()
+    summary['skipped'] = len(drifted) - len(repairable)
+    if repairable:
+        operation_for = {entity_id: 'upsert' if entity_id in missing else 'replace' for entity_id in repairable}
+        summary['queued'] = _queue_writes(repairable, operation_for)
+    if extra and delete_extra:
+        summary['deleted'] = _queue_deletes(extra)
+    return summary
+
+
+def reconcile(
+    entity_types: Optional[Iterable[str]] = None,
+    repair: bool = True,
+    delete_extra: bool = False,
+    client: Optional[OrionLDClient] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Reconcile ``entity_types`` (default: every locally stored type) with Orion-LD"""
+    client = client or OrionLDClient()
+    if entity_types is None:
+        entity_types = Entity.objects.order_by().values_list('entity_type', flat=True).distinct()
+    
+    results = {}
+    for entity_type in sorted(set(entity_types)):
+        summary = reconcile_type(client, entity_type, repair, delete_extra)
+        results[entity_type] = summary
+        if summary['missing'] or summary['changed'] or summary['extra']:
+            logger.warning(
+                f"Orion-LD drift in {entity_type}: {summary['missing']} missing, "
+                f"{summary['changed']} changed, {summary['extra']} only in the broker; "
+                f"{summary['queued']} repairs queued, {summary['skipped']} skipped"
+            )
+    return results
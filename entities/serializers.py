@@ -6,6 +6,10 @@ from .models import (
     TrafficSensor,
     PublicService
 )
+from core.ngsi_ld_mapping import Address, Call, Const, EntityId, EntityMapping, GeoPoint, Iso, MappedNGSILDSerializer, Property
+from core.qlanguage import project
+
+SERVICE_TYPE_LABELS = dict(PublicService.SERVICE_TYPES)
 
 
 class EntitySerializer(serializers.ModelSerializer):
@@ -13,8 +17,15 @@ class EntitySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Entity
-        fields = '__all__'
+        exclude = ['orion_data']
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        attrs = self.context.get('attrs')
+        if attrs is not None:
+            data['data'] = project(data['data'], attrs)
+        return data
 
 
 class WeatherStationSerializer(serializers.ModelSerializer):
@@ -58,96 +69,24 @@ class PublicServiceSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class PublicServiceNGSILDSerializer(serializers.ModelSerializer):
+class PublicServiceNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Public Service"""
     
-    def to_representation(self, instance):
-        """Convert to NGSI-LD format"""
-        # Generate entity_id in NGSI-LD format
-        entity_id = f"urn:ngsi-ld:PublicService:{instance.service_id}"
-        
-        data = {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": entity_id,
-            "type": "PublicService",
-            "name": {
-                "type": "Property",
-                "value": instance.name
-            },
-            "serviceType": {
-                "type": "Property",
-                "value": instance.service_type
-            },
-            "category": {
-                "type": "Property",
-                "value": instance.get_service_type_display()
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address,
-                    "addressLocality": "",
-                    "addressCountry": "VN"
-                }
-            },
-            "isActive": {
-                "type": "Property",
-                "value": instance.is_active
-            },
-            "dateCreated": {
-                "type": "Property",
-                "value": {
-                    "@type": "DateTime",
-                    "@value": instance.created_at.isoformat() if instance.created_at else None
-                }
-            },
-            "dateModified": {
-                "type": "Property",
-                "value": {
-                    "@type": "DateTime",
-                    "@value": instance.updated_at.isoformat() if instance.updated_at else None
-                }
-            }
-        }
-        
-        # Add optional properties if they exist
-        if instance.description:
-            data["description"] = {
-                "type": "Property",
-                "value": instance.description
-            }
-        
-        if instance.opening_hours:
-            data["openingHours"] = {
-                "type": "Property",
-                "value": instance.opening_hours
-            }
-        
-        if instance.contact_phone:
-            data["contactPoint"] = {
-                "type": "Property",
-                "value": {
-                    "telephone": instance.contact_phone
-                }
-            }
-        
-        if instance.website:
-            data["url"] = {
-                "type": "Property",
-                "value": instance.website
-            }
-        
-        return data
+    mapping = EntityMapping("PublicService", {
+        "name": Property("name"),
+        "serviceType": Property("service_type"),
+        "category": Property(Call(SERVICE_TYPE_LABELS.get, "service_type", "service_type")),
+        "location": GeoPoint(),
+        "address": Address(street="address", locality=Const("")),
+        "isActive": Property("is_active"),
+        "dateCreated": Property({"@type": Const("DateTime"), "@value": Iso("created_at")}),
+        "dateModified": Property({"@type": Const("DateTime"), "@value": Iso("updated_at")}),
+        # Optional properties, only present when set
+        "description": Property("description", optional=True),
+        "openingHours": Property("opening_hours", optional=True),
+        "contactPoint": Property({"telephone": "contact_phone"}, optional="contact_phone"),
+        "url": Property("website", optional=True),
+    }, id=EntityId(None, "service_id"))
     
     class Meta:
         model = PublicService
@@ -0,0 +1,42 @@
+"""
+Signal handlers for the entities app
+"""
+from core.ngsi_ld import create_air_quality_sensor_entity, create_weather_station_entity
+from .models import WeatherStation, AirQualitySensor, PublicService
+from .serializers import PublicServiceNGSILDSerializer
+from .tracking import track, track_mapping
+
+
+def weather_station_entity(station):
+    return create_weather_station_entity(
+        station_id=station.station_id,
+        name=station.name,
+        latitude=station.latitude,
+        longitude=station.longitude,
+        address=station.address
+    )
+
+
+def air_quality_sensor_entity(sensor):
+    return create_air_quality_sensor_entity(
+        sensor_id=sensor.sensor_id,
+        name=sensor.name,
+        latitude=sensor.latitude,
+        longitude=sensor.longitude
+    )
+
+
+# Saved rows are mirrored as entities and their changes queued for Orion-LD
+track(
+    WeatherStation,
+    weather_station_entity,
+    ['station_id', 'name', 'latitude', 'longitude', 'address'],
+    entity_field='entity'
+)
+track(
+    AirQualitySensor,
+    air_quality_sensor_entity,
+    ['sensor_id', 'name', 'latitude', 'longitude'],
+    entity_field='entity'
+)
+track_mapping(PublicService, PublicServiceNGSILDSerializer.mapping)
@@ -0,0 +1,132 @@
+"""
+Orion-LD subscriptions pushing broker changes to this app
+
+``ensure_subscriptions`` registers one subscription per entity type in
+ORION_SUBSCRIPTIONS, each with its ``watchedAttributes`` and
+``throttling``, notifying ORION_NOTIFICATION_URL (the
+``OrionNotificationView``). Registered ids are kept in
+``OrionSubscription``; a subscription is re-created when its settings
+change or the broker lost it (a 404, not an unreachable broker), and
+removed when its type is no longer configured. A local row is only
+dropped once its subscription is gone from the broker, so an outage
+never leaves a forgotten subscription behind to notify twice. Incoming notifications are applied by
+``entities.notifications``.
+"""
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from requests.exceptions import RequestException
+from core.ngsi_ld_mapping import CONTEXT
+from core.orion_client import OrionLDClient
+from .models import OrionSubscription
+import logging
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'X-Orion-Notification-Token'
+
+
+def build_subscription(entity_type: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """NGSI-LD subscription to changes of ``entity_type`` entities"""
+    endpoint = {
+        'uri': settings.ORION_NOTIFICATION_URL,
+        'accept': 'application/json',
+    }
+    if settings.ORION_NOTIFICATION_TOKEN:
+        endpoint['receiverInfo'] = [{'key': TOKEN_HEADER, 'value': settings.ORION_NOTIFICATION_TOKEN}]
+    
+    subscription = {
+        'type': 'Subscription',
+        'description': f"smartcity: {entity_type} changes",
+        'entities': [{'type': entity_type}],
+        'notification': {'format': 'normalized', 'endpoint': endpoint},
+        '@context': list(options.get('context', CONTEXT)),
+    }
+    if options.get('watchedAttributes'):
+        subscription['watchedAttributes'] = list(options['watchedAttributes'])
+    throttling = options.get('throttling', settings.ORION_SUBSCRIPTION_THROTTLING)
+    if throttling:
+        # Orion-LD drops (does not delay) notifications inside the window
+        subscription['throttling'] = throttling
+    return subscription
+
+
+def fingerprint(subscription: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(subscription, sort_keys=True).encode()).hexdigest()
+
+
+def _delete(client: OrionLDClient, subscription_id: str) -> bool:
+    """Delete a subscription; True once it is gone from the broker"""
+    if client.delete_subscription(subscription_id):
+        return True
+    try:
+        return not client.subscription_exists(subscription_id)
+    except RequestException:
+        return False
+
+
+def ensure_subscriptions(client: Optional[OrionLDClient] = None) -> Dict[str, List[str]]:
+    """Bring the broker's subscriptions in line with ORION_SUBSCRIPTIONS"""
+    summary = {'created': [], 'kept': [], 'removed': [], 'failed': []}
+    if not settings.ORION_NOTIFICATION_URL:
+        logger.warning("ORION_NOTIFICATION_URL is not set: no Orion-LD subscriptions registered")
+        return summary
+    
+    client = client or OrionLDClient()
+    registered = {row.entity_type: row for row in OrionSubscription.objects.all()}
+    
+    for entity_type, options in settings.ORION_SUBSCRIPTIONS.items():
+        subscription = build_subscription(entity_type, options)
+        digest = fingerprint(subscription)
+        current = registered.pop(entity_type, None)
+        
+        try:
+            exists = current is not None and client.subscription_exists(current.subscription_id)
+        except RequestException as e:
+            # Broker unreachable: keep what is registered and try again next run
+            logger.error(f"Cannot check Orion-LD subscription of {entity_type}: {e}")
+            summary['failed'].append(entity_type)
+            continue
+        
+        if exists and current.fingerprint == digest:
+            summary['kept'].append(entity_type)
+            continue
+        if exists and not client.delete_subscription(current.subscription_id):
+            summary['failed'].append(entity_type)
+            continue
+        
+        subscription_id = client.create_subscription(subscription)
+        if not subscription_id:
+            summary['failed'].append(entity_type)
+            continue
+        OrionSubscription.objects.update_or_create(
+            entity_type=entity_type,
+            defaults={'subscription_id': subscription_id, 'fingerprint': digest}
+        )
+        summary['created'].append(entity_type)
+    
+    # Types no longer configured
+    for entity_type, current in registered.items():
+        if _delete(client, current.subscription_id):
+            current.delete()
+            summary['removed'].append(entity_type)
+        else:
+            summary['failed'].append(entity_type)
+    
+    logger.info(
+        f"Orion-LD subscriptions: {len(summary['created'])} created, {len(summary['kept'])} kept, "
+        f"{len(summary['removed'])} removed, {len(summary['failed'])} failed"
+    )
+    return summary
+
+
+def remove_subscriptions(client: Optional[OrionLDClient] = None) -> int:
+    """Delete every registered subscription from the broker"""
+    client = client or OrionLDClient()
+    removed = 0
+    for current in OrionSubscription.objects.all():
+        if _delete(client, current.subscription_id):
+            current.delete()
+            removed += 1
+    return removed
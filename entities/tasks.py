@@ -0,0 +1,25 @@
+"""
+Celery tasks for Orion-LD synchronization of entities
+"""
+from celery import shared_task
+from .outbox import dispatch
+from .reconcile import reconcile
+from .subscriptions import ensure_subscriptions
+
+
+@shared_task(ignore_result=True)
+def dispatch_orion_outbox(batch_size: int = None):
+    """Send pending Orion-LD writes from the outbox"""
+    return dispatch(batch_size)
+
+
+@shared_task(ignore_result=True)
+def ensure_orion_subscriptions():
+    """Register missing or changed Orion-LD subscriptions"""
+    ensure_subscriptions()
+
+
+@shared_task(ignore_result=True)
+def reconcile_orion_entities():
+    """Find entities that drifted from Orion-LD and queue their repair"""
+    reconcile()
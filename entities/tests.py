@@ -0,0 +1,531 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from requests.exceptions import ConnectionError
+from rest_framework.test import APIClient
+
+from core.qlanguage import QueryLanguageError, apply_q, parse_q
+from observations.models import WeatherObservation
+
+from traffic.models import ParkingSpot
+from .models import Entity, OrionOutbox, OrionSubscription, PublicService
+from .notifications import apply_notification
+from .outbox import dispatch_batch, enqueue_entity, kick_dispatcher
+from .reconcile import reconcile_type
+from .subscriptions import build_subscription, ensure_subscriptions, fingerprint
+
+
+def parking(number, spots=10):
+    return {
+        'id': f'urn:ngsi-ld:OffStreetParking:p{number}',
+        'type': 'OffStreetParking',
+        'availableSpotNumber': {'type': 'Property', 'value': spots},
+    }
+
+
+class FakeBroker:
+    """Records batch requests; entities in ``failing`` come back as errors"""
+    
+    def __init__(self, entities=(), failing=()):
+        self.entities = list(entities)
+        self.failing = set(failing)
+        self.reads = 0
+        self.requests = []
+        self.updates = []
+    
+    def iter_entities(self, entity_type, page_size=None, context=None):
+        self.reads += 1
+        return iter(self.entities)
+    
+    def result(self, operation, entity_ids):
+        self.requests.append((operation, entity_ids))
+        return {
+            'success': [entity_id for entity_id in entity_ids if entity_id not in self.failing],
+            'errors': [
+                {'entityId': entity_id, 'error': {'title': 'Internal Error', 'status': 500}}
+                for entity_id in entity_ids if entity_id in self.failing
+            ],
+        }
+    
+    def batch_upsert(self, entities, replace=False):
+        return self.result('replace' if replace else 'upsert', [entity['id'] for entity in entities])
+    
+    def batch_update(self, entities):
+        self.updates.extend(entities)
+        return self.result('update', [entity['id'] for entity in entities])
+    
+    def batch_delete(self, entity_ids):
+        return self.result('delete', list(entity_ids))
+
+
+class TrackingTests(TestCase):
+    """Saved domain rows are mirrored as entities and queued for Orion-LD"""
+    
+    def setUp(self):
+        self.spot = ParkingSpot.objects.create(
+            entity_id='urn:ngsi-ld:OffStreetParking:track-1',
+            name='Bai xe 1',
+            latitude=21.0285,
+            longitude=105.8542,
+            total_spaces=50,
+            available_spaces=20,
+        )
+    
+    def test_unchanged_save_queues_nothing(self):
+        queued = OrionOutbox.objects.count()
+        self.assertEqual(queued, 1)
+        
+        # updated_at moves (auto_now), but no tracked field changed
+        self.spot.save()
+        
+        self.assertEqual(OrionOutbox.objects.count(), queued)
+    
+    def test_changed_field_queues_fragment(self):
+        self.spot.available_spaces = 15
+        self.spot.save()
+        
+        row = OrionOutbox.objects.latest('id')
+        self.assertEqual(row.operation, 'update')
+        self.assertEqual(row.payload['availableSpotNumber']['value'], 15)
+        self.assertNotIn('name', row.payload)
+        entity = Entity.objects.get(entity_id=self.spot.entity_id)
+        self.assertEqual(entity.data['availableSpotNumber']['value'], 15)
+
+
+class ReconcileTests(TestCase):
+    """Drift between local entities and the broker is found bucket by bucket"""
+    
+    def setUp(self):
+        for number in range(20):
+            data = parking(number)
+            Entity.objects.create(entity_id=data['id'], entity_type=data['type'], data=data)
+    
+    def test_in_sync_reads_broker_once(self):
+        broker = FakeBroker([parking(number) for number in range(20)])
+        
+        summary = reconcile_type(broker, 'OffStreetParking')
+        
+        self.assertEqual(broker.reads, 1)
+        self.assertEqual(summary['buckets'], 0)
+        self.assertEqual(summary['local'], 20)
+        self.assertEqual(summary['remote'], 20)
+        self.assertEqual(OrionOutbox.objects.count(), 0)
+    
+    def test_drifted_entities_are_queued(self):
+        remote = [parking(number) for number in range(1, 20)]  # p0 missing
+        remote[0] = parking(1, spots=3)  # p1 changed
+        remote.append(parking(99))  # only in the broker
+        
+        summary = reconcile_type(FakeBroker(remote), 'OffStreetParking')
+        
+        self.assertEqual((summary['missing'], summary['changed'], summary['extra']), (1, 1, 1))
+        self.assertEqual(summary['queued'], 2)
+        operations = dict(OrionOutbox.objects.values_list('entity_id', 'operation'))
+        self.assertEqual(operations, {
+            'urn:ngsi-ld:OffStreetParking:p0': 'upsert',
+            'urn:ngsi-ld:OffStreetParking:p1': 'replace',
+        })
+
+
+@override_settings(ORION_OUTBOX_MAX_ATTEMPTS=3, ORION_OUTBOX_RETRY_BACKOFF=5, ORION_OUTBOX_MAX_BACKOFF=3600)
+class OutboxTests(TestCase):
+    """Orion-LD writes queued in the outbox and delivered by the dispatcher"""
+    
+    def setUp(self):
+        data = parking(1)
+        self.entity = Entity.objects.create(entity_id=data['id'], entity_type=data['type'], data=data)
+        enqueue_entity(self.entity)
+        OrionOutbox.objects.all().delete()  # the broker already has the first version
+    
+    def change(self, **attributes):
+        data = dict(self.entity.data)
+        for name, value in attributes.items():
+            data[name] = {'type': 'Property', 'value': value}
+        self.entity.data = data
+        enqueue_entity(self.entity, save=False)
+        self.entity.save()
+    
+    def test_consecutive_updates_are_coalesced(self):
+        self.change(availableSpotNumber=8)
+        self.change(status='open')
+        self.change(availableSpotNumber=7)
+        self.assertEqual(OrionOutbox.objects.count(), 3)
+        
+        broker = FakeBroker()
+        summary = dispatch_batch(broker, batch_size=100)
+        
+        self.assertEqual(summary['delivered'], 3)
+        self.assertEqual(broker.requests, [('update', [self.entity.entity_id])])
+        self.assertEqual(broker.updates[0]['availableSpotNumber']['value'], 7)
+        self.assertEqual(broker.updates[0]['status']['value'], 'open')
+        self.assertFalse(OrionOutbox.objects.exists())
+        self.entity.refresh_from_db()
+        self.assertTrue(self.entity.synced_to_orion)
+    
+    def test_failed_write_is_retried_with_backoff(self):
+        self.change(availableSpotNumber=8)
+        broker = FakeBroker(failing=[self.entity.entity_id])
+        
+        for attempt, backoff in ((1, 5), (2, 10)):
+            OrionOutbox.objects.update(next_attempt_at=timezone.now())
+            before = timezone.now()
+            summary = dispatch_batch(broker, batch_size=100)
+            
+            self.assertEqual(summary['retried'], 1)
+            row = OrionOutbox.objects.get()
+            self.assertEqual((row.status, row.attempts), ('pending', attempt))
+            self.assertIn('Internal Error', row.last_error)
+            self.assertGreaterEqual(row.next_attempt_at, before + timedelta(seconds=backoff))
+            self.assertLess(row.next_attempt_at, before + timedelta(seconds=backoff + 5))
+        
+        # Not due yet: nothing is claimed
+        self.assertEqual(dispatch_batch(broker, batch_size=100)['claimed'], 0)
+    
+    def test_giving_up_on_a_full_write_clears_orion_data(self):
+        OrionOutbox.objects.create(entity_id=self.entity.entity_id, operation='upsert', payload=self.entity.data, attempts=2)
+        
+        summary = dispatch_batch(FakeBroker(failing=[self.entity.entity_id]), batch_size=100)
+        
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(OrionOutbox.objects.get().status, 'failed')
+        self.entity.refresh_from_db()
+        self.assertIsNone(self.entity.orion_data)
+        
+        # The next change sends the whole entity again
+        self.change(availableSpotNumber=6)
+        self.assertEqual(OrionOutbox.objects.latest('id').operation, 'upsert')
+    
+    def test_giving_up_replaces_later_fragments_with_the_whole_entity(self):
+        self.change(availableSpotNumber=8)
+        OrionOutbox.objects.update(attempts=2)
+        self.change(status='closed')
+        # Not claimed with the failing write (e.g. queued while it was sent)
+        OrionOutbox.objects.filter(pk=OrionOutbox.objects.latest('id').pk).update(
+            next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+        
+        summary = dispatch_batch(FakeBroker(failing=[self.entity.entity_id]), batch_size=100)
+        
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(
+            list(OrionOutbox.objects.order_by('id').values_list('operation', 'status')),
+            [('update', 'failed'), ('update', 'failed'), ('replace', 'pending')]
+        )
+        replace = OrionOutbox.objects.get(status='pending')
+        self.assertEqual(replace.payload['status']['value'], 'closed')
+        self.entity.refresh_from_db()
+        self.assertEqual(self.entity.orion_data, self.entity.data)
+        
+        broker = FakeBroker()
+        self.assertEqual(dispatch_batch(broker, batch_size=100)['delivered'], 1)
+        self.assertEqual(broker.requests, [('replace', [self.entity.entity_id])])
+    
+    def test_write_is_committed_with_the_model(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                spot = ParkingSpot.objects.create(
+                    entity_id='urn:ngsi-ld:OffStreetParking:commit', name='Commit', latitude=21.0, longitude=105.8
+                )
+        
+        self.assertTrue(Entity.objects.filter(entity_id=spot.entity_id).exists())
+        self.assertEqual(OrionOutbox.objects.get(entity_id=spot.entity_id).operation, 'upsert')
+        self.assertIn(kick_dispatcher, callbacks)
+    
+    def test_write_is_rolled_back_with_the_model(self):
+        entity_id = 'urn:ngsi-ld:OffStreetParking:rollback'
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                ParkingSpot.objects.create(entity_id=entity_id, name='Rollback', latitude=21.0, longitude=105.8)
+                raise RuntimeError
+        
+        self.assertFalse(ParkingSpot.objects.filter(entity_id=entity_id).exists())
+        self.assertFalse(Entity.objects.filter(entity_id=entity_id).exists())
+        self.assertFalse(OrionOutbox.objects.filter(entity_id=entity_id).exists())
+        self.assertEqual(callbacks, [])
+
+
+class QueryLanguageTests(TestCase):
+    """NGSI-LD q queries evaluated locally over Entity.data"""
+    
+    def setUp(self):
+        entities = {
+            'a': {
+                'name': {'type': 'Property', 'value': 'Bai xe A'},
+                'availableSpotNumber': {'type': 'Property', 'value': 15},
+                'status': {'type': 'Property', 'value': 'open'},
+                'address': {'type': 'Property', 'value': {'addressLocality': 'Hanoi'}},
+                'refOwner': {'type': 'Relationship', 'object': 'urn:ngsi-ld:Person:1'},
+            },
+            'b': {
+                'name': {'type': 'Property', 'value': 'Garage B'},
+                'availableSpotNumber': {'type': 'Property', 'value': 5},
+                'status': {'type': 'Property', 'value': 'full'},
+                'address': {'type': 'Property', 'value': {'addressLocality': 'Hanoi'}},
+            },
+            'c': {
+                'name': {'type': 'Property', 'value': 'Bai xe C'},
+                'availableSpotNumber': {'type': 'Property', 'value': 50},
+            },
+        }
+        for key, attributes in entities.items():
+            data = {'id': f'urn:ngsi-ld:OffStreetParking:{key}', 'type': 'OffStreetParking', **attributes}
+            Entity.objects.create(entity_id=data['id'], entity_type=data['type'], data=data)
+    
+    def matches(self, q):
+        ids = apply_q(Entity.objects.all(), q).values_list('entity_id', flat=True)
+        return sorted(entity_id.rsplit(':', 1)[-1] for entity_id in ids)
+    
+    def test_comparisons(self):
+        self.assertEqual(self.matches('availableSpotNumber>10'), ['a', 'c'])
+        self.assertEqual(self.matches('availableSpotNumber<=5'), ['b'])
+        self.assertEqual(self.matches('status=="open"'), ['a'])
+    
+    def test_ranges_and_lists(self):
+        self.assertEqual(self.matches('availableSpotNumber==5..15'), ['a', 'b'])
+        self.assertEqual(self.matches('status=="open","full"'), ['a', 'b'])
+        self.assertEqual(self.matches('availableSpotNumber!=5..15'), ['c'])
+    
+    def test_not_equal_requires_the_attribute(self):
+        # c has no status: it matches neither status=="open" nor status!="open"
+        self.assertEqual(self.matches('status!="open"'), ['b'])
+        self.assertEqual(self.matches('name!~="^Bai"'), ['b'])
+    
+    def test_relationship_object(self):
+        self.assertEqual(self.matches('refOwner=="urn:ngsi-ld:Person:1"'), ['a'])
+        self.assertEqual(self.matches('refOwner'), ['a'])
+    
+    def test_regex(self):
+        self.assertEqual(self.matches('name~="^Bai xe"'), ['a', 'c'])
+        self.assertEqual(self.matches('name~=Garage'), ['b'])
+    
+    def test_and_or_and_paths(self):
+        self.assertEqual(self.matches('status=="open"|status=="full";availableSpotNumber>10'), ['a'])
+        self.assertEqual(self.matches('(status=="open"|status=="full");availableSpotNumber<10'), ['b'])
+        self.assertEqual(self.matches('address[addressLocality]=="Hanoi"'), ['a', 'b'])
+    
+    def test_parse_errors(self):
+        for q in ('availableSpotNumber>', '(status=="open"', 'status>1,2', 'name=="open', 'status=="a")'):
+            with self.subTest(q=q), self.assertRaises(QueryLanguageError):
+                parse_q(q)
+        with self.assertRaises(QueryLanguageError):
+            apply_q(Entity.objects.all(), 'name~="("')
+    
+    def test_invalid_q_is_a_bad_request(self):
+        response = APIClient().get('/api/v1/entities/', {'q': 'status=="open'})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+
+class FakeSubscriptionBroker:
+    """Subscription endpoints of a broker that may be down"""
+    
+    def __init__(self, existing=(), down=False, fail_create=False, fail_delete=False):
+        self.subscriptions = set(existing)
+        self.down = down
+        self.fail_create = fail_create
+        self.fail_delete = fail_delete
+        self.created = []
+    
+    def subscription_exists(self, subscription_id):
+        if self.down:
+            raise ConnectionError('broker unreachable')
+        return subscription_id in self.subscriptions
+    
+    def delete_subscription(self, subscription_id):
+        if self.down or self.fail_delete or subscription_id not in self.subscriptions:
+            return False
+        self.subscriptions.discard(subscription_id)
+        return True
+    
+    def create_subscription(self, subscription):
+        if self.down or self.fail_create:
+            return None
+        subscription_id = f'urn:ngsi-ld:Subscription:new-{len(self.created) + 1}'
+        self.created.append(subscription)
+        self.subscriptions.add(subscription_id)
+        return subscription_id
+
+
+PARKING_SUBSCRIPTIONS = {'OffStreetParking': {'watchedAttributes': ['availableSpotNumber']}}
+
+
+@override_settings(
+    ORION_NOTIFICATION_URL='http://smartcity/api/v1/orion/notify/',
+    ORION_NOTIFICATION_TOKEN='secret',
+    ORION_SUBSCRIPTIONS=PARKING_SUBSCRIPTIONS,
+)
+class SubscriptionTests(TestCase):
+    """Registered subscriptions survive broker outages"""
+    
+    old_id = 'urn:ngsi-ld:Subscription:old'
+    
+    def register(self, entity_type='OffStreetParking', digest=None):
+        if digest is None:
+            digest = fingerprint(build_subscription(entity_type, PARKING_SUBSCRIPTIONS['OffStreetParking']))
+        return OrionSubscription.objects.create(
+            entity_type=entity_type, subscription_id=self.old_id, fingerprint=digest
+        )
+    
+    def registered_id(self, entity_type='OffStreetParking'):
+        return OrionSubscription.objects.get(entity_type=entity_type).subscription_id
+    
+    def test_unchanged_subscription_is_kept(self):
+        self.register()
+        broker = FakeSubscriptionBroker(existing=[self.old_id])
+        
+        self.assertEqual(ensure_subscriptions(broker)['kept'], ['OffStreetParking'])
+        self.assertEqual(broker.created, [])
+    
+    def test_outage_keeps_the_registered_subscription(self):
+        self.register()
+        broker = FakeSubscriptionBroker(existing=[self.old_id], down=True)
+        
+        summary = ensure_subscriptions(broker)
+        
+        self.assertEqual(summary['failed'], ['OffStreetParking'])
+        self.assertEqual(self.registered_id(), self.old_id)
+        self.assertEqual(broker.created, [])
+    
+    def test_lost_subscription_is_recreated(self):
+        self.register()
+        broker = FakeSubscriptionBroker()  # 404 for the registered id
+        
+        self.assertEqual(ensure_subscriptions(broker)['created'], ['OffStreetParking'])
+        self.assertEqual(self.registered_id(), 'urn:ngsi-ld:Subscription:new-1')
+    
+    def test_changed_settings_replace_the_subscription(self):
+        self.register(digest='outdated')
+        broker = FakeSubscriptionBroker(existing=[self.old_id])
+        
+        ensure_subscriptions(broker)
+        
+        self.assertEqual(broker.subscriptions, {'urn:ngsi-ld:Subscription:new-1'})
+        self.assertEqual(self.registered_id(), 'urn:ngsi-ld:Subscription:new-1')
+    
+    def test_undeleted_subscription_is_not_duplicated(self):
+        self.register(digest='outdated')
+        broker = FakeSubscriptionBroker(existing=[self.old_id], fail_delete=True)
+        
+        self.assertEqual(ensure_subscriptions(broker)['failed'], ['OffStreetParking'])
+        self.assertEqual(broker.created, [])
+        self.assertEqual(self.registered_id(), self.old_id)
+    
+    def test_failed_create_keeps_the_row(self):
+        self.register()
+        broker = FakeSubscriptionBroker(fail_create=True)
+        
+        self.assertEqual(ensure_subscriptions(broker)['failed'], ['OffStreetParking'])
+        self.assertEqual(self.registered_id(), self.old_id)
+    
+    def test_unconfigured_type_is_removed_once_deleted(self):
+        self.register('Streetlight')
+        
+        summary = ensure_subscriptions(FakeSubscriptionBroker(existing=[self.old_id], fail_delete=True))
+        self.assertIn('Streetlight', summary['failed'])
+        self.assertTrue(OrionSubscription.objects.filter(entity_type='Streetlight').exists())
+        
+        summary = ensure_subscriptions(FakeSubscriptionBroker(existing=[self.old_id]))
+        self.assertEqual(summary['removed'], ['Streetlight'])
+        self.assertFalse(OrionSubscription.objects.filter(entity_type='Streetlight').exists())
+
+
+class PublicServiceNearbyTests(TestCase):
+    """Public services share the located viewsets' nearby and geo-query support"""
+    
+    url = '/api/v1/public-services/'
+    
+    def setUp(self):
+        for index, (latitude, service_type, active) in enumerate([
+            (21.040, 'park', True), (21.030, 'hospital', True), (21.031, 'park', False), (21.035, 'park', True),
+        ]):
+            PublicService.objects.create(
+                service_id=f'service-{index}', name=f'Service {index}', service_type=service_type,
+                latitude=latitude, longitude=105.854, is_active=active,
+            )
+    
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        return [item['name'] for item in (data['results'] if isinstance(data, dict) else data)]
+    
+    def test_nearby_lists_active_services_nearest_first(self):
+        params = {'lat': 21.0285, 'lon': 105.854, 'radius': 3}
+        
+        response = APIClient().get(f'{self.url}nearby/', params)
+        self.assertEqual(self.names(response), ['Service 1', 'Service 3', 'Service 0'])
+        self.assertIn('distance', response.json()[0])
+        
+        response = APIClient().get(f'{self.url}nearby/', dict(params, type='park', limit=1))
+        self.assertEqual(self.names(response), ['Service 3'])
+    
+    def test_list_accepts_geo_queries(self):
+        response = APIClient().get(self.url, {
+            'georel': 'near;maxDistance==800', 'geometry': 'Point', 'coordinates': '[105.854, 21.0285]',
+        })
+        self.assertEqual(sorted(self.names(response)), ['Service 1', 'Service 2', 'Service 3'])
+        
+        response = APIClient().get(self.url, {'georel': 'near', 'geometry': 'Point', 'coordinates': '[105.854, 21.0285]'})
+        self.assertEqual(response.status_code, 400)
+
+
+def weather_observed(observed_at, temperature=25.0):
+    return {
+        'id': 'urn:ngsi-ld:WeatherObserved:weather-hanoi-1',
+        'type': 'WeatherObserved',
+        'location': {'type': 'GeoProperty', 'value': {'type': 'Point', 'coordinates': [105.8542, 21.0285]}},
+        'dateObserved': {'type': 'Property', 'value': {'@type': 'DateTime', '@value': observed_at}},
+        'temperature': {'type': 'Property', 'value': temperature},
+    }
+
+
+@override_settings(ORION_NOTIFICATION_TOKEN='secret')
+class NotificationTests(TestCase):
+    """Orion-LD notifications applied to local state"""
+    
+    url = '/api/v1/orion/notify/'
+    
+    def notify(self, entities, **headers):
+        return APIClient().post(
+            self.url, {'type': 'Notification', 'subscriptionId': 'sub-1', 'data': entities}, format='json', **headers
+        )
+    
+    def test_token_is_required(self):
+        entities = [parking(1)]
+        self.assertEqual(self.notify(entities).status_code, 403)
+        self.assertEqual(self.notify(entities, HTTP_X_ORION_NOTIFICATION_TOKEN='wrong').status_code, 403)
+        self.assertEqual(self.notify(entities, HTTP_X_ORION_NOTIFICATION_TOKEN='secret').status_code, 200)
+        with override_settings(ORION_NOTIFICATION_TOKEN=''):
+            self.assertEqual(self.notify(entities, HTTP_X_ORION_NOTIFICATION_TOKEN='').status_code, 403)
+    
+    def test_entities_with_pending_writes_are_skipped(self):
+        for number in (1, 2):
+            data = parking(number)
+            Entity.objects.create(entity_id=data['id'], entity_type=data['type'], data=data)
+        OrionOutbox.objects.create(entity_id=parking(1)['id'], operation='update', payload=parking(1, spots=4))
+        
+        summary = apply_notification([parking(1, spots=30), parking(2, spots=30)])
+        
+        self.assertEqual((summary['skipped'], summary['updated']), (1, 1))
+        spots = {
+            entity_id: data['availableSpotNumber']['value']
+            for entity_id, data in Entity.objects.values_list('entity_id', 'data')
+        }
+        self.assertEqual(spots, {parking(1)['id']: 10, parking(2)['id']: 30})
+        entity = Entity.objects.get(entity_id=parking(2)['id'])
+        self.assertTrue(entity.synced_to_orion)
+        self.assertEqual(entity.orion_data, entity.data)
+    
+    def test_redelivered_observation_is_stored_once(self):
+        first = weather_observed('2026-10-17T10:00:00Z')
+        
+        self.assertEqual(apply_notification([first])['observations'], 1)
+        self.assertEqual(apply_notification([first])['observations'], 0)
+        
+        # The broker updated the entity in place: a new observation time is a new row
+        self.assertEqual(apply_notification([weather_observed('2026-10-17T11:00:00Z', 26.0)])['observations'], 1)
+        self.assertEqual(
+            sorted(WeatherObservation.objects.values_list('temperature', flat=True)), [25.0, 26.0]
+        )
@@ -0,0 +1,138 @@
+"""
+Change tracking of domain models for Orion-LD
+
+``track(model, to_entity, fields)`` mirrors every saved row of a domain
+model (parking spots, streetlights, weather stations, ...) as an
+``Entity`` holding its NGSI-LD representation, and queues the change for
+Orion-LD with ``enqueue_entity``, which sends only the attributes that
+differ from the last queued state. Saves whose ``update_fields`` miss
+every tracked field, or that leave the representation unchanged, queue
+nothing; values derived from ``auto_now`` fields (``dateModified``,
+``observedAt`` from ``updated_at``) alone do not count as a change, so
+saving an unmodified row is a no-op. Deleting a row deletes its entity locally and in Orion-LD.
+
+Bulk ``QuerySet.update()`` calls bypass model signals and are not tracked.
+"""
+import copy
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from .models import Entity
+from .outbox import enqueue, enqueue_entity, normalize
+
+# Stand-in value of auto_now fields when finding what they feed into
+_PROBE_TIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _differences(old: Any, new: Any, path: Tuple[str, ...] = ()) -> Iterable[Tuple[str, ...]]:
+    """Key paths at which two JSON documents differ"""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() | new.keys():
+            yield from _differences(old.get(key), new.get(key), path + (key,))
+    elif old != new:
+        yield path
+
+
+def _without(data: Dict[str, Any], paths: List[Tuple[str, ...]]) -> Dict[str, Any]:
+    data = copy.deepcopy(data)
+    for path in paths:
+        node = data
+        for key in path[:-1]:
+            node = node.get(key) if isinstance(node, dict) else None
+        if isinstance(node, dict):
+            node.pop(path[-1], None)
+    return data
+
+
+class Tracker:
+    def __init__(
+        self,
+        model,
+        to_entity: Callable[[Any], Dict[str, Any]],
+        fields: Iterable[str],
+        entity_field: Optional[str] = None
+    ):
+        self.model = model
+        self.to_entity = to_entity
+        self.fields = {field.split('__')[0] for field in fields}
+        self.entity_field = entity_field
+        self.auto_now = [
+            field.attname for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False) and field.name in self.fields
+        ]
+    
+    def render(self, instance) -> Dict[str, Any]:
+        return normalize(self.to_entity(instance))
+    
+    def only_auto_now_changed(self, instance, stored: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        """True when ``data`` differs from ``stored`` only in values derived from auto_now fields"""
+        if not self.auto_now:
+            return False
+        current = {name: getattr(instance, name) for name in self.auto_now}
+        try:
+            for name in self.auto_now:
+                setattr(instance, name, _PROBE_TIME)
+            probe = self.render(instance)
+        finally:
+            for name, value in current.items():
+                setattr(instance, name, value)
+        derived = list(_differences(data, probe))
+        return bool(derived) and _without(stored, derived) == _without(data, derived)
+    
+    def saved(self, sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw:
+            return  # loaddata
+        if update_fields and self.fields.isdisjoint(update_fields):
+            return
+        data = self.render(instance)
+        
+        with transaction.atomic():
+            entity = Entity.objects.select_for_update().filter(entity_id=data['id']).first()
+            if entity is None:
+                entity = Entity(entity_id=data['id'])
+            elif entity.data == data or self.only_auto_now_changed(instance, entity.data, data):
+                return
+            
+            entity.entity_type = data['type']
+            entity.data = data
+            entity.latitude = getattr(instance, 'latitude', entity.latitude)
+            entity.longitude = getattr(instance, 'longitude', entity.longitude)
+            enqueue_entity(entity, save=False)
+            entity.save()
+            
+            if self.entity_field and getattr(instance, f"{self.entity_field}_id") != entity.pk:
+                # Link without saving the instance again (and re-entering this handler)
+                self.model.objects.filter(pk=instance.pk).update(**{self.entity_field: entity})
+                setattr(instance, self.entity_field, entity)
+    
+    def deleted(self, sender, instance, **kwargs):
+        entity_id = self.to_entity(instance)['id']
+        with transaction.atomic():
+            enqueue(entity_id, 'delete')
+            Entity.objects.filter(entity_id=entity_id).delete()
+
+
+def track(
+    model,
+    to_entity: Callable[[Any], Dict[str, Any]],
+    fields: Iterable[str],
+    entity_field: Optional[str] = None
+) -> Tracker:
+    """
+    Sync ``model`` rows to Orion-LD as the entities built by ``to_entity``.
+    
+    ``fields`` are the model fields the representation depends on;
+    ``entity_field`` names a foreign key to ``Entity`` to keep pointed at
+    the mirrored entity.
+    """
+    tracker = Tracker(model, to_entity, fields, entity_field)
+    uid = f"orion-tracking:{model._meta.label_lower}"
+    post_save.connect(tracker.saved, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(tracker.deleted, sender=model, weak=False, dispatch_uid=uid)
+    return tracker
+
+
+def track_mapping(model, mapping) -> Tracker:
+    """Track a model exported with an ``EntityMapping``"""
+    return track(model, mapping.from_instance, mapping.columns)
@@ -5,7 +5,8 @@ from .views import (
     WeatherStationViewSet,
     AirQualitySensorViewSet,
     TrafficSensorViewSet,
-    PublicServiceViewSet
+    PublicServiceViewSet,
+    OrionNotificationView
 )
 
 router = DefaultRouter()
@@ -16,5 +17,6 @@ router.register(r'traffic-sensors', TrafficSensorViewSet, basename='traffic-sens
 router.register(r'public-services', PublicServiceViewSet, basename='public-service')
 
 urlpatterns = [
+    path('orion/notify/', OrionNotificationView.as_view(), name='orion-notify'),
     path('', include(router.urls)),
 ]
@@ -1,7 +1,10 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.utils import timezone
+from rest_framework.views import APIView
+from django.conf import settings
 from .models import (
     Entity,
     WeatherStation,
@@ -17,168 +20,148 @@ from .serializers import (
     PublicServiceSerializer,
     PublicServiceNGSILDSerializer
 )
+from .notifications import apply_notification
+from .outbox import enqueue, enqueue_entity
+from .subscriptions import TOKEN_HEADER
+from core.geo import nearby
+from core.mixins import AtomicWriteMixin, NearbyMixin, get_nearby_params
 from core.orion_client import OrionLDClient
-from core.ngsi_ld import (
-    create_weather_station_entity,
-    create_air_quality_sensor_entity
-)
+from core.qlanguage import QueryLanguageError, apply_q, parse_attrs
+from core.streaming import get_stream_format, ngsi_ld_response, stream_entities
+import hmac
+import itertools
+import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class EntityViewSet(viewsets.ModelViewSet):
+class EntityViewSet(AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     """ViewSet for NGSI-LD entities"""
     
     queryset = Entity.objects.all()
     serializer_class = EntitySerializer
     
     def get_queryset(self):
-        """Filter entities by type"""
+        """Filter entities by type and NGSI-LD ``q`` (evaluated locally)"""
         queryset = Entity.objects.all()
         entity_type = self.request.query_params.get('type', None)
+        q = self.request.query_params.get('q', None)
         
         if entity_type:
             queryset = queryset.filter(entity_type=entity_type)
         
+        if q:
+            try:
+                queryset = apply_q(queryset, q)
+            except QueryLanguageError as e:
+                raise ValidationError({"error": str(e)})
+        
         return queryset
     
+    def get_serializer_context(self):
+        """``attrs=a,b`` limits each entity's data to those attributes"""
+        context = super().get_serializer_context()
+        context['attrs'] = parse_attrs(self.request.query_params.get('attrs', None))
+        return context
+    
+    def perform_create(self, serializer):
+        """Save the entity and queue it for Orion-LD"""
+        enqueue_entity(serializer.save())
+    
+    def perform_update(self, serializer):
+        """Save the entity and queue its changed attributes for Orion-LD"""
+        enqueue_entity(serializer.save())
+    
+    def perform_destroy(self, instance):
+        """Delete the entity and queue its removal from Orion-LD"""
+        enqueue(instance.entity_id, 'delete')
+        instance.delete()
+    
     @action(detail=True, methods=['post'])
     def sync_to_orion(self, request, pk=None):
-        """Sync entity to Orion-LD"""
+        """Queue the whole entity for (re)sync to Orion-LD"""
         entity = self.get_object()
-        client = OrionLDClient()
-        
-        success = client.create_entity(entity.data)
+        enqueue_entity(entity, full=True)
         
-        if success:
-            entity.synced_to_orion = True
-            entity.last_sync_at = timezone.now()
-            entity.save()
-            
-            return Response({
-                'status': 'success',
-                'message': 'Entity synced to Orion-LD'
-            })
-        else:
-            return Response({
-                'status': 'error',
-                'message': 'Failed to sync entity to Orion-LD'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'status': 'queued',
+            'message': 'Entity queued for sync to Orion-LD'
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['get'])
     def query_orion(self, request):
-        """Query entities from Orion-LD"""
+        """
+        Query entities from Orion-LD, one page (``limit``/``offset``) at a
+        time, or all of them streamed with ``?stream=json|ndjson``
+        """
         client = OrionLDClient()
         entity_type = request.query_params.get('type', None)
-        
-        entities = client.query_entities(entity_type=entity_type)
-        
+        q = request.query_params.get('q', None)
+        stream_format = get_stream_format(request)
+        
+        if stream_format:
+            entities = client.iter_entities(entity_type=entity_type, q=q)
+            try:
+                # Fetch the first page before answering, so broker errors are still a 502
+                first = next(entities, None)
+            except requests.exceptions.RequestException as e:
+                return Response({
+                    'status': 'error',
+                    'message': f'Failed to query Orion-LD: {e}'
+                }, status=status.HTTP_502_BAD_GATEWAY)
+            head = [first] if first is not None else []
+            return stream_entities(request, itertools.chain(head, entities), stream_format)
+        
+        try:
+            limit = min(int(request.query_params.get('limit', 100)), 1000)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            raise ValidationError({"error": "limit and offset must be integers"})
+        if limit < 1 or offset < 0:
+            raise ValidationError({"error": "limit must be positive and offset not negative"})
+        
+        entities = client.query_entities(entity_type=entity_type, q=q, limit=limit, offset=offset)
         return Response({
             'count': len(entities),
+            'limit': limit,
+            'offset': offset,
             'results': entities
         })
 
 
-class WeatherStationViewSet(viewsets.ModelViewSet):
+class WeatherStationViewSet(AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     """ViewSet for Weather Stations"""
     
     queryset = WeatherStation.objects.all()
     serializer_class = WeatherStationSerializer
+    nearby_default_radius = 10  # km
     
-    def perform_create(self, serializer):
-        """Create weather station and NGSI-LD entity"""
-        station = serializer.save()
-        
-        # Create NGSI-LD entity
-        ngsi_entity = create_weather_station_entity(
-            station_id=station.station_id,
-            name=station.name,
-            latitude=station.latitude,
-            longitude=station.longitude,
-            address=station.address
-        )
-        
-        # Save to database
-        entity = Entity.objects.create(
-            entity_id=ngsi_entity['id'],
-            entity_type='WeatherStation',
-            data=ngsi_entity,
-            latitude=station.latitude,
-            longitude=station.longitude
-        )
-        
-        station.entity = entity
-        station.save()
-        
-        # Sync to Orion-LD
-        client = OrionLDClient()
-        client.create_entity(ngsi_entity)
-    
-    @action(detail=False, methods=['get'])
-    def nearby(self, request):
-        """Find nearby weather stations"""
-        lat = float(request.query_params.get('lat', 0))
-        lon = float(request.query_params.get('lon', 0))
-        radius = float(request.query_params.get('radius', 10))  # km
-        
-        # Simple bounding box query
-        lat_delta = radius / 111.0
-        lon_delta = radius / (111.0 * abs(lat))
-        
-        stations = WeatherStation.objects.filter(
-            latitude__range=(lat - lat_delta, lat + lat_delta),
-            longitude__range=(lon - lon_delta, lon + lon_delta),
-            is_active=True
-        )
-        
-        serializer = self.get_serializer(stations, many=True)
-        return Response(serializer.data)
+    def get_nearby_queryset(self):
+        return WeatherStation.objects.filter(is_active=True)
 
 
-class AirQualitySensorViewSet(viewsets.ModelViewSet):
+class AirQualitySensorViewSet(AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     """ViewSet for Air Quality Sensors"""
     
     queryset = AirQualitySensor.objects.all()
     serializer_class = AirQualitySensorSerializer
     
-    def perform_create(self, serializer):
-        """Create air quality sensor and NGSI-LD entity"""
-        sensor = serializer.save()
-        
-        # Create NGSI-LD entity
-        ngsi_entity = create_air_quality_sensor_entity(
-            sensor_id=sensor.sensor_id,
-            name=sensor.name,
-            latitude=sensor.latitude,
-            longitude=sensor.longitude
-        )
-        
-        # Save to database
-        entity = Entity.objects.create(
-            entity_id=ngsi_entity['id'],
-            entity_type='AirQualitySensor',
-            data=ngsi_entity,
-            latitude=sensor.latitude,
-            longitude=sensor.longitude
-        )
-        
-        sensor.entity = entity
-        sensor.save()
-        
-        # Sync to Orion-LD
-        client = OrionLDClient()
-        client.create_entity(ngsi_entity)
+    def get_nearby_queryset(self):
+        return AirQualitySensor.objects.filter(is_active=True)
 
 
-class TrafficSensorViewSet(viewsets.ModelViewSet):
+class TrafficSensorViewSet(NearbyMixin, viewsets.ModelViewSet):
     """ViewSet for Traffic Sensors"""
     
     queryset = TrafficSensor.objects.all()
     serializer_class = TrafficSensorSerializer
+    
+    def get_nearby_queryset(self):
+        return TrafficSensor.objects.filter(is_active=True)
 
 
-class PublicServiceViewSet(viewsets.ModelViewSet):
+class PublicServiceViewSet(AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     """ViewSet for Public Services"""
     
     queryset = PublicService.objects.all()
@@ -203,8 +186,7 @@ class PublicServiceViewSet(viewsets.ModelViewSet):
         if service_type:
             queryset = queryset.filter(service_type=service_type)
         
-        serializer = PublicServiceNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, PublicServiceNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -213,41 +195,54 @@ class PublicServiceViewSet(viewsets.ModelViewSet):
         serializer = PublicServiceNGSILDSerializer(instance)
         return Response(serializer.data, content_type='application/ld+json')
     
+    def get_nearby_queryset(self):
+        services = PublicService.objects.filter(is_active=True)
+        service_type = self.request.query_params.get('type', None)
+        if service_type:
+            services = services.filter(service_type=service_type)
+        return services
+    
     @action(detail=False, methods=['get'])
     def nearby(self, request):
-        """Find nearby public services"""
-        lat = request.query_params.get('lat', None)
-        lon = request.query_params.get('lon', None)
+        """Find nearby public services, nearest first (``format=ngsi-ld`` for NGSI-LD)"""
+        if request.query_params.get('format', 'json') != 'ngsi-ld':
+            return super().nearby(request)
         
-        if not lat or not lon:
+        lat, lon, radius, limit = get_nearby_params(request, self.nearby_default_radius)
+        services = list(nearby(self.get_nearby_queryset(), lat, lon, radius, limit=limit))
+        serializer = PublicServiceNGSILDSerializer(services, many=True)
+        return Response(serializer.data, content_type='application/ld+json')
+
+
+class OrionNotificationView(APIView):
+    """
+    Receive Orion-LD subscription notifications (see entities/subscriptions.py).
+    
+    Requests must carry ORION_NOTIFICATION_TOKEN in the
+    X-Orion-Notification-Token header; without a configured token the
+    endpoint is disabled.
+    """
+    
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        token = settings.ORION_NOTIFICATION_TOKEN
+        received = request.headers.get(TOKEN_HEADER, '')
+        if not token or not hmac.compare_digest(received.encode(), token.encode()):
+            return Response({'error': 'Invalid notification token'}, status=status.HTTP_403_FORBIDDEN)
+        
+        notification = request.data
+        entities = notification.get('data') if isinstance(notification, dict) else None
+        if not isinstance(entities, list):
             return Response(
-                {"error": "lat and lon parameters are required"},
+                {'error': 'Notification must have a "data" list of entities'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        lat = float(lat)
-        lon = float(lon)
-        radius = float(request.query_params.get('radius', 5))  # km
-        service_type = request.query_params.get('type', None)
-        
-        # Simple bounding box query
-        lat_delta = radius / 111.0
-        lon_delta = radius / (111.0 * max(abs(lat), 0.001))  # Prevent division by zero
-        
-        services = PublicService.objects.filter(
-            latitude__range=(lat - lat_delta, lat + lat_delta),
-            longitude__range=(lon - lon_delta, lon + lon_delta),
-            is_active=True
+        result = apply_notification(
+            entities,
+            subscription_id=notification.get('subscriptionId'),
+            notified_at=notification.get('notifiedAt')
         )
-        
-        if service_type:
-            services = services.filter(service_type=service_type)
-        
-        # Check for ngsi-ld format parameter
-        format_type = request.query_params.get('format', 'json')
-        if format_type == 'ngsi-ld':
-            serializer = PublicServiceNGSILDSerializer(services, many=True)
-            return Response(serializer.data, content_type='application/ld+json')
-        
-        serializer = self.get_serializer(services, many=True)
-        return Response(serializer.data)
+        return Response(result)
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:55
+
+import core.geo
+from django.db import migrations
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name in ('WaterSupplyPoint', 'DrainagePoint', 'StreetLight', 'EnergyMeter', 'TelecomTower'):
+        core.geo.backfill_geohash(apps.get_model('infrastructure', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('infrastructure', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drainagepoint',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='energymeter',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='streetlight',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='telecomtower',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='watersupplypoint',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from core.geo import GeohashField
 from django.utils import timezone
 
 
@@ -8,6 +9,7 @@ class WaterSupplyPoint(models.Model):
     description = models.TextField(blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     point_type = models.CharField(max_length=50, choices=[("reservoir", "Reservoir"), ("treatment_plant", "Treatment Plant"), ("pump_station", "Pump Station"), ("distribution_point", "Distribution Point"), ("hydrant", "Fire Hydrant")], default="distribution_point")
@@ -36,6 +38,7 @@ class DrainagePoint(models.Model):
     description = models.TextField(blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     point_type = models.CharField(max_length=50, choices=[("storm_drain", "Storm Drain"), ("sewer_main", "Sewer Main"), ("pump_station", "Pump Station"), ("treatment_plant", "Treatment Plant"), ("outfall", "Outfall"), ("manhole", "Manhole")], default="storm_drain")
@@ -60,6 +63,7 @@ class StreetLight(models.Model):
     pole_id = models.CharField(max_length=100)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     lamp_type = models.CharField(max_length=50, choices=[("led", "LED"), ("sodium", "High Pressure Sodium"), ("metal_halide", "Metal Halide"), ("fluorescent", "Fluorescent")], default="led")
@@ -91,6 +95,7 @@ class EnergyMeter(models.Model):
     name = models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     meter_type = models.CharField(max_length=50, choices=[("residential", "Residential"), ("commercial", "Commercial"), ("industrial", "Industrial"), ("public", "Public Infrastructure"), ("grid", "Grid Substation")], default="public")
@@ -119,6 +124,7 @@ class TelecomTower(models.Model):
     name = models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     tower_type = models.CharField(max_length=50, choices=[("cell_tower", "Cell Tower"), ("small_cell", "Small Cell"), ("fiber_node", "Fiber Node"), ("wifi_hotspot", "WiFi Hotspot"), ("radio_tower", "Radio Tower")], default="cell_tower")
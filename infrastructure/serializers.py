@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from core.ngsi_ld_mapping import (
+    Address, Call, Column, Const, EntityMapping, Float, GeoPoint, Iso, MappedNGSILDSerializer, Property
+)
 from .models import WaterSupplyPoint, DrainagePoint, StreetLight, EnergyMeter, TelecomTower
 
 
@@ -53,407 +56,130 @@ class TelecomTowerSerializer(serializers.ModelSerializer):
 
 # ============= NGSI-LD Serializers =============
 
-class WaterSupplyPointNGSILDSerializer(serializers.ModelSerializer):
+def _percentage(part, whole):
+    return round((part / max(whole, 1)) * 100, 2)
+
+
+class WaterSupplyPointNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Water Supply Point (WaterDistribution)"""
     
-    def to_representation(self, instance):
-        fill_pct = round((instance.current_level / max(instance.capacity, 1)) * 100, 2)
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.entity_id or f"urn:ngsi-ld:WaterDistribution:{instance.id}",
-            "type": "WaterDistribution",
-            "name": {
-                "type": "Property",
-                "value": instance.name
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address or "",
-                    "addressLocality": instance.city or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "waterType": {
-                "type": "Property",
-                "value": instance.point_type
-            },
-            "capacity": {
-                "type": "Property",
-                "value": float(instance.capacity),
-                "unitCode": "LTR"
-            },
-            "currentLevel": {
-                "type": "Property",
-                "value": float(instance.current_level),
-                "unitCode": "LTR",
-                "observedAt": instance.last_reading_at.isoformat() if instance.last_reading_at else None
-            },
-            "fillPercentage": {
-                "type": "Property",
-                "value": fill_pct,
-                "unitCode": "P1"
-            },
-            "flowRate": {
-                "type": "Property",
-                "value": float(instance.flow_rate) if instance.flow_rate else 0,
-                "unitCode": "LTR/MIN"
-            },
-            "pressure": {
-                "type": "Property",
-                "value": float(instance.pressure) if instance.pressure else 0,
-                "unitCode": "BAR"
-            },
-            "waterQuality": {
-                "type": "Property",
-                "value": {
-                    "phLevel": float(instance.ph_level) if instance.ph_level else None,
-                    "chlorineLevel": float(instance.chlorine_level) if instance.chlorine_level else None,
-                    "turbidity": float(instance.turbidity) if instance.turbidity else None
-                }
-            },
-            "status": {
-                "type": "Property",
-                "value": instance.status
-            }
-        }
+    mapping = EntityMapping("WaterDistribution", {
+        "name": Property("name"),
+        "location": GeoPoint(),
+        "address": Address(),
+        "waterType": Property("point_type"),
+        "capacity": Property(Float("capacity"), unit="LTR"),
+        "currentLevel": Property(Float("current_level"), unit="LTR", observed_at="last_reading_at"),
+        "fillPercentage": Property(Call(_percentage, "current_level", "capacity"), unit="P1"),
+        "flowRate": Property(Float("flow_rate", 0), unit="LTR/MIN"),
+        "pressure": Property(Float("pressure", 0), unit="BAR"),
+        "waterQuality": Property({
+            "phLevel": Float("ph_level", None),
+            "chlorineLevel": Float("chlorine_level", None),
+            "turbidity": Float("turbidity", None),
+        }),
+        "status": Property("status"),
+    })
     
     class Meta:
         model = WaterSupplyPoint
         fields = "__all__"
 
 
-class DrainagePointNGSILDSerializer(serializers.ModelSerializer):
+class DrainagePointNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Drainage Point (WasteWaterManagement)"""
     
-    def to_representation(self, instance):
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.entity_id or f"urn:ngsi-ld:WasteWaterManagement:{instance.id}",
-            "type": "WasteWaterManagement",
-            "name": {
-                "type": "Property",
-                "value": instance.name
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address or "",
-                    "addressLocality": instance.city or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "drainageType": {
-                "type": "Property",
-                "value": instance.point_type
-            },
-            "capacity": {
-                "type": "Property",
-                "value": float(instance.capacity) if instance.capacity else 0,
-                "unitCode": "MTQ"
-            },
-            "currentLevel": {
-                "type": "Property",
-                "value": float(instance.current_level) if instance.current_level else 0,
-                "unitCode": "P1"
-            },
-            "flowRate": {
-                "type": "Property",
-                "value": float(instance.flow_rate) if instance.flow_rate else 0,
-                "unitCode": "MTQ/H"
-            },
-            "status": {
-                "type": "Property",
-                "value": instance.status
-            },
-            "floodRisk": {
-                "type": "Property",
-                "value": instance.flood_risk
-            },
-            "lastReadingAt": {
-                "type": "Property",
-                "value": instance.last_reading_at.isoformat() if instance.last_reading_at else None
-            }
-        }
+    mapping = EntityMapping("WasteWaterManagement", {
+        "name": Property("name"),
+        "location": GeoPoint(),
+        "address": Address(),
+        "drainageType": Property("point_type"),
+        "capacity": Property(Float("capacity", 0), unit="MTQ"),
+        "currentLevel": Property(Float("current_level", 0), unit="P1"),
+        "flowRate": Property(Float("flow_rate", 0), unit="MTQ/H"),
+        "status": Property("status"),
+        "floodRisk": Property("flood_risk"),
+        "lastReadingAt": Property(Iso("last_reading_at")),
+    })
     
     class Meta:
         model = DrainagePoint
         fields = "__all__"
 
 
-class StreetLightNGSILDSerializer(serializers.ModelSerializer):
+class StreetLightNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Street Light (Streetlight)"""
     
-    def to_representation(self, instance):
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.entity_id or f"urn:ngsi-ld:Streetlight:{instance.id}",
-            "type": "Streetlight",
-            "name": {
-                "type": "Property",
-                "value": f"Pole {instance.pole_id}"
-            },
-            "poleId": {
-                "type": "Property",
-                "value": instance.pole_id
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address or "",
-                    "addressLocality": instance.city or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "lampType": {
-                "type": "Property",
-                "value": instance.lamp_type
-            },
-            "powerConsumption": {
-                "type": "Property",
-                "value": instance.power_rating,
-                "unitCode": "WAT"
-            },
-            "illuminanceLevel": {
-                "type": "Property",
-                "value": instance.brightness_level,
-                "unitCode": "P1"
-            },
-            "status": {
-                "type": "Property",
-                "value": instance.status
-            },
-            "isAutomatic": {
-                "type": "Property",
-                "value": instance.is_smart
-            },
-            "features": {
-                "type": "Property",
-                "value": {
-                    "hasMotionSensor": instance.has_motion_sensor,
-                    "hasLightSensor": instance.has_light_sensor,
-                    "hasCamera": instance.has_camera,
-                    "hasAirQualitySensor": instance.has_air_quality_sensor
-                }
-            },
-            "energyConsumedToday": {
-                "type": "Property",
-                "value": instance.energy_consumed_today,
-                "unitCode": "KWH"
-            },
-            "lastMaintenanceDate": {
-                "type": "Property",
-                "value": instance.last_maintenance_at.isoformat() if instance.last_maintenance_at else None
-            },
-            "dateInstalled": {
-                "type": "Property",
-                "value": instance.installed_at.isoformat() if instance.installed_at else None
-            }
-        }
+    mapping = EntityMapping("Streetlight", {
+        "name": Property(Call("Pole {}".format, "pole_id")),
+        "poleId": Property("pole_id"),
+        "location": GeoPoint(),
+        "address": Address(),
+        "lampType": Property("lamp_type"),
+        "powerConsumption": Property("power_rating", unit="WAT"),
+        "illuminanceLevel": Property("brightness_level", unit="P1"),
+        "status": Property("status"),
+        "isAutomatic": Property("is_smart"),
+        "features": Property({
+            "hasMotionSensor": "has_motion_sensor",
+            "hasLightSensor": "has_light_sensor",
+            "hasCamera": "has_camera",
+            "hasAirQualitySensor": "has_air_quality_sensor",
+        }),
+        "energyConsumedToday": Property("energy_consumed_today", unit="KWH"),
+        "lastMaintenanceDate": Property(Iso("last_maintenance_at")),
+        "dateInstalled": Property(Iso("installed_at")),
+    })
     
     class Meta:
         model = StreetLight
         fields = "__all__"
 
 
-class EnergyMeterNGSILDSerializer(serializers.ModelSerializer):
+class EnergyMeterNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Energy Meter (EnergyMeter)"""
     
-    def to_representation(self, instance):
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.entity_id or f"urn:ngsi-ld:EnergyMeter:{instance.id}",
-            "type": "EnergyMeter",
-            "name": {
-                "type": "Property",
-                "value": instance.name
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address or "",
-                    "addressLocality": instance.city or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "meterType": {
-                "type": "Property",
-                "value": instance.meter_type
-            },
-            "totalEnergyConsumed": {
-                "type": "Property",
-                "value": float(instance.today_consumption) if instance.today_consumption else 0,
-                "unitCode": "KWH"
-            },
-            "monthConsumption": {
-                "type": "Property",
-                "value": float(instance.month_consumption) if instance.month_consumption else 0,
-                "unitCode": "KWH"
-            },
-            "currentPower": {
-                "type": "Property",
-                "value": float(instance.current_power) if instance.current_power else 0,
-                "unitCode": "KWT"
-            },
-            "voltage": {
-                "type": "Property",
-                "value": float(instance.voltage) if instance.voltage else 0,
-                "unitCode": "VLT"
-            },
-            "current": {
-                "type": "Property",
-                "value": float(instance.current) if instance.current else 0,
-                "unitCode": "AMP"
-            },
-            "powerFactor": {
-                "type": "Property",
-                "value": float(instance.power_factor) if instance.power_factor else 0
-            },
-            "frequency": {
-                "type": "Property",
-                "value": float(instance.frequency) if instance.frequency else 50,
-                "unitCode": "HTZ"
-            },
-            "status": {
-                "type": "Property",
-                "value": instance.status
-            },
-            "lastReadingDate": {
-                "type": "Property",
-                "value": instance.last_reading_at.isoformat() if instance.last_reading_at else None
-            }
-        }
+    mapping = EntityMapping("EnergyMeter", {
+        "name": Property("name"),
+        "location": GeoPoint(),
+        "address": Address(),
+        "meterType": Property("meter_type"),
+        "totalEnergyConsumed": Property(Float("today_consumption", 0), unit="KWH"),
+        "monthConsumption": Property(Float("month_consumption", 0), unit="KWH"),
+        "currentPower": Property(Float("current_power", 0), unit="KWT"),
+        "voltage": Property(Float("voltage", 0), unit="VLT"),
+        "current": Property(Float("current", 0), unit="AMP"),
+        "powerFactor": Property(Float("power_factor", 0)),
+        "frequency": Property(Float("frequency", 50), unit="HTZ"),
+        "status": Property("status"),
+        "lastReadingDate": Property(Iso("last_reading_at")),
+    })
     
     class Meta:
         model = EnergyMeter
         fields = "__all__"
 
 
-class TelecomTowerNGSILDSerializer(serializers.ModelSerializer):
+class TelecomTowerNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Telecom Tower (PointOfInteraction)"""
     
-    def to_representation(self, instance):
-        utilization = round((instance.active_connections / max(instance.max_connections, 1)) * 100, 2)
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.entity_id or f"urn:ngsi-ld:PointOfInteraction:{instance.id}",
-            "type": "PointOfInteraction",
-            "name": {
-                "type": "Property",
-                "value": instance.name
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "streetAddress": instance.address or "",
-                    "addressLocality": instance.city or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "category": {
-                "type": "Property",
-                "value": "telecom"
-            },
-            "towerType": {
-                "type": "Property",
-                "value": instance.tower_type
-            },
-            "operator": {
-                "type": "Property",
-                "value": instance.provider or ""
-            },
-            "supportedTechnologies": {
-                "type": "Property",
-                "value": instance.technologies or []
-            },
-            "frequencyBands": {
-                "type": "Property",
-                "value": instance.frequency_bands or []
-            },
-            "height": {
-                "type": "Property",
-                "value": float(instance.height) if instance.height else 0,
-                "unitCode": "MTR"
-            },
-            "coverageRadius": {
-                "type": "Property",
-                "value": float(instance.coverage_radius) if instance.coverage_radius else 0,
-                "unitCode": "MTR"
-            },
-            "maxConnections": {
-                "type": "Property",
-                "value": instance.max_connections
-            },
-            "activeConnections": {
-                "type": "Property",
-                "value": instance.active_connections,
-                "observedAt": instance.updated_at.isoformat() if instance.updated_at else None
-            },
-            "utilizationRate": {
-                "type": "Property",
-                "value": utilization,
-                "unitCode": "P1"
-            },
-            "signalStrength": {
-                "type": "Property",
-                "value": float(instance.signal_strength) if instance.signal_strength else 0,
-                "unitCode": "DBM"
-            },
-            "status": {
-                "type": "Property",
-                "value": instance.status
-            }
-        }
+    mapping = EntityMapping("PointOfInteraction", {
+        "name": Property("name"),
+        "location": GeoPoint(),
+        "address": Address(),
+        "category": Property(Const("telecom")),
+        "towerType": Property("tower_type"),
+        "operator": Property(Column("provider", "")),
+        "supportedTechnologies": Property(Column("technologies", [])),
+        "frequencyBands": Property(Column("frequency_bands", [])),
+        "height": Property(Float("height", 0), unit="MTR"),
+        "coverageRadius": Property(Float("coverage_radius", 0), unit="MTR"),
+        "maxConnections": Property("max_connections"),
+        "activeConnections": Property("active_connections", observed_at="updated_at"),
+        "utilizationRate": Property(Call(_percentage, "active_connections", "max_connections"), unit="P1"),
+        "signalStrength": Property(Float("signal_strength", 0), unit="DBM"),
+        "status": Property("status"),
+    })
     
     class Meta:
         model = TelecomTower
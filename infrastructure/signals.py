@@ -0,0 +1,35 @@
+"""
+Signal handlers for the infrastructure app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.response_cache import invalidate_responses
+from core.summary import invalidate_summaries
+from entities.tracking import track_mapping
+from .models import WaterSupplyPoint, DrainagePoint, StreetLight, EnergyMeter, TelecomTower
+from .serializers import (
+    WaterSupplyPointNGSILDSerializer,
+    DrainagePointNGSILDSerializer,
+    StreetLightNGSILDSerializer,
+    EnergyMeterNGSILDSerializer,
+    TelecomTowerNGSILDSerializer,
+)
+
+
+@receiver([post_save, post_delete], sender=WaterSupplyPoint)
+@receiver([post_save, post_delete], sender=DrainagePoint)
+@receiver([post_save, post_delete], sender=StreetLight)
+@receiver([post_save, post_delete], sender=EnergyMeter)
+@receiver([post_save, post_delete], sender=TelecomTower)
+def invalidate_caches(sender, **kwargs):
+    """Cached infrastructure summaries, statistics and responses are stale after any write"""
+    invalidate_summaries('infrastructure')
+    invalidate_responses(sender)
+
+
+# Saved rows are mirrored as entities and their changed attributes queued for Orion-LD
+track_mapping(WaterSupplyPoint, WaterSupplyPointNGSILDSerializer.mapping)
+track_mapping(DrainagePoint, DrainagePointNGSILDSerializer.mapping)
+track_mapping(StreetLight, StreetLightNGSILDSerializer.mapping)
+track_mapping(EnergyMeter, EnergyMeterNGSILDSerializer.mapping)
+track_mapping(TelecomTower, TelecomTowerNGSILDSerializer.mapping)
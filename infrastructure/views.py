@@ -3,6 +3,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db.models import Count, Sum, Avg
+from core.mixins import AtomicWriteMixin, NearbyMixin
+from core.response_cache import CachedResponseMixin
+from core.streaming import ngsi_ld_response
+from core.summary import cached_summary, count_if, filter_city
 from .models import WaterSupplyPoint, DrainagePoint, StreetLight, EnergyMeter, TelecomTower
 from .serializers import (
     WaterSupplyPointSerializer, DrainagePointSerializer, StreetLightSerializer, EnergyMeterSerializer, TelecomTowerSerializer,
@@ -10,12 +14,12 @@ from .serializers import (
 )
 
 
-class WaterSupplyPointViewSet(viewsets.ModelViewSet):
+class WaterSupplyPointViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = WaterSupplyPoint.objects.all()
     serializer_class = WaterSupplyPointSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -28,18 +32,17 @@ class WaterSupplyPointViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = WaterSupplyPoint.objects.count()
-        total_capacity = WaterSupplyPoint.objects.aggregate(sum=Sum("capacity"))["sum"] or 0
-        total_current = WaterSupplyPoint.objects.aggregate(sum=Sum("current_level"))["sum"] or 0
-        by_type = list(WaterSupplyPoint.objects.values("point_type").annotate(count=Count("id")))
-        by_status = list(WaterSupplyPoint.objects.values("status").annotate(count=Count("id")))
-        return Response({"total_points": total, "total_capacity": total_capacity, "current_storage": total_current, "by_type": by_type, "by_status": by_status})
+        def compute():
+            totals = WaterSupplyPoint.objects.aggregate(total=Count("id"), capacity=Sum("capacity"), current=Sum("current_level"))
+            by_type = list(WaterSupplyPoint.objects.values("point_type").annotate(count=Count("id")).order_by())
+            by_status = list(WaterSupplyPoint.objects.values("status").annotate(count=Count("id")).order_by())
+            return {"total_points": totals["total"], "total_capacity": totals["capacity"] or 0, "current_storage": totals["current"] or 0, "by_type": by_type, "by_status": by_status}
+        return Response(cached_summary("infrastructure", "water_supply", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         queryset = self.get_queryset()
-        serializer = WaterSupplyPointNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, WaterSupplyPointNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -48,12 +51,12 @@ class WaterSupplyPointViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class DrainagePointViewSet(viewsets.ModelViewSet):
+class DrainagePointViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = DrainagePoint.objects.all()
     serializer_class = DrainagePointSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -66,17 +69,19 @@ class DrainagePointViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = DrainagePoint.objects.count()
-        by_type = list(DrainagePoint.objects.values("point_type").annotate(count=Count("id")))
-        by_status = list(DrainagePoint.objects.values("status").annotate(count=Count("id")))
-        by_flood_risk = list(DrainagePoint.objects.values("flood_risk").annotate(count=Count("id")))
-        return Response({"total_points": total, "critical_count": DrainagePoint.objects.filter(status="critical").count(), "by_type": by_type, "by_status": by_status, "by_flood_risk": by_flood_risk})
+        def compute():
+            by_type = list(DrainagePoint.objects.values("point_type").annotate(count=Count("id")).order_by())
+            by_status = list(DrainagePoint.objects.values("status").annotate(count=Count("id")).order_by())
+            by_flood_risk = list(DrainagePoint.objects.values("flood_risk").annotate(count=Count("id")).order_by())
+            total = sum(item["count"] for item in by_status)
+            critical = sum(item["count"] for item in by_status if item["status"] == "critical")
+            return {"total_points": total, "critical_count": critical, "by_type": by_type, "by_status": by_status, "by_flood_risk": by_flood_risk}
+        return Response(cached_summary("infrastructure", "drainage", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         queryset = self.get_queryset()
-        serializer = DrainagePointNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, DrainagePointNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -85,12 +90,12 @@ class DrainagePointViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class StreetLightViewSet(viewsets.ModelViewSet):
+class StreetLightViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = StreetLight.objects.all()
     serializer_class = StreetLightSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -103,11 +108,13 @@ class StreetLightViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = StreetLight.objects.count()
-        smart_count = StreetLight.objects.filter(is_smart=True).count()
-        total_energy = StreetLight.objects.aggregate(sum=Sum("energy_consumed_today"))["sum"] or 0
-        by_status = list(StreetLight.objects.values("status").annotate(count=Count("id")))
-        return Response({"total_lights": total, "smart_lights": smart_count, "total_energy_today": total_energy, "by_status": by_status})
+        def compute():
+            totals = StreetLight.objects.aggregate(
+                total=Count("id"), smart=count_if(is_smart=True), energy=Sum("energy_consumed_today")
+            )
+            by_status = list(StreetLight.objects.values("status").annotate(count=Count("id")).order_by())
+            return {"total_lights": totals["total"], "smart_lights": totals["smart"], "total_energy_today": totals["energy"] or 0, "by_status": by_status}
+        return Response(cached_summary("infrastructure", "street_lights", None, compute))
     
     @action(detail=True, methods=["post"])
     def toggle(self, request, pk=None):
@@ -124,8 +131,7 @@ class StreetLightViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         queryset = self.get_queryset()
-        serializer = StreetLightNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, StreetLightNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -134,12 +140,12 @@ class StreetLightViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class EnergyMeterViewSet(viewsets.ModelViewSet):
+class EnergyMeterViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = EnergyMeter.objects.all()
     serializer_class = EnergyMeterSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -152,18 +158,17 @@ class EnergyMeterViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = EnergyMeter.objects.count()
-        total_power = EnergyMeter.objects.aggregate(sum=Sum("current_power"))["sum"] or 0
-        total_today = EnergyMeter.objects.aggregate(sum=Sum("today_consumption"))["sum"] or 0
-        by_type = list(EnergyMeter.objects.values("meter_type").annotate(count=Count("id")))
-        by_status = list(EnergyMeter.objects.values("status").annotate(count=Count("id")))
-        return Response({"total_meters": total, "total_current_power": round(total_power, 2), "total_consumption_today": round(total_today, 2), "by_type": by_type, "by_status": by_status})
+        def compute():
+            totals = EnergyMeter.objects.aggregate(total=Count("id"), power=Sum("current_power"), today=Sum("today_consumption"))
+            by_type = list(EnergyMeter.objects.values("meter_type").annotate(count=Count("id")).order_by())
+            by_status = list(EnergyMeter.objects.values("status").annotate(count=Count("id")).order_by())
+            return {"total_meters": totals["total"], "total_current_power": round(totals["power"] or 0, 2), "total_consumption_today": round(totals["today"] or 0, 2), "by_type": by_type, "by_status": by_status}
+        return Response(cached_summary("infrastructure", "energy", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         queryset = self.get_queryset()
-        serializer = EnergyMeterNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, EnergyMeterNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -172,12 +177,12 @@ class EnergyMeterViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class TelecomTowerViewSet(viewsets.ModelViewSet):
+class TelecomTowerViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = TelecomTower.objects.all()
     serializer_class = TelecomTowerSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -190,18 +195,17 @@ class TelecomTowerViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = TelecomTower.objects.count()
-        total_connections = TelecomTower.objects.aggregate(sum=Sum("active_connections"))["sum"] or 0
-        max_connections = TelecomTower.objects.aggregate(sum=Sum("max_connections"))["sum"] or 0
-        by_type = list(TelecomTower.objects.values("tower_type").annotate(count=Count("id")))
-        by_provider = list(TelecomTower.objects.values("operator").annotate(count=Count("id")))
-        return Response({"total_towers": total, "total_active_connections": total_connections, "by_type": by_type, "by_provider": by_provider})
+        def compute():
+            totals = TelecomTower.objects.aggregate(total=Count("id"), connections=Sum("active_connections"))
+            by_type = list(TelecomTower.objects.values("tower_type").annotate(count=Count("id")).order_by())
+            by_provider = list(TelecomTower.objects.values("provider").annotate(count=Count("id")).order_by())
+            return {"total_towers": totals["total"], "total_active_connections": totals["connections"] or 0, "by_type": by_type, "by_provider": by_provider}
+        return Response(cached_summary("infrastructure", "telecom", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         queryset = self.get_queryset()
-        serializer = TelecomTowerNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, TelecomTowerNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -215,25 +219,28 @@ class InfrastructureSummaryViewSet(viewsets.ViewSet):
     
     def list(self, request):
         city = request.query_params.get("city")
-        water_qs = WaterSupplyPoint.objects.all()
-        drainage_qs = DrainagePoint.objects.all()
-        lights_qs = StreetLight.objects.all()
-        energy_qs = EnergyMeter.objects.all()
-        telecom_qs = TelecomTower.objects.all()
-        if city:
-            water_qs = water_qs.filter(city__icontains=city)
-            drainage_qs = drainage_qs.filter(city__icontains=city)
-            lights_qs = lights_qs.filter(city__icontains=city)
-            energy_qs = energy_qs.filter(city__icontains=city)
-            telecom_qs = telecom_qs.filter(city__icontains=city)
-        water_capacity = water_qs.aggregate(sum=Sum("capacity"))["sum"] or 0
-        water_current = water_qs.aggregate(sum=Sum("current_level"))["sum"] or 0
-        total_energy = energy_qs.aggregate(sum=Sum("current_power"))["sum"] or 0
-        total_connections = telecom_qs.aggregate(sum=Sum("active_connections"))["sum"] or 0
-        return Response({
-            "water_supply": {"total_points": water_qs.count(), "operational": water_qs.filter(status="operational").count(), "capacity": water_capacity, "current_level": water_current},
-            "drainage": {"total_points": drainage_qs.count(), "normal": drainage_qs.filter(status="normal").count(), "critical": drainage_qs.filter(status="critical").count()},
-            "street_lights": {"total": lights_qs.count(), "on": lights_qs.filter(status="on").count(), "smart_lights": lights_qs.filter(is_smart=True).count()},
-            "energy": {"total_meters": energy_qs.count(), "total_current_power": round(total_energy, 2)},
-            "telecom": {"total_towers": telecom_qs.count(), "active": telecom_qs.filter(status="active").count(), "total_connections": total_connections}
-        })
+        return Response(cached_summary("infrastructure", "summary", city, lambda: self.summarize(city)))
+    
+    @staticmethod
+    def summarize(city):
+        """One conditional aggregate query per model"""
+        water = filter_city(WaterSupplyPoint.objects.all(), city).aggregate(
+            total=Count("id"), operational=count_if(status="operational"), capacity=Sum("capacity"), current=Sum("current_level")
+        )
+        drainage = filter_city(DrainagePoint.objects.all(), city).aggregate(
+            total=Count("id"), normal=count_if(status="normal"), critical=count_if(status="critical")
+        )
+        lights = filter_city(StreetLight.objects.all(), city).aggregate(
+            total=Count("id"), on=count_if(status="on"), smart=count_if(is_smart=True)
+        )
+        energy = filter_city(EnergyMeter.objects.all(), city).aggregate(total=Count("id"), power=Sum("current_power"))
+        telecom = filter_city(TelecomTower.objects.all(), city).aggregate(
+            total=Count("id"), active=count_if(status="active"), connections=Sum("active_connections")
+        )
+        return {
+            "water_supply": {"total_points": water["total"], "operational": water["operational"], "capacity": water["capacity"] or 0, "current_level": water["current"] or 0},
+            "drainage": {"total_points": drainage["total"], "normal": drainage["normal"], "critical": drainage["critical"]},
+            "street_lights": {"total": lights["total"], "on": lights["on"], "smart_lights": lights["smart"]},
+            "energy": {"total_meters": energy["total"], "total_current_power": round(energy["power"] or 0, 2)},
+            "telecom": {"total_towers": telecom["total"], "active": telecom["active"], "total_connections": telecom["connections"] or 0}
+        }
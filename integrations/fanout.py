@@ -0,0 +1,121 @@
+"""
+Bounded concurrent fetching from external data providers
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+from django.conf import settings
+from django.db import connections
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_PER_MINUTE = 60
+
+
+class RateLimiter:
+    """Space out call starts so no more than ``per_minute`` begin per minute"""
+    
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        """Block until the next call is allowed to start"""
+        if not self.interval:
+            return
+        
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        
+        if start > now:
+            time.sleep(start - now)
+
+
+def get_provider_rate_limit(provider_slug: str) -> int:
+    """Requests per minute allowed for a provider (from ExternalAPIProvider)"""
+    from .models import ExternalAPIProvider
+    
+    rate_limit = ExternalAPIProvider.objects.filter(
+        slug=provider_slug
+    ).values_list('rate_limit_per_minute', flat=True).first()
+    return rate_limit or DEFAULT_RATE_LIMIT_PER_MINUTE
+
+
+def fetch_concurrently(
+    items: Iterable[Any],
+    fetch: Callable[[Any], Optional[Dict[str, Any]]],
+    provider_slug: str,
+    label: Callable[[Any], str] = str,
+    max_workers: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Call ``fetch(item)`` for every item on a bounded thread pool.
+    
+    Concurrency is capped by SYNC_MAX_WORKERS and by the provider's
+    ``rate_limit_per_minute``, which also paces request starts. ``fetch``
+    may query the database (provider clients resolve their API key and
+    quota on a cache miss); pool threads close their connections after
+    each call so none are left open.
+    
+    Returns::
+    
+        {
+            "results": [(item, data), ...],   # fetch returned data
+            "failed": {label: reason},        # exception or no data
+            "latency": {label: seconds},
+            "wall_time": seconds,
+        }
+    """
+    items = list(items)
+    rate_limit = get_provider_rate_limit(provider_slug)
+    max_workers = max_workers or getattr(settings, 'SYNC_MAX_WORKERS', 8)
+    max_workers = max(1, min(max_workers, rate_limit, len(items) or 1))
+    limiter = RateLimiter(rate_limit)
+    
+    def timed_fetch(item):
+        limiter.wait()
+        started = time.monotonic()
+        try:
+            return fetch(item), None, time.monotonic() - started
+        except Exception as e:
+            return None, e, time.monotonic() - started
+        finally:
+            connections.close_all()
+    
+    report = {"results": [], "failed": {}, "latency": {}, "wall_time": 0.0}
+    started = time.monotonic()
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item, (data, error, elapsed) in zip(items, executor.map(timed_fetch, items)):
+            name = label(item)
+            report["latency"][name] = round(elapsed, 3)
+            
+            if error is not None:
+                logger.error(f"{provider_slug} fetch failed for {name}: {error}")
+                report["failed"][name] = str(error)
+            elif not data:
+                report["failed"][name] = "no data"
+            else:
+                report["results"].append((item, data))
+    
+    report["wall_time"] = round(time.monotonic() - started, 3)
+    return report
+
+
+def summarize(report: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-serializable run summary (drops the fetched payloads)"""
+    latencies = sorted(report["latency"].values())
+    return {
+        "fetched": len(report["results"]),
+        "failed": len(report["failed"]),
+        "wall_time": report["wall_time"],
+        "latency_max": latencies[-1] if latencies else 0,
+        "latency_p50": latencies[len(latencies) // 2] if latencies else 0,
+        "latency": report["latency"],
+        "failures": report["failed"],
+    }
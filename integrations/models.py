@@ -2,23 +2,41 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from cryptography.fernet import Fernet
 from django.conf import settings
+from functools import lru_cache
+import base64
+import hashlib
 import json
+import threading
+import time
+from typing import NamedTuple, Optional
 
 User = get_user_model()
 
 
+@lru_cache(maxsize=None)
+def _derive_key(secret):
+    return base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest())
+
+
+@lru_cache(maxsize=None)
+def _fernet_for(key):
+    return Fernet(key)
+
+
 def get_encryption_key():
     """Get or generate encryption key for API keys"""
     key = getattr(settings, 'API_KEY_ENCRYPTION_KEY', None)
     if not key:
         # Use SECRET_KEY as base for encryption
-        import hashlib
-        import base64
-        hash_key = hashlib.sha256(settings.SECRET_KEY.encode()).digest()
-        key = base64.urlsafe_b64encode(hash_key)
+        key = _derive_key(settings.SECRET_KEY)
     return key
 
 
+def get_fernet():
+    """Fernet instance for the current encryption key (built once per key)"""
+    return _fernet_for(get_encryption_key())
+
+
 class ExternalAPIProvider(models.Model):
     """
     Định nghĩa các nhà cung cấp API bên thứ 3
@@ -120,7 +138,7 @@ class UserAPIKey(models.Model):
         if not self._encrypted_key:
             return None
         try:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             return f.decrypt(bytes(self._encrypted_key)).decode()
         except Exception:
             return None
@@ -129,7 +147,7 @@ class UserAPIKey(models.Model):
     def api_key(self, value):
         """Encrypt and store API key"""
         if value:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             self._encrypted_key = f.encrypt(value.encode())
         else:
             self._encrypted_key = None
@@ -140,7 +158,7 @@ class UserAPIKey(models.Model):
         if not self._encrypted_credentials:
             return {}
         try:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             decrypted = f.decrypt(bytes(self._encrypted_credentials)).decode()
             return json.loads(decrypted)
         except Exception:
@@ -150,17 +168,15 @@ class UserAPIKey(models.Model):
     def credentials(self, value):
         """Encrypt and store credentials"""
         if value:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             self._encrypted_credentials = f.encrypt(json.dumps(value).encode())
         else:
             self._encrypted_credentials = None
     
-    def increment_usage(self):
-        """Increment usage count and update last_used"""
-        from django.utils import timezone
-        self.usage_count += 1
-        self.last_used = timezone.now()
-        self.save(update_fields=['usage_count', 'last_used'])
+    def increment_usage(self, count=1):
+        """Record usage; counts are written in bulk by integrations.usage"""
+        from .usage import usage_tracker
+        usage_tracker.record(type(self), self.pk, count)
 
 
 class SystemAPIKey(models.Model):
@@ -208,7 +224,7 @@ class SystemAPIKey(models.Model):
         if not self._encrypted_key:
             return None
         try:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             return f.decrypt(bytes(self._encrypted_key)).decode()
         except Exception:
             return None
@@ -217,7 +233,7 @@ class SystemAPIKey(models.Model):
     def api_key(self, value):
         """Encrypt and store API key"""
         if value:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             self._encrypted_key = f.encrypt(value.encode())
         else:
             self._encrypted_key = None
@@ -228,7 +244,7 @@ class SystemAPIKey(models.Model):
         if not self._encrypted_credentials:
             return {}
         try:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             decrypted = f.decrypt(bytes(self._encrypted_credentials)).decode()
             return json.loads(decrypted)
         except Exception:
@@ -238,17 +254,37 @@ class SystemAPIKey(models.Model):
     def credentials(self, value):
         """Encrypt and store credentials"""
         if value:
-            f = Fernet(get_encryption_key())
+            f = get_fernet()
             self._encrypted_credentials = f.encrypt(json.dumps(value).encode())
         else:
             self._encrypted_credentials = None
     
-    def increment_usage(self):
-        """Increment usage count"""
-        from django.utils import timezone
-        self.usage_count += 1
-        self.last_used = timezone.now()
-        self.save(update_fields=['usage_count', 'last_used'])
+    def increment_usage(self, count=1):
+        """Record usage; counts are written in bulk by integrations.usage"""
+        from .usage import usage_tracker
+        usage_tracker.record(type(self), self.pk, count)
+
+
+class ResolvedAPIKey(NamedTuple):
+    """Result of resolving the API key to use for a provider"""
+    key: Optional[str]
+    model: Optional[type] = None        # UserAPIKey / SystemAPIKey, None for .env
+    pk: Optional[int] = None
+    rate_limit_per_minute: Optional[int] = None
+    rate_limit_per_day: Optional[int] = None
+
+
+# Resolved keys per (provider_slug, user_id): (expires_at, ResolvedAPIKey).
+# Cleared by integrations.signals whenever a provider or key changes in this
+# process.
+_resolved_keys = {}
+_resolved_keys_lock = threading.Lock()
+
+
+def clear_api_key_cache():
+    """Forget all resolved API keys"""
+    with _resolved_keys_lock:
+        _resolved_keys.clear()
 
 
 def get_api_key_for_provider(provider_slug, user=None):
@@ -256,32 +292,73 @@ def get_api_key_for_provider(provider_slug, user=None):
     Helper function để lấy API key cho một provider
     Ưu tiên: User key > System key > .env fallback
     """
-    from django.conf import settings
+    return resolve_api_key(provider_slug, user).key
+
+
+def resolve_api_key(provider_slug, user=None):
+    """
+    Resolve the key for a provider together with the row it came from and
+    the provider's rate limits.
+    
+    Results are cached for API_KEY_CACHE_TTL seconds per (provider_slug, user_id).
+    """
+    cache_key = (provider_slug, getattr(user, 'pk', None))
+    now = time.monotonic()
+    
+    with _resolved_keys_lock:
+        entry = _resolved_keys.get(cache_key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    
+    resolved = _resolve_api_key(provider_slug, user)
+    ttl = getattr(settings, 'API_KEY_CACHE_TTL', 60)
+    
+    with _resolved_keys_lock:
+        if len(_resolved_keys) >= getattr(settings, 'API_KEY_CACHE_SIZE', 10000):
+            for stale in [k for k, (expires_at, _) in _resolved_keys.items() if expires_at <= now]:
+                del _resolved_keys[stale]
+        _resolved_keys[cache_key] = (now + ttl, resolved)
+    
+    return resolved
+
+
+def _resolve_api_key(provider_slug, user=None):
+    """Look up and decrypt the key for a provider (uncached)"""
+    env_key_name = f"{provider_slug.upper().replace('-', '_')}_API_KEY"
     
     try:
-        provider = ExternalAPIProvider.objects.get(slug=provider_slug, is_active=True)
+        provider = ExternalAPIProvider.objects.select_related('system_key').get(
+            slug=provider_slug, is_active=True
+        )
     except ExternalAPIProvider.DoesNotExist:
         # Fallback to .env
-        env_key_name = f"{provider_slug.upper().replace('-', '_')}_API_KEY"
-        return getattr(settings, env_key_name, None)
+        return ResolvedAPIKey(getattr(settings, env_key_name, None))
+    
+    limits = {
+        'rate_limit_per_minute': provider.rate_limit_per_minute,
+        'rate_limit_per_day': provider.rate_limit_per_day,
+    }
+    
+    try:
+        system_key = provider.system_key
+    except SystemAPIKey.DoesNotExist:
+        system_key = None
     
     # Try user key first
-    if user and provider.system_key.allow_user_override if hasattr(provider, 'system_key') else True:
+    if user and (system_key is None or system_key.allow_user_override):
         try:
             user_key = UserAPIKey.objects.get(user=user, provider=provider, is_active=True)
-            if user_key.api_key:
-                return user_key.api_key
+            api_key = user_key.api_key
+            if api_key:
+                return ResolvedAPIKey(api_key, UserAPIKey, user_key.pk, **limits)
         except UserAPIKey.DoesNotExist:
             pass
     
     # Try system key
-    try:
-        system_key = provider.system_key
-        if system_key.is_active and system_key.api_key:
-            return system_key.api_key
-    except SystemAPIKey.DoesNotExist:
-        pass
+    if system_key is not None and system_key.is_active:
+        api_key = system_key.api_key
+        if api_key:
+            return ResolvedAPIKey(api_key, SystemAPIKey, system_key.pk, **limits)
     
     # Fallback to .env
-    env_key_name = f"{provider_slug.upper().replace('-', '_')}_API_KEY"
-    return getattr(settings, env_key_name, None)
+    return ResolvedAPIKey(getattr(settings, env_key_name, None), **limits)
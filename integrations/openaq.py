@@ -5,6 +5,7 @@ import requests
 from datetime import datetime
 import logging
 from django.conf import settings
+from .usage import acquire_quota
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,7 @@ class OpenAQClient:
     
     def __init__(self, api_key: str = None, user=None):
         self.api_key = api_key or get_openaq_api_key(user)
+        self.user = user
     
     def get_latest_measurements(
         self,
@@ -52,6 +54,9 @@ class OpenAQClient:
         if self.api_key:
             headers["X-API-Key"] = self.api_key
         
+        if not acquire_quota('openaq', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, headers=headers, timeout=10)
             response.raise_for_status()
@@ -75,6 +80,9 @@ class OpenAQClient:
         if self.api_key:
             headers["X-API-Key"] = self.api_key
         
+        if not acquire_quota('openaq', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
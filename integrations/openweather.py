@@ -5,6 +5,7 @@ import requests
 from django.conf import settings
 from datetime import datetime
 import logging
+from .usage import acquire_quota
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +31,7 @@ class OpenWeatherMapClient:
     
     def __init__(self, api_key: str = None, user=None):
         self.api_key = api_key or get_openweather_api_key(user)
+        self.user = user
     
     def get_current_weather(self, lat: float, lon: float):
         """Get current weather data"""
@@ -42,6 +44,9 @@ class OpenWeatherMapClient:
             "units": "metric"
         }
         
+        if not acquire_quota('openweathermap', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
@@ -62,6 +67,9 @@ class OpenWeatherMapClient:
             "units": "metric"
         }
         
+        if not acquire_quota('openweathermap', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
@@ -0,0 +1,14 @@
+"""
+Signal handlers for the integrations app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import ExternalAPIProvider, SystemAPIKey, UserAPIKey, clear_api_key_cache
+
+
+@receiver([post_save, post_delete], sender=ExternalAPIProvider)
+@receiver([post_save, post_delete], sender=UserAPIKey)
+@receiver([post_save, post_delete], sender=SystemAPIKey)
+def invalidate_resolved_api_keys(sender, instance, **kwargs):
+    """A provider or key changed; re-resolve keys on next use"""
+    clear_api_key_cache()
@@ -1,125 +1,148 @@
 """
 Celery tasks for data synchronization
 """
+from typing import Any, Dict, Optional
 from celery import shared_task
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils import timezone
+from .fanout import fetch_concurrently, summarize
 from .openweather import OpenWeatherMapClient
 from .openaq import OpenAQClient, calculate_aqi_from_pm25
 from observations.models import WeatherObservation, AirQualityObservation
+from observations.writers import ObservationWriter
 from entities.models import WeatherStation, AirQualitySensor
 from core.ngsi_ld import (
     create_air_quality_observed_entity,
     create_weather_station_entity
 )
-from core.orion_client import OrionLDClient
+from core.async_orion_client import run_async
 import logging
 import uuid
 
 logger = logging.getLogger(__name__)
 
 
+def _add_row(writer: ObservationWriter, report: Dict[str, Any], label: str, **fields) -> Optional[models.Model]:
+    """
+    Validate one provider payload and buffer it; a malformed payload is
+    recorded in ``report['failed']`` and skipped instead of failing the run.
+    """
+    try:
+        instance = writer.model(**fields)
+        instance.clean_fields()
+    except (TypeError, ValueError, ValidationError) as e:
+        logger.error(f"Invalid {writer.model.__name__} payload for {label}: {e}")
+        report['failed'][label] = f"invalid data: {e}"
+        return None
+    return writer.add_instance(instance)
+
+
 @shared_task
 def sync_weather_data():
-    """Sync weather data from OpenWeatherMap"""
+    """Sync weather data from OpenWeatherMap; returns the run summary (fanout.summarize)"""
     logger.info("Starting weather data synchronization")
     
     # Get all active weather stations
-    stations = WeatherStation.objects.filter(is_active=True)
+    stations = list(WeatherStation.objects.filter(is_active=True))
     
     client = OpenWeatherMapClient()
-    orion_client = OrionLDClient()
     
-    count = 0
-    for station in stations:
-        try:
-            # Fetch weather data
-            weather_data = client.get_current_weather(
-                station.latitude,
-                station.longitude
+    # Fetch all stations concurrently, paced by the provider rate limit
+    report = fetch_concurrently(
+        stations,
+        lambda station: client.get_current_weather(station.latitude, station.longitude),
+        provider_slug='openweathermap',
+        label=lambda station: station.station_id
+    )
+    
+    timestamp = int(timezone.now().timestamp())
+    
+    # Save all observations in a single transaction
+    with transaction.atomic(), ObservationWriter(WeatherObservation) as writer:
+        for station, weather_data in report['results']:
+            _add_row(
+                writer, report, station.station_id,
+                observation_id=f"weather-{station.station_id}-{timestamp}",
+                **weather_data
             )
-            
-            if weather_data:
-                # Save to database
-                obs_id = f"weather-{station.station_id}-{int(timezone.now().timestamp())}"
-                
-                observation = WeatherObservation.objects.create(
-                    observation_id=obs_id,
-                    **weather_data
-                )
-                
-                count += 1
-                logger.info(f"Created weather observation for {station.name}")
-                
-                # Sync to Orion-LD if needed
-                # You can create NGSI-LD entity here
-                
-        except Exception as e:
-            logger.error(f"Failed to sync weather for {station.name}: {e}")
     
-    logger.info(f"Weather sync completed: {count} observations created")
-    return count
+    summary = summarize(report)
+    summary['sent'] = writer.sent
+    logger.info(
+        f"Weather sync completed: {summary['sent']} observations written, "
+        f"{summary['failed']} failed, wall time {summary['wall_time']}s, "
+        f"p50 {summary['latency_p50']}s, max {summary['latency_max']}s"
+    )
+    return summary
 
 
 @shared_task
 def sync_air_quality_data():
-    """Sync air quality data from OpenAQ"""
+    """Sync air quality data from OpenAQ; returns the run summary (fanout.summarize)"""
     logger.info("Starting air quality data synchronization")
     
     # Get all active air quality sensors
-    sensors = AirQualitySensor.objects.filter(is_active=True)
+    sensors = list(AirQualitySensor.objects.filter(is_active=True))
     
     client = OpenAQClient()
-    orion_client = OrionLDClient()
     
-    count = 0
-    for sensor in sensors:
-        try:
-            # Fetch air quality data
-            aq_data = client.get_latest_measurements(
-                sensor.latitude,
-                sensor.longitude,
-                radius=10000  # 10km
-            )
+    # Fetch all sensors concurrently, paced by the provider rate limit
+    report = fetch_concurrently(
+        sensors,
+        lambda sensor: client.get_latest_measurements(
+            sensor.latitude,
+            sensor.longitude,
+            radius=10000  # 10km
+        ),
+        provider_slug='openaq',
+        label=lambda sensor: sensor.sensor_id
+    )
+    
+    timestamp = int(timezone.now().timestamp())
+    ngsi_entities = []
+    
+    # Save all observations in a single transaction
+    with transaction.atomic(), ObservationWriter(AirQualityObservation) as writer:
+        for sensor, aq_data in report['results']:
+            # Calculate AQI if not provided
+            if aq_data.get('pm25') and not aq_data.get('aqi'):
+                aq_data['aqi'] = calculate_aqi_from_pm25(aq_data['pm25'])
+            
+            obs_id = f"airquality-{sensor.sensor_id}-{timestamp}"
+            observation = _add_row(writer, report, sensor.sensor_id, observation_id=obs_id, **aq_data)
+            if observation is None:
+                continue
             
-            if aq_data:
-                # Calculate AQI if not provided
-                if aq_data.get('pm25') and not aq_data.get('aqi'):
-                    aq_data['aqi'] = calculate_aqi_from_pm25(aq_data['pm25'])
-                
-                # Save to database
-                obs_id = f"airquality-{sensor.sensor_id}-{int(timezone.now().timestamp())}"
-                
-                observation = AirQualityObservation.objects.create(
-                    observation_id=obs_id,
-                    **aq_data
-                )
-                
-                # Create NGSI-LD entity
-                ngsi_entity = create_air_quality_observed_entity(
-                    observation_id=obs_id,
-                    latitude=aq_data['latitude'],
-                    longitude=aq_data['longitude'],
-                    aqi=aq_data.get('aqi'),
-                    pm25=aq_data.get('pm25'),
-                    pm10=aq_data.get('pm10'),
-                    no2=aq_data.get('no2'),
-                    o3=aq_data.get('o3'),
-                    co=aq_data.get('co'),
-                    so2=aq_data.get('so2'),
-                    date_observed=aq_data['observed_at']
-                )
-                
-                # Sync to Orion-LD
-                orion_client.create_entity(ngsi_entity)
-                
-                count += 1
-                logger.info(f"Created air quality observation for {sensor.name}")
-                
-        except Exception as e:
-            logger.error(f"Failed to sync air quality for {sensor.name}: {e}")
+            # Create NGSI-LD entity
+            ngsi_entities.append(create_air_quality_observed_entity(
+                observation_id=obs_id,
+                latitude=observation.latitude,
+                longitude=observation.longitude,
+                aqi=observation.aqi,
+                pm25=observation.pm25,
+                pm10=observation.pm10,
+                no2=observation.no2,
+                o3=observation.o3,
+                co=observation.co,
+                so2=observation.so2,
+                date_observed=observation.observed_at
+            ))
+    
+    # Sync to Orion-LD in a handful of batch requests, sent concurrently
+    if ngsi_entities:
+        result = run_async(lambda orion: orion.batch_upsert(ngsi_entities))
+        for error in result['errors']:
+            logger.error(f"Failed to sync {error.get('entityId')} to Orion-LD: {error.get('error')}")
     
-    logger.info(f"Air quality sync completed: {count} observations created")
-    return count
+    summary = summarize(report)
+    summary['sent'] = writer.sent
+    logger.info(
+        f"Air quality sync completed: {summary['sent']} observations written, "
+        f"{summary['failed']} failed, wall time {summary['wall_time']}s, "
+        f"p50 {summary['latency_p50']}s, max {summary['latency_max']}s"
+    )
+    return summary
 
 
 @shared_task
@@ -134,10 +157,8 @@ def sync_single_location_weather(lat: float, lon: float, location_name: str = ""
             obs_id = f"weather-manual-{uuid.uuid4().hex[:8]}"
             weather_data['location_name'] = location_name or weather_data.get('location_name', '')
             
-            observation = WeatherObservation.objects.create(
-                observation_id=obs_id,
-                **weather_data
-            )
+            with ObservationWriter(WeatherObservation) as writer:
+                observation = writer.add(observation_id=obs_id, **weather_data)
             
             logger.info(f"Created weather observation for {location_name}")
             return observation.id
@@ -161,10 +182,8 @@ def sync_single_location_air_quality(lat: float, lon: float, location_name: str
             obs_id = f"airquality-manual-{uuid.uuid4().hex[:8]}"
             aq_data['location_name'] = location_name or aq_data.get('location_name', '')
             
-            observation = AirQualityObservation.objects.create(
-                observation_id=obs_id,
-                **aq_data
-            )
+            with ObservationWriter(AirQualityObservation) as writer:
+                observation = writer.add(observation_id=obs_id, **aq_data)
             
             logger.info(f"Created air quality observation for {location_name}")
             return observation.id
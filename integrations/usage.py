@@ -0,0 +1,200 @@
+"""
+Usage accounting and quota enforcement for external API keys
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import List, Optional, Tuple
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from core.periodic import FlushTimer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (bucket name, capacity, refill tokens per second)
+BucketLimit = Tuple[str, float, float]
+
+# Takes one token from every bucket in KEYS, or from none of them.
+# ARGV[1] = now; ARGV[2i], ARGV[2i+1] = capacity, refill rate of KEYS[i]
+TAKE_TOKEN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    levels[i] = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if levels[i] < 1 then
+        allowed = 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', levels[i] - allowed, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return allowed
+"""
+
+
+class UsageTracker:
+    """
+    Count API key usage in memory and write it in bulk.
+    
+    Counts are flushed every ``flush_interval`` seconds by a background
+    timer (see core.periodic), and when the process exits, as
+    ``usage_count = F('usage_count') + n``, so concurrent workers never
+    overwrite each other's counts. ``last_used`` is set to the flush
+    time.
+    """
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._counts = defaultdict(int)     # (model, pk) -> count
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.timer = FlushTimer(self.flush, flush_interval, 'api-usage')
+    
+    def record(self, model: type, pk: int, count: int = 1):
+        self.timer.ensure_started()
+        with self._lock:
+            self._counts[(model, pk)] += count
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        
+        if due:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Write pending counts; returns the number of keys updated"""
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(int)
+            self._last_flush = time.monotonic()
+        
+        if not counts:
+            return 0
+        
+        # One UPDATE per (model, count) instead of one per key
+        groups = defaultdict(list)
+        for (model, pk), count in counts.items():
+            groups[(model, count)].append(pk)
+        
+        now = timezone.now()
+        for (model, count), pks in groups.items():
+            try:
+                model.objects.filter(pk__in=pks).update(
+                    usage_count=F('usage_count') + count,
+                    last_used=now
+                )
+            except Exception as e:
+                logger.error(f"Failed to flush usage for {len(pks)} {model.__name__} rows: {e}")
+        
+        return len(counts)
+
+
+class TokenBuckets:
+    """
+    Token buckets shared through Redis (API_USAGE_REDIS_URL), so every web
+    and Celery process draws from the same quota. Falls back to per-process
+    buckets while Redis is unreachable.
+    """
+    
+    RETRY_REDIS_AFTER = 60
+    
+    def __init__(self, redis_url: Optional[str]):
+        self.redis_url = redis_url
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+        self._local = {}    # name -> (tokens, updated)
+        self._lock = threading.Lock()
+    
+    def take(self, limits: List[BucketLimit]) -> bool:
+        """Take one token from every bucket, or none if any bucket is empty"""
+        if not limits:
+            return True
+        
+        script = self._get_script()
+        if script is not None:
+            try:
+                args = [time.time()]
+                for _, capacity, rate in limits:
+                    args.extend([capacity, rate])
+                return bool(script(keys=[name for name, _, _ in limits], args=args))
+            except Exception as e:
+                logger.warning(f"Redis quota check failed, using local buckets: {e}")
+                self._redis_down_until = time.monotonic() + self.RETRY_REDIS_AFTER
+        
+        return self._take_local(limits)
+    
+    def _get_script(self):
+        if not self.redis_url or time.monotonic() < self._redis_down_until:
+            return None
+        
+        if self._script is None:
+            import redis
+            self._redis = redis.Redis.from_url(
+                self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+            self._script = self._redis.register_script(TAKE_TOKEN_SCRIPT)
+        return self._script
+    
+    def _take_local(self, limits: List[BucketLimit]) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            levels = []
+            for name, capacity, rate in limits:
+                tokens, updated = self._local.get(name, (capacity, now))
+                levels.append(min(capacity, tokens + (now - updated) * rate))
+            
+            allowed = all(level >= 1 for level in levels)
+            for (name, _, _), level in zip(limits, levels):
+                self._local[name] = (level - 1 if allowed else level, now)
+            return allowed
+
+
+def quota_limits(provider_slug: str, resolved) -> List[BucketLimit]:
+    """Per-minute and per-day buckets for the key a request will use"""
+    owner = f"{resolved.model.__name__}:{resolved.pk}" if resolved.model else "env"
+    prefix = f"api-quota:{provider_slug}:{owner}"
+    limits = []
+    if resolved.rate_limit_per_minute:
+        limits.append((f"{prefix}:minute", resolved.rate_limit_per_minute,
+                       resolved.rate_limit_per_minute / 60.0))
+    if resolved.rate_limit_per_day:
+        limits.append((f"{prefix}:day", resolved.rate_limit_per_day,
+                       resolved.rate_limit_per_day / 86400.0))
+    return limits
+
+
+def acquire_quota(provider_slug: str, user=None, api_key: Optional[str] = None) -> bool:
+    """
+    Take one request from the provider quota and count it against the key.
+    
+    Call before each outgoing provider request; False means the
+    ``rate_limit_per_minute`` or ``rate_limit_per_day`` of the provider
+    (ExternalAPIProvider) is used up and the request should be skipped.
+    ``api_key`` is the key the client will send; usage is only recorded
+    when it is the resolved database key.
+    """
+    from .models import resolve_api_key
+    
+    resolved = resolve_api_key(provider_slug, user)
+    if not quota.take(quota_limits(provider_slug, resolved)):
+        logger.warning(f"{provider_slug} quota exhausted, skipping request")
+        return False
+    
+    if resolved.model is not None and (api_key is None or api_key == resolved.key):
+        usage_tracker.record(resolved.model, resolved.pk)
+    return True
+
+
+usage_tracker = UsageTracker(
+    flush_interval=getattr(settings, 'API_USAGE_FLUSH_INTERVAL', 30),
+)
+quota = TokenBuckets(getattr(settings, 'API_USAGE_REDIS_URL', None))
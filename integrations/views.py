@@ -4,7 +4,9 @@ from rest_framework import status
 from django.utils import timezone
 from .openweather import OpenWeatherMapClient
 from .openaq import OpenAQClient, calculate_aqi_from_pm25
+from observations.current_state import latest_state
 from observations.models import WeatherObservation, AirQualityObservation
+from observations.writers import ObservationWriter
 from entities.models import WeatherStation, AirQualitySensor
 import logging
 
@@ -30,10 +32,8 @@ class WeatherSyncView(APIView):
                 # Save to database
                 obs_id = f"weather-sync-{int(timezone.now().timestamp())}"
                 
-                observation = WeatherObservation.objects.create(
-                    observation_id=obs_id,
-                    **weather_data
-                )
+                with ObservationWriter(WeatherObservation) as writer:
+                    writer.add(observation_id=obs_id, **weather_data)
                 
                 logger.info(f"Created weather observation: {obs_id}")
                 
@@ -48,7 +48,7 @@ class WeatherSyncView(APIView):
                     'status': 'error',
                     'message': 'No weather data found'
                 }, status=status.HTTP_404_NOT_FOUND)
-                
+        
         except Exception as e:
             logger.error(f"Failed to sync weather: {e}")
             return Response({
@@ -109,10 +109,8 @@ class AirQualitySyncView(APIView):
                 # Remove non-model fields
                 save_data = {k: v for k, v in aq_data.items() if k not in ['dominant_pollutant']}
                 
-                observation = AirQualityObservation.objects.create(
-                    observation_id=obs_id,
-                    **save_data
-                )
+                with ObservationWriter(AirQualityObservation) as writer:
+                    writer.add(observation_id=obs_id, **save_data)
                 
                 logger.info(f"Created air quality observation from {source_used}: {obs_id}")
                 
@@ -389,7 +387,7 @@ class UserAPIKeyViewSet(viewsets.ModelViewSet):
                     'message': 'API key may be invalid',
                     'response_code': response.status_code
                 }, status=status.HTTP_400_BAD_REQUEST)
-                
+        
         except Exception as e:
             return Response({
                 'status': 'error',
@@ -416,17 +414,18 @@ class LatestWeatherView(APIView):
     def get(self, request):
         """Return latest weather data"""
         try:
-            latest = WeatherObservation.objects.order_by('-observed_at').first()
-            if latest:
+            state = latest_state('weather')
+            if state:
+                latest = state.snapshot
                 return Response({
-                    'temperature': latest.temperature,
-                    'humidity': latest.humidity,
-                    'pressure': latest.pressure,
-                    'wind_speed': latest.wind_speed,
-                    'wind_direction': latest.wind_direction,
-                    'description': latest.weather_description,
-                    'observed_at': latest.observed_at,
-                    'location': latest.location_name,
+                    'temperature': latest.get('temperature'),
+                    'humidity': latest.get('humidity'),
+                    'pressure': latest.get('pressure'),
+                    'wind_speed': latest.get('wind_speed'),
+                    'wind_direction': latest.get('wind_direction'),
+                    'description': latest.get('weather_description'),
+                    'observed_at': latest.get('observed_at'),
+                    'location': latest.get('location_name'),
                 })
             return Response(None)
         except Exception as e:
@@ -440,19 +439,20 @@ class LatestAirQualityView(APIView):
     def get(self, request):
         """Return latest air quality data"""
         try:
-            latest = AirQualityObservation.objects.order_by('-observed_at').first()
-            if latest:
+            state = latest_state('air_quality')
+            if state:
+                latest = state.snapshot
                 return Response({
-                    'aqi': latest.aqi,
-                    'pm25': latest.pm25,
-                    'pm10': latest.pm10,
-                    'o3': latest.o3,
-                    'no2': latest.no2,
-                    'so2': latest.so2,
-                    'co': latest.co,
-                    'observed_at': latest.observed_at,
-                    'station': latest.location_name if hasattr(latest, 'location_name') else None,
-                    'dominant_pollutant': 'pm25' if latest.pm25 else None,
+                    'aqi': latest.get('aqi'),
+                    'pm25': latest.get('pm25'),
+                    'pm10': latest.get('pm10'),
+                    'o3': latest.get('o3'),
+                    'no2': latest.get('no2'),
+                    'so2': latest.get('so2'),
+                    'co': latest.get('co'),
+                    'observed_at': latest.get('observed_at'),
+                    'station': latest.get('location_name'),
+                    'dominant_pollutant': 'pm25' if latest.get('pm25') else None,
                 })
             return Response(None)
         except Exception as e:
@@ -7,6 +7,7 @@ from datetime import datetime
 import logging
 from django.conf import settings
 from .models import get_api_key_for_provider
+from .usage import acquire_quota
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +22,7 @@ class WAQIClient:
         if not api_key:
             api_key = get_api_key_for_provider('waqi', user)
         self.api_key = api_key
+        self.user = user
     
     def get_by_city(self, city: str):
         """Get air quality data by city name"""
@@ -34,6 +36,9 @@ class WAQIClient:
             "token": self.api_key
         }
         
+        if not acquire_quota('waqi', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
@@ -60,6 +65,9 @@ class WAQIClient:
             "token": self.api_key
         }
         
+        if not acquire_quota('waqi', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
@@ -86,6 +94,9 @@ class WAQIClient:
             "token": self.api_key
         }
         
+        if not acquire_quota('waqi', self.user, self.api_key):
+            return None
+        
         try:
             response = requests.get(url, params=params, timeout=10)
             response.raise_for_status()
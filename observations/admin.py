@@ -3,7 +3,9 @@ from .models import (
     Observation,
     WeatherObservation,
     AirQualityObservation,
-    TrafficObservation
+    TrafficObservation,
+    HourlyObservationRollup,
+    DailyObservationRollup,
 )
 
 
@@ -33,3 +35,10 @@ class TrafficObservationAdmin(admin.ModelAdmin):
     list_display = ['location_name', 'intensity', 'average_speed', 'congestion_level', 'observed_at']
     list_filter = ['congestion_level', 'observed_at', 'source']
     search_fields = ['location_name', 'observation_id']
+
+
+@admin.register(HourlyObservationRollup, DailyObservationRollup)
+class ObservationRollupAdmin(admin.ModelAdmin):
+    list_display = ['source', 'station', 'observed_property', 'bucket', 'count', 'min_value', 'max_value', 'avg_value']
+    list_filter = ['source', 'observed_property']
+    search_fields = ['station']
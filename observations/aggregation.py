@@ -0,0 +1,292 @@
+"""
+Time-bucketed aggregation over observations
+
+A request is answered from the coarsest data that covers it: daily
+rollups, then hourly rollups, then raw rows for whatever the rollups do not
+cover yet (the current hour, or data older than the first rollup). Each
+tier is grouped in SQL by station and base unit (minute/hour/day) into
+partial count/min/max/sum aggregates, which are then folded into the
+requested bucket size, so a bucket may combine rollup and raw data.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from .models import Observation, HourlyObservationRollup, DailyObservationRollup
+from .rollups import WIDE_SOURCES, station_key
+
+AGGREGATES = ('avg', 'min', 'max', 'sum', 'count')
+UNITS = {'m': ('minute', 60), 'h': ('hour', 3600), 'd': ('day', 86400)}
+BUCKET_PATTERN = re.compile(r'^(\d+)([mhd])$')
+MAX_BUCKETS = 5000
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+Range = Tuple[datetime, datetime]
+# (station, base bucket, count, min, max, sum, latitude, longitude)
+PartialRow = Tuple[str, datetime, int, float, float, float, Optional[float], Optional[float]]
+
+
+def parse_bucket(value: str) -> Tuple[str, int]:
+    """'15m' -> ('minute', 900): base unit and bucket size in seconds"""
+    match = BUCKET_PATTERN.match(value or '')
+    if not match or int(match.group(1)) <= 0:
+        raise ValidationError({"error": "bucket must look like 5m, 1h or 1d"})
+    kind, unit_seconds = UNITS[match.group(2)]
+    return kind, int(match.group(1)) * unit_seconds
+
+
+def floor_time(value: datetime, seconds: int) -> datetime:
+    """Start of the epoch-aligned (UTC) bucket of ``seconds`` containing ``value``"""
+    offset = int((value - EPOCH).total_seconds()) // seconds * seconds
+    return EPOCH + timedelta(seconds=offset)
+
+
+def ceil_time(value: datetime, seconds: int) -> datetime:
+    floored = floor_time(value, seconds)
+    return floored if floored == value else floored + timedelta(seconds=seconds)
+
+
+def _subtract(ranges: List[Range], covered: Range) -> Tuple[List[Range], List[Range]]:
+    """Split ``ranges`` into the parts inside and outside ``covered``"""
+    inside, outside = [], []
+    low, high = covered
+    for start, end in ranges:
+        if low < high and start < high and low < end:
+            inside.append((max(start, low), min(end, high)))
+            if start < low:
+                outside.append((start, low))
+            if high < end:
+                outside.append((high, end))
+        else:
+            outside.append((start, end))
+    return inside, outside
+
+
+def _rollup_coverage(model, source: str, prop: str, unit_seconds: int) -> Optional[Range]:
+    """
+    Range fully covered by a rollup table: from its first bucket up to (not
+    including) its latest bucket, which may still be partial.
+    """
+    buckets = model.objects.filter(source=source, observed_property=prop)
+    first = buckets.order_by('bucket').values_list('bucket', flat=True).first()
+    last = buckets.order_by('-bucket').values_list('bucket', flat=True).first()
+    if first is None:
+        return None
+    return ceil_time(first, unit_seconds), floor_time(last, unit_seconds)
+
+
+def _rollup_rows(model, source: str, prop: str, span: Range, station: Optional[str]) -> List[PartialRow]:
+    rows = model.objects.filter(
+        source=source, observed_property=prop, bucket__gte=span[0], bucket__lt=span[1]
+    )
+    if station:
+        rows = rows.filter(station=station)
+    return list(rows.values_list(
+        'station', 'bucket', 'count', 'min_value', 'max_value', 'sum_value', 'latitude', 'longitude'
+    ))
+
+
+def _raw_rows(source: str, prop: str, kind: str, span: Range, station: Optional[str]) -> List[PartialRow]:
+    if source == 'sensor':
+        rows = Observation.objects.filter(
+            observed_property=prop, result_time__gte=span[0], result_time__lt=span[1]
+        )
+        if station:
+            rows = rows.filter(sensor__sensor_id=station)
+        groups = rows.annotate(
+            base=Trunc('result_time', kind, tzinfo=dt_timezone.utc)
+        ).values('sensor__sensor_id', 'base').annotate(
+            n=Count('result_value'),
+            low=Min('result_value'),
+            high=Max('result_value'),
+            total=Sum('result_value'),
+            lat=Max('latitude'),
+            lon=Max('longitude'),
+        ).order_by()
+        return [
+            (g['sensor__sensor_id'], g['base'], g['n'], g['low'], g['high'], g['total'], g['lat'], g['lon'])
+            for g in groups
+        ]
+    
+    model, _ = WIDE_SOURCES[source]
+    rows = model.objects.filter(
+        observed_at__gte=span[0], observed_at__lt=span[1], **{f'{prop}__isnull': False}
+    )
+    if station:
+        latitude, longitude = _parse_station(station)
+        rows = rows.filter(
+            latitude__range=(latitude - 0.00005, latitude + 0.00005),
+            longitude__range=(longitude - 0.00005, longitude + 0.00005),
+        )
+    groups = rows.annotate(
+        base=Trunc('observed_at', kind, tzinfo=dt_timezone.utc)
+    ).values('latitude', 'longitude', 'base').annotate(
+        n=Count(prop), low=Min(prop), high=Max(prop), total=Sum(prop)
+    ).order_by()
+    return [
+        (station_key(g['latitude'], g['longitude']), g['base'], g['n'], g['low'], g['high'], g['total'],
+         g['latitude'], g['longitude'])
+        for g in groups
+    ]
+
+
+def _parse_station(station: str) -> Tuple[float, float]:
+    try:
+        latitude, longitude = (float(part) for part in station.split(','))
+    except ValueError:
+        raise ValidationError({"error": "station must be 'lat,lon' for this source"})
+    return latitude, longitude
+
+
+def aggregate(
+    source: str,
+    prop: str,
+    bucket: str,
+    aggregates: List[str],
+    start: datetime,
+    end: datetime,
+    station: Optional[str] = None
+) -> Dict:
+    """
+    Aggregate ``prop`` of ``source`` into ``bucket``-sized buckets between
+    ``start`` and ``end``, one series of column arrays per station.
+    """
+    kind, bucket_seconds = parse_bucket(bucket)
+    start = floor_time(start, bucket_seconds)
+    if (end - start).total_seconds() / bucket_seconds > MAX_BUCKETS:
+        raise ValidationError({"error": f"Too many buckets (max {MAX_BUCKETS}); use a larger bucket or shorter range"})
+    
+    rows: List[PartialRow] = []
+    remaining = [(start, end)]
+    tiers = []
+    if kind == 'day':
+        tiers.append((DailyObservationRollup, 86400))
+    if kind in ('day', 'hour'):
+        tiers.append((HourlyObservationRollup, 3600))
+    for model, tier_seconds in tiers:
+        coverage = _rollup_coverage(model, source, prop, tier_seconds)
+        if coverage is None:
+            continue
+        coverage = (coverage[0], min(coverage[1], floor_time(end, tier_seconds)))
+        covered, remaining = _subtract(remaining, coverage)
+        for span in covered:
+            rows.extend(_rollup_rows(model, source, prop, span, station))
+    for span in remaining:
+        rows.extend(_raw_rows(source, prop, kind, span, station))
+    
+    # Fold partial aggregates into the requested buckets
+    folded: Dict[str, Dict[datetime, list]] = {}
+    locations = {}
+    for name, base, count, low, high, total, latitude, longitude in rows:
+        if not count:
+            continue
+        if latitude is not None:
+            locations[name] = (latitude, longitude)
+        key = floor_time(base, bucket_seconds)
+        entry = folded.setdefault(name, {}).get(key)
+        if entry is None:
+            folded[name][key] = [count, low, high, total]
+        else:
+            entry[0] += count
+            entry[1] = min(entry[1], low)
+            entry[2] = max(entry[2], high)
+            entry[3] += total
+    
+    series = []
+    for name in sorted(folded):
+        buckets = sorted(folded[name].items())
+        latitude, longitude = locations.get(name, (None, None))
+        item = {
+            'station': name,
+            'latitude': latitude,
+            'longitude': longitude,
+            'time': [key.isoformat() for key, _ in buckets],
+        }
+        for agg in aggregates:
+            item[agg] = [_value(agg, entry) for _, entry in buckets]
+        series.append(item)
+    
+    return {
+        'source': source,
+        'property': prop,
+        'bucket': bucket,
+        'agg': aggregates,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': series,
+    }
+
+
+def _value(agg: str, entry: list):
+    count, low, high, total = entry
+    if agg == 'count':
+        return count
+    if agg == 'min':
+        return low
+    if agg == 'max':
+        return high
+    if agg == 'sum':
+        return total
+    return round(total / count, 4)
+
+
+def _parse_time(value: str, name: str) -> datetime:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({"error": f"{name} must be an ISO 8601 datetime"})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class AggregateMixin:
+    """
+    Adds ``GET .../aggregate/?property=&bucket=1h&agg=avg,max&start=&end=&station=``
+    to an observation viewset: values of ``property`` aggregated into
+    UTC-aligned buckets per station, returned as column arrays.
+    ``start`` defaults to 24 hours before ``end`` (default now).
+    """
+    aggregate_source = None
+    
+    def get_aggregate_properties(self) -> Optional[List[str]]:
+        """Allowed properties (None = any, e.g. free-form sensor properties)"""
+        if self.aggregate_source in WIDE_SOURCES:
+            return WIDE_SOURCES[self.aggregate_source][1]
+        return None
+    
+    @action(detail=False, methods=['get'])
+    def aggregate(self, request):
+        """Time-bucketed min/max/avg/sum/count of one property per station"""
+        params = request.query_params
+        prop = params.get('property')
+        allowed = self.get_aggregate_properties()
+        if not prop:
+            raise ValidationError({"error": "property parameter is required"})
+        if allowed is not None and prop not in allowed:
+            raise ValidationError({"error": f"property must be one of: {', '.join(allowed)}"})
+        
+        aggregates = [name.strip() for name in params.get('agg', 'avg').split(',') if name.strip()]
+        invalid = [name for name in aggregates if name not in AGGREGATES]
+        if invalid or not aggregates:
+            raise ValidationError({"error": f"agg must be a comma-separated subset of: {', '.join(AGGREGATES)}"})
+        
+        end = _parse_time(params['end'], 'end') if params.get('end') else timezone.now()
+        start = _parse_time(params['start'], 'start') if params.get('start') else end - timedelta(hours=24)
+        if start >= end:
+            raise ValidationError({"error": "start must be before end"})
+        
+        return Response(aggregate(
+            self.aggregate_source,
+            prop,
+            params.get('bucket', '1h'),
+            aggregates,
+            start,
+            end,
+            station=params.get('station') or None,
+        ))
@@ -0,0 +1,216 @@
+"""
+Current-state store: the latest value of every station/device/property
+
+Every ingest path (ObservationWriter, single saves via signals, batch
+device uploads) calls ``update_current_state`` with the rows it wrote.
+Rows are merged per station in memory, then with the stored rows (locked
+for the merge) and upserted, keeping the newest value of each property. Latest
+endpoints then read a single CurrentState row instead of sorting history.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+from django.db import transaction
+from django.db.models import JSONField, OuterRef, Subquery
+from django.utils.dateparse import parse_datetime
+from rest_framework.utils.encoders import JSONEncoder
+from accounts.models import DeviceData, UserDevice
+from core.geo import compute_geohash, nearby
+from sensors.models import Sensor
+from .models import (
+    Observation,
+    WeatherObservation,
+    AirQualityObservation,
+    TrafficObservation,
+    CurrentState,
+)
+from .rollups import WIDE_SOURCES, station_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+# model -> (source, time field)
+SOURCES = {
+    Observation: ('sensor', 'result_time'),
+    WeatherObservation: ('weather', 'observed_at'),
+    AirQualityObservation: ('air_quality', 'observed_at'),
+    TrafficObservation: ('traffic', 'observed_at'),
+    DeviceData: ('device', 'timestamp'),
+}
+
+# Sources whose station id lives on a related row (field name == source)
+RELATED = {'sensor': Sensor, 'device': UserDevice}
+
+UPDATE_FIELDS = ['latitude', 'longitude', 'geohash', 'observed_at', 'values', 'snapshot', 'updated_at']
+
+_encoder = JSONEncoder()
+
+
+def _iso(value: datetime) -> str:
+    return _encoder.default(value)
+
+
+def _station(source: str, row):
+    """(station id, latitude, longitude) of a row"""
+    if source == 'sensor':
+        return row.sensor.sensor_id, row.latitude, row.longitude
+    if source == 'device':
+        return row.device.device_id, row.device.latitude, row.device.longitude
+    return station_key(row.latitude, row.longitude), row.latitude, row.longitude
+
+
+def _values(source: str, row, observed_at: str) -> Dict[str, dict]:
+    if source == 'sensor':
+        items = {row.observed_property: row.result_value}
+    elif source == 'device':
+        items = row.data if isinstance(row.data, dict) else {}
+    else:
+        items = {name: getattr(row, name) for name in WIDE_SOURCES[source][1]}
+    return {
+        name: {'value': value, 'observed_at': observed_at}
+        for name, value in items.items() if value is not None
+    }
+
+
+def _snapshot(source: str, row) -> dict:
+    """The latest row as the latest endpoints return it"""
+    if source == 'device':
+        return {'data': row.data, 'timestamp': _iso(row.timestamp)}
+    
+    from .serializers import (
+        ObservationSerializer,
+        WeatherObservationSerializer,
+        AirQualityObservationSerializer,
+        TrafficObservationSerializer,
+    )
+    serializer_class = {
+        'sensor': ObservationSerializer,
+        'weather': WeatherObservationSerializer,
+        'air_quality': AirQualityObservationSerializer,
+        'traffic': TrafficObservationSerializer,
+    }[source]
+    return dict(serializer_class(row).data)
+
+
+def _load_related(source: str, rows: Sequence):
+    """Attach sensors/devices to rows that do not have them cached (one query)"""
+    model = RELATED.get(source)
+    if model is None:
+        return
+    field = type(rows[0])._meta.get_field(source)
+    missing = {getattr(row, field.attname) for row in rows if not field.is_cached(row)}
+    if missing:
+        related = model.objects.in_bulk(missing)
+        for row in rows:
+            if not field.is_cached(row):
+                setattr(row, source, related[getattr(row, field.attname)])
+
+
+def _newer(left: str, right: str) -> bool:
+    return parse_datetime(left) >= parse_datetime(right)
+
+
+def update_current_state(rows: Sequence) -> int:
+    """
+    Merge newly written rows of one model into the current state.
+    
+    Returns the number of stations updated. Older rows never overwrite a
+    newer state, so replays and out-of-order batches are safe.
+    """
+    if not rows:
+        return 0
+    source, time_field = SOURCES[type(rows[0])]
+    _load_related(source, rows)
+    
+    states: Dict[str, CurrentState] = {}
+    latest_rows = {}
+    for row in sorted(rows, key=lambda row: getattr(row, time_field)):
+        observed_at = getattr(row, time_field)
+        station, latitude, longitude = _station(source, row)
+        state = states.get(station)
+        if state is None:
+            state = states[station] = CurrentState(source=source, station=station, values={})
+        state.latitude, state.longitude, state.observed_at = latitude, longitude, observed_at
+        state.values.update(_values(source, row, _iso(observed_at)))
+        latest_rows[station] = row
+    
+    for station, state in states.items():
+        state.snapshot = _snapshot(source, latest_rows[station])
+    
+    for state in states.values():
+        state.geohash = compute_geohash(state.latitude, state.longitude)
+    ordered = [states[station] for station in sorted(states)]
+    
+    with transaction.atomic():
+        # Insert stations seen for the first time, then lock every row of the
+        # batch (in station order), so concurrent writers merge one after another
+        CurrentState.objects.bulk_create(ordered, ignore_conflicts=True)
+        stored = CurrentState.objects.select_for_update().filter(
+            source=source, station__in=list(states)
+        ).order_by('station')
+        
+        # Merge with what is stored: newest row wins, then newest value per property
+        for current in stored:
+            state = states[current.station]
+            if current.observed_at > state.observed_at:
+                state.latitude, state.longitude = current.latitude, current.longitude
+                state.observed_at, state.snapshot = current.observed_at, current.snapshot
+            for name, entry in current.values.items():
+                if name not in state.values or not _newer(state.values[name]['observed_at'], entry['observed_at']):
+                    state.values[name] = entry
+        
+        for state in ordered:
+            state.geohash = compute_geohash(state.latitude, state.longitude)
+        
+        CurrentState.objects.bulk_create(
+            ordered,
+            update_conflicts=True,
+            unique_fields=['source', 'station'],
+            update_fields=UPDATE_FIELDS,
+        )
+    return len(states)
+
+
+def latest_state(
+    source: str,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: float = 50
+) -> Optional[CurrentState]:
+    """Most recently updated station of a source, optionally within a radius (nearest first on ties)"""
+    queryset = CurrentState.objects.filter(source=source)
+    ordering = ['-observed_at']
+    if latitude is not None and longitude is not None:
+        queryset = nearby(queryset, latitude, longitude, radius_km)
+        ordering.append('distance')
+    return queryset.order_by(*ordering).first()
+
+
+def latest_snapshot(source: str, station_field: str) -> Subquery:
+    """Annotation: snapshot of the current state whose station is ``station_field`` of the outer row"""
+    return Subquery(
+        CurrentState.objects.filter(
+            source=source, station=OuterRef(station_field)
+        ).values('snapshot')[:1],
+        output_field=JSONField()
+    )
+
+
+def rebuild_current_state(batch_size: int = 2000) -> Dict[str, int]:
+    """Recompute the current state of every source from the history tables"""
+    result = {}
+    for model, (source, time_field) in SOURCES.items():
+        CurrentState.objects.filter(source=source).delete()
+        queryset = model.objects.order_by(time_field)
+        if source in RELATED:
+            queryset = queryset.select_related(source)
+        
+        batch = []
+        for row in queryset.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                update_current_state(batch)
+                batch = []
+        update_current_state(batch)
+        result[source] = CurrentState.objects.filter(source=source).count()
+        logger.info(f"Rebuilt current state of {result[source]} {source} stations")
+    return result
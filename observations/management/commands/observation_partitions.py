@@ -0,0 +1,96 @@
+"""
+Management command to manage monthly partitions of the observation tables
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from observations.partitions import (
+    PARTITIONED_MODELS,
+    convert_table,
+    ensure_partitions,
+    is_partitioned,
+    list_partitions,
+    partitioning_supported,
+    prune,
+    retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage monthly partitions of the observation tables: convert existing tables, '
+        'create upcoming partitions, drop partitions past retention, or show status'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['convert', 'create', 'drop', 'status'],
+            help='convert: partition existing tables (one-time, locks each table while copying); '
+                 'create: create upcoming partitions; drop: apply retention; status: list partitions'
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            choices=list(PARTITIONED_MODELS),
+            help='Limit to one model (repeatable); default is all partitioned models'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=getattr(settings, 'OBSERVATION_PARTITIONS_AHEAD', 3),
+            help='Future monthly partitions to keep created'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=getattr(settings, 'OBSERVATION_RETENTION_MONTHS', 0),
+            help='Months of raw data kept by "drop" (0 = keep everything)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what "drop" would remove without removing it'
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        labels = options['model'] or list(PARTITIONED_MODELS)
+
+        if action in ('convert', 'create') and not partitioning_supported():
+            raise CommandError('Table partitioning requires the PostgreSQL database backend')
+
+        if action == 'drop':
+            cutoff = retention_cutoff(options['retention_months'])
+            if cutoff is None:
+                raise CommandError('Retention is disabled; pass --retention-months or set OBSERVATION_RETENTION_MONTHS')
+            self.stdout.write(f'Removing raw rows older than {cutoff:%Y-%m-%d}')
+
+        for label in labels:
+            table = apps.get_model(label)._meta.db_table
+
+            if action == 'convert':
+                copied = convert_table(label, options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(f'{table}: partitioned ({copied} rows copied)'))
+            elif action == 'create':
+                if not is_partitioned(table):
+                    self.stdout.write(self.style.WARNING(f'{table}: not partitioned, run "convert" first'))
+                    continue
+                created = ensure_partitions(label, options['months_ahead'])
+                self.stdout.write(f'{table}: {len(created)} partitions created')
+                for name in created:
+                    self.stdout.write(f'  {name}')
+            elif action == 'drop':
+                # Partition names, or a row count for unpartitioned tables
+                removed = prune(label, cutoff, dry_run=options['dry_run'])
+                prefix = 'would remove' if options['dry_run'] else 'removed'
+                self.stdout.write(f'{table}: {prefix} {", ".join(removed) or "nothing"}')
+            else:
+                if not is_partitioned(table):
+                    self.stdout.write(f'{table}: not partitioned')
+                    continue
+                partitions = list_partitions(table)
+                self.stdout.write(f'{table}: {len(partitions)} partitions')
+                for name, start, end in partitions:
+                    bounds = f'{start:%Y-%m-%d} .. {end:%Y-%m-%d}' if start else 'DEFAULT'
+                    self.stdout.write(f'  {name}  {bounds}')
@@ -0,0 +1,15 @@
+"""
+Management command to rebuild the latest-value (current state) table
+"""
+from django.core.management.base import BaseCommand
+from observations.current_state import rebuild_current_state
+
+
+class Command(BaseCommand):
+    help = 'Recompute the current state of every station and device from the history tables'
+
+    def handle(self, *args, **options):
+        result = rebuild_current_state()
+        for source, count in result.items():
+            self.stdout.write(f'  {source}: {count} stations')
+        self.stdout.write(self.style.SUCCESS('Current state rebuilt'))
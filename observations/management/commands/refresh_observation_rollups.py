@@ -0,0 +1,24 @@
+"""
+Management command to (re)build the hourly/daily observation rollups
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from observations.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Re-aggregate raw observations into the hourly and daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            default=getattr(settings, 'OBSERVATION_ROLLUP_LOOKBACK_HOURS', 3),
+            help='Hours of raw data to re-aggregate (use a large value to backfill)'
+        )
+
+    def handle(self, *args, **options):
+        result = refresh_rollups(options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {result['hourly']} hourly and {result['daily']} daily rollups"
+        ))
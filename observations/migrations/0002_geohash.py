@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:55
+
+import core.geo
+from django.db import migrations
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name in ('WeatherObservation', 'AirQualityObservation'):
+        core.geo.backfill_geohash(apps.get_model('observations', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airqualityobservation',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='weatherobservation',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observations', '0002_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyObservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('sensor', 'Sensor observation'), ('weather', 'Weather observation'), ('air_quality', 'Air quality observation'), ('traffic', 'Traffic observation'), ('device', 'User device reading')], max_length=20)),
+                ('station', models.CharField(max_length=100)),
+                ('observed_property', models.CharField(max_length=200)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day (UTC)')),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('count', models.IntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('avg_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['source', 'observed_property', 'bucket'], name='observation_source_69d035_idx')],
+                'unique_together': {('source', 'station', 'observed_property', 'bucket')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyObservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('sensor', 'Sensor observation'), ('weather', 'Weather observation'), ('air_quality', 'Air quality observation'), ('traffic', 'Traffic observation'), ('device', 'User device reading')], max_length=20)),
+                ('station', models.CharField(max_length=100)),
+                ('observed_property', models.CharField(max_length=200)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour/day (UTC)')),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('count', models.IntegerField()),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+                ('avg_value', models.FloatField()),
+                ('sum_value', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['source', 'observed_property', 'bucket'], name='observation_source_30d95f_idx')],
+                'unique_together': {('source', 'station', 'observed_property', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:40
+
+import core.geo
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observations', '0003_observation_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('sensor', 'Sensor observation'), ('weather', 'Weather observation'), ('air_quality', 'Air quality observation'), ('traffic', 'Traffic observation'), ('device', 'User device reading')], max_length=20)),
+                ('station', models.CharField(max_length=200)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('geohash', core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12)),
+                ('observed_at', models.DateTimeField()),
+                ('values', models.JSONField(default=dict)),
+                ('snapshot', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', '-observed_at'], name='observation_source_5201a6_idx')],
+                'unique_together': {('source', 'station')},
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:06
+
+from django.db import migrations, models
+
+
+class SkipPartitioned:
+    """
+    Leave tables converted by ``observation_partitions convert`` alone: they
+    already have this constraint, under the same name, and no unique on
+    observation_id alone.
+    """
+
+    def _partitioned(self, app_label, state):
+        from observations.partitions import is_partitioned
+        return is_partitioned(state.apps.get_model(app_label, self.model_name)._meta.db_table)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if not self._partitioned(app_label, from_state):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if not self._partitioned(app_label, from_state):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class AlterField(SkipPartitioned, migrations.AlterField):
+    pass
+
+
+class AddConstraint(SkipPartitioned, migrations.AddConstraint):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observations', '0004_current_state'),
+    ]
+
+    operations = [
+        AlterField(
+            model_name='airqualityobservation',
+            name='observation_id',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        AlterField(
+            model_name='observation',
+            name='observation_id',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        AlterField(
+            model_name='trafficobservation',
+            name='observation_id',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        AlterField(
+            model_name='weatherobservation',
+            name='observation_id',
+            field=models.CharField(db_index=True, max_length=200),
+        ),
+        AddConstraint(
+            model_name='airqualityobservation',
+            constraint=models.UniqueConstraint(fields=('observation_id', 'observed_at'), name='observations_airqualityobservation_observation_id_uniq'),
+        ),
+        AddConstraint(
+            model_name='observation',
+            constraint=models.UniqueConstraint(fields=('observation_id', 'result_time'), name='observations_observation_observation_id_uniq'),
+        ),
+        AddConstraint(
+            model_name='trafficobservation',
+            constraint=models.UniqueConstraint(fields=('observation_id', 'observed_at'), name='observations_trafficobservation_observation_id_uniq'),
+        ),
+        AddConstraint(
+            model_name='weatherobservation',
+            constraint=models.UniqueConstraint(fields=('observation_id', 'observed_at'), name='observations_weatherobservation_observation_id_uniq'),
+        ),
+    ]
@@ -3,6 +3,7 @@ Models for observations based on SOSA/SSN ontology
 """
 from django.db import models
 from sensors.models import Sensor
+from core.geo import GeohashField
 import uuid
 
 
@@ -10,7 +11,7 @@ class Observation(models.Model):
     """SOSA Observation model"""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    observation_id = models.CharField(max_length=200, unique=True, db_index=True)
+    observation_id = models.CharField(max_length=200, db_index=True)
     
     # SOSA properties
     sensor = models.ForeignKey(
@@ -42,6 +43,14 @@ class Observation(models.Model):
             models.Index(fields=['sensor', 'result_time']),
             models.Index(fields=['observed_property', 'result_time']),
         ]
+        # Partitioned tables can only enforce uniqueness together with the
+        # partition key, so observation_id is unique per result_time
+        constraints = [
+            models.UniqueConstraint(
+                fields=['observation_id', 'result_time'],
+                name='observations_observation_observation_id_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.observed_property}: {self.result_value} at {self.result_time}"
@@ -51,11 +60,12 @@ class WeatherObservation(models.Model):
     """Weather observation data"""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    observation_id = models.CharField(max_length=200, unique=True, db_index=True)
+    observation_id = models.CharField(max_length=200, db_index=True)
     
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     location_name = models.CharField(max_length=300, blank=True)
     
     # Weather data
@@ -79,6 +89,12 @@ class WeatherObservation(models.Model):
         indexes = [
             models.Index(fields=['latitude', 'longitude', 'observed_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['observation_id', 'observed_at'],
+                name='observations_weatherobservation_observation_id_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"Weather at {self.location_name or f'({self.latitude}, {self.longitude})'} - {self.observed_at}"
@@ -88,11 +104,12 @@ class AirQualityObservation(models.Model):
     """Air quality observation data"""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    observation_id = models.CharField(max_length=200, unique=True, db_index=True)
+    observation_id = models.CharField(max_length=200, db_index=True)
     
     # Location
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     location_name = models.CharField(max_length=300, blank=True)
     
     # Air quality data
@@ -116,6 +133,12 @@ class AirQualityObservation(models.Model):
         indexes = [
             models.Index(fields=['latitude', 'longitude', 'observed_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['observation_id', 'observed_at'],
+                name='observations_airqualityobservation_observation_id_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"AQI at {self.location_name or f'({self.latitude}, {self.longitude})'} - {self.observed_at}"
@@ -125,7 +148,7 @@ class TrafficObservation(models.Model):
     """Traffic flow observation data"""
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    observation_id = models.CharField(max_length=200, unique=True, db_index=True)
+    observation_id = models.CharField(max_length=200, db_index=True)
     
     # Location
     latitude = models.FloatField()
@@ -159,6 +182,100 @@ class TrafficObservation(models.Model):
         indexes = [
             models.Index(fields=['latitude', 'longitude', 'observed_at']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['observation_id', 'observed_at'],
+                name='observations_trafficobservation_observation_id_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"Traffic at {self.location_name or f'({self.latitude}, {self.longitude})'} - {self.observed_at}"
+
+
+class ObservationRollup(models.Model):
+    """Min/max/avg/count of one property at one station over a time bucket"""
+    
+    SOURCE_CHOICES = [
+        ('sensor', 'Sensor observation'),
+        ('weather', 'Weather observation'),
+        ('air_quality', 'Air quality observation'),
+        ('traffic', 'Traffic observation'),
+        ('device', 'User device reading'),
+    ]
+    
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    # Sensor / device id, or "lat,lon" (4 decimals) for location-keyed sources
+    station = models.CharField(max_length=100)
+    observed_property = models.CharField(max_length=200)
+    bucket = models.DateTimeField(help_text="Start of the hour/day (UTC)")
+    
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    
+    count = models.IntegerField()
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+    avg_value = models.FloatField()
+    sum_value = models.FloatField()
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+    
+    def __str__(self):
+        return f"{self.source} {self.station} {self.observed_property} @ {self.bucket}: avg {self.avg_value}"
+
+
+class HourlyObservationRollup(ObservationRollup):
+    """Hourly rollup of raw observations"""
+    
+    class Meta(ObservationRollup.Meta):
+        unique_together = ['source', 'station', 'observed_property', 'bucket']
+        indexes = [
+            models.Index(fields=['source', 'observed_property', 'bucket']),
+        ]
+
+
+class DailyObservationRollup(ObservationRollup):
+    """Daily rollup, derived from the hourly rollups"""
+    
+    class Meta(ObservationRollup.Meta):
+        unique_together = ['source', 'station', 'observed_property', 'bucket']
+        indexes = [
+            models.Index(fields=['source', 'observed_property', 'bucket']),
+        ]
+
+
+class CurrentState(models.Model):
+    """
+    Latest known state of a station or device, updated on every ingest so
+    "latest" reads never sort the history tables.
+    """
+    
+    source = models.CharField(max_length=20, choices=ObservationRollup.SOURCE_CHOICES)
+    # Same station ids as the rollups: sensor / device id, or "lat,lon"
+    station = models.CharField(max_length=200)
+    
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = GeohashField()
+    
+    observed_at = models.DateTimeField()
+    # {property: {"value": ..., "observed_at": ...}}, last value of each property
+    values = models.JSONField(default=dict)
+    # Serialized latest row, returned as-is by the latest endpoints
+    snapshot = models.JSONField(default=dict)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['source', 'station']
+        indexes = [
+            models.Index(fields=['source', '-observed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} {self.station} @ {self.observed_at}"
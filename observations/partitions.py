@@ -0,0 +1,283 @@
+"""
+Monthly range partitioning and retention for time-series tables
+
+``convert_table`` rebuilds an existing table as a PostgreSQL table
+partitioned by month on its time column (one-time; the table is locked
+while rows are copied). ``ensure_partitions`` creates upcoming months ahead
+of time and ``prune`` enforces retention by dropping whole months, or by
+batched DELETEs on tables that are not partitioned (e.g. SQLite).
+
+PostgreSQL requires unique constraints on a partitioned table to include
+the partition key, so after conversion the primary key is (id, time).
+``observation_id`` is unique per (observation_id, time) before and after
+conversion: the models declare the same constraint, under the same name.
+"""
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+from django.apps import apps
+from django.db import connection, transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+# model -> (time column, columns kept unique together with the time column)
+PARTITIONED_MODELS: Dict[str, Tuple[str, List[str]]] = {
+    'observations.Observation': ('result_time', ['observation_id']),
+    'observations.WeatherObservation': ('observed_at', ['observation_id']),
+    'observations.AirQualityObservation': ('observed_at', ['observation_id']),
+    'observations.TrafficObservation': ('observed_at', ['observation_id']),
+    'accounts.DeviceData': ('timestamp', []),
+}
+
+
+def month_start(value: datetime) -> datetime:
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    month = value.month - 1 + months
+    return datetime(value.year + month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m}"
+
+
+def partitioning_supported() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(table: str) -> bool:
+    if not partitioning_supported():
+        return False
+    
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relkind FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = %s AND n.nspname = current_schema()",
+            [table]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions(table: str) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """(name, start, end) of each partition; the default partition has no bounds"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s ORDER BY child.relname",
+            [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    
+    partitions = []
+    for name in names:
+        start = end = None
+        if name.startswith(f"{table}_p"):
+            start = datetime.strptime(name[-6:], '%Y%m').replace(tzinfo=dt_timezone.utc)
+            end = add_months(start, 1)
+        partitions.append((name, start, end))
+    return partitions
+
+
+def _create_months(cursor, table: str, start: datetime, end: datetime) -> List[str]:
+    """Create monthly partitions for [start, end) on a freshly created parent"""
+    qn = connection.ops.quote_name
+    created = []
+    month = start
+    while month < end:
+        name = partition_name(table, month)
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} PARTITION OF {qn(table)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)]
+        )
+        created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def convert_table(label: str, months_ahead: int = 3) -> int:
+    """
+    Rebuild a model's table as a monthly partitioned table and copy its rows.
+    
+    Returns the number of rows copied (0 if already partitioned).
+    """
+    model = apps.get_model(label)
+    table = model._meta.db_table
+    if is_partitioned(table):
+        return 0
+    
+    time_column, unique_columns = PARTITIONED_MODELS[label]
+    qn = connection.ops.quote_name
+    legacy = f"{table}_legacy"
+    
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE")
+        
+        # Secondary indexes and foreign keys are recreated on the new table
+        cursor.execute(
+            "SELECT pg_get_indexdef(x.indexrelid) FROM pg_index x "
+            "WHERE x.indrelid = %s::regclass AND NOT x.indisunique",
+            [table]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')",
+            [table]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f"SELECT min({qn(time_column)}) FROM {qn(table)}")
+        oldest = cursor.fetchone()[0]
+        
+        # Free the constraint, index and sequence names for the new table
+        cursor.execute(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+        for name, _, _ in constraints:
+            cursor.execute(f"ALTER TABLE {qn(legacy)} DROP CONSTRAINT {qn(name)}")
+        cursor.execute(
+            "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass",
+            [legacy]
+        )
+        for (index,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {index}")
+        if sequence:
+            cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {qn(f'{legacy}_id_seq')}")
+        
+        cursor.execute(
+            f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({qn(time_column)})"
+        )
+        cursor.execute(
+            f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f'{table}_pkey')} "
+            f"PRIMARY KEY (id, {qn(time_column)})"
+        )
+        for column in unique_columns:
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(f'{table}_{column}_uniq')} "
+                f"UNIQUE ({qn(column)}, {qn(time_column)})"
+            )
+        
+        # Integer ids: identity columns cannot be partitioned before
+        # PostgreSQL 17, so the new id uses a plain owned sequence
+        if sequence:
+            new_sequence = f"{table}_id_seq"
+            cursor.execute(f"CREATE SEQUENCE {qn(new_sequence)} OWNED BY {qn(table)}.id")
+            cursor.execute(
+                f"SELECT setval(%s, COALESCE((SELECT max(id) FROM {qn(legacy)}), 0) + 1, false)",
+                [new_sequence]
+            )
+            cursor.execute(
+                f"ALTER TABLE {qn(table)} ALTER COLUMN id SET DEFAULT nextval(%s::regclass)",
+                [new_sequence]
+            )
+        
+        now = datetime.now(dt_timezone.utc)
+        start = month_start(oldest) if oldest else month_start(now)
+        _create_months(cursor, table, start, add_months(month_start(now), months_ahead + 1))
+        cursor.execute(f"CREATE TABLE {qn(f'{table}_default')} PARTITION OF {qn(table)} DEFAULT")
+        
+        cursor.execute(f"INSERT INTO {qn(table)} SELECT * FROM {qn(legacy)}")
+        copied = cursor.rowcount
+        cursor.execute(f"DROP TABLE {qn(legacy)}")
+        
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, kind, definition in constraints:
+            if kind == 'f':
+                cursor.execute(f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}")
+    
+    logger.info(f"Converted {table} to monthly partitions ({copied} rows)")
+    return copied
+
+
+def ensure_partitions(label: str, months_ahead: int = 3) -> List[str]:
+    """
+    Create missing partitions from the current month to ``months_ahead``.
+    
+    Rows that already landed in the default partition for a new month are
+    moved into it first, so attaching never fails on the default partition.
+    """
+    table = apps.get_model(label)._meta.db_table
+    time_column, _ = PARTITIONED_MODELS[label]
+    qn = connection.ops.quote_name
+    existing = {name for name, _, _ in list_partitions(table)}
+    created = []
+    
+    month = month_start(datetime.now(dt_timezone.utc))
+    for _ in range(months_ahead + 1):
+        name = partition_name(table, month)
+        end = add_months(month, 1)
+        if name not in existing:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS)")
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {qn(f'{table}_default')} "
+                    f"WHERE {qn(time_column)} >= %s AND {qn(time_column)} < %s RETURNING *) "
+                    f"INSERT INTO {qn(name)} SELECT * FROM moved",
+                    [month, end]
+                )
+                cursor.execute(
+                    f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    [month, end]
+                )
+            created.append(name)
+        month = end
+    
+    return created
+
+
+def prune(label: str, before: datetime, dry_run: bool = False, batch_size: int = 10000) -> List[str]:
+    """
+    Remove rows older than ``before``.
+    
+    Partitioned tables drop every monthly partition that ends on or before
+    ``before`` (rows in a partition straddling the cutoff are kept until
+    the whole month expires). Other tables are pruned with batched DELETEs.
+    Returns the dropped partitions, or a one-line summary of deleted rows.
+    """
+    model = apps.get_model(label)
+    table = model._meta.db_table
+    time_column, _ = PARTITIONED_MODELS[label]
+    
+    if not is_partitioned(table):
+        old = model.objects.filter(**{f'{time_column}__lt': before})
+        if dry_run:
+            return [f"{old.count()} rows"]
+        deleted = 0
+        while True:
+            pks = list(old.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            deleted += model.objects.filter(pk__in=pks).delete()[0]
+        return [f"{deleted} rows"]
+    
+    qn = connection.ops.quote_name
+    dropped = []
+    for name, _, end in list_partitions(table):
+        if end is None or end > before:
+            continue
+        if not dry_run:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(name)}")
+                cursor.execute(f"DROP TABLE {qn(name)}")
+        dropped.append(name)
+    
+    if dropped and not dry_run:
+        logger.info(f"Dropped {len(dropped)} partitions of {table}")
+    return dropped
+
+
+def retention_cutoff(retention_months: int, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Start of the oldest month kept, or None when retention is disabled"""
+    if not retention_months:
+        return None
+    return add_months(month_start(now or datetime.now(dt_timezone.utc)), -retention_months)
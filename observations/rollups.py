@@ -0,0 +1,232 @@
+"""
+Continuous hourly/daily rollups of raw observations
+
+``refresh_rollups`` recomputes every hourly bucket touched in the last
+``lookback_hours`` from the raw tables (one grouped query per source) and
+upserts them, then re-derives the affected days from the hourly rows.
+Re-running is idempotent, so late rows are picked up by the next run.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from accounts.models import DeviceData
+from .models import (
+    Observation,
+    WeatherObservation,
+    AirQualityObservation,
+    TrafficObservation,
+    HourlyObservationRollup,
+    DailyObservationRollup,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Numeric properties rolled up for the location-keyed observation tables
+WIDE_SOURCES = {
+    'weather': (WeatherObservation, ['temperature', 'humidity', 'pressure', 'wind_speed', 'wind_direction', 'precipitation']),
+    'air_quality': (AirQualityObservation, ['aqi', 'pm25', 'pm10', 'no2', 'o3', 'co', 'so2']),
+    'traffic': (TrafficObservation, ['intensity', 'occupancy', 'average_speed']),
+}
+
+UNIQUE_FIELDS = ['source', 'station', 'observed_property', 'bucket']
+UPDATE_FIELDS = [
+    'latitude', 'longitude', 'count', 'min_value', 'max_value', 'avg_value', 'sum_value', 'updated_at'
+]
+
+RollupKey = Tuple[str, str, str, datetime]
+
+
+def station_key(latitude: float, longitude: float) -> str:
+    """Station id of location-keyed observations"""
+    return f"{latitude:.4f},{longitude:.4f}"
+
+
+def _hour(value: datetime) -> datetime:
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _wide_rows(source: str, model, properties: List[str], start: datetime) -> Iterable[HourlyObservationRollup]:
+    aggregates = {}
+    for name in properties:
+        aggregates.update({
+            f'count_{name}': Count(name),
+            f'min_{name}': Min(name),
+            f'max_{name}': Max(name),
+            f'avg_{name}': Avg(name),
+            f'sum_{name}': Sum(name),
+        })
+    
+    groups = model.objects.filter(observed_at__gte=start).annotate(
+        hour=TruncHour('observed_at', tzinfo=dt_timezone.utc)
+    ).values('latitude', 'longitude', 'hour').annotate(**aggregates).order_by()
+    
+    # Nearby coordinates round to the same station: merge their partials so
+    # one upsert batch never holds the same (source, station, property, bucket) twice
+    merged: Dict[RollupKey, HourlyObservationRollup] = {}
+    for group in groups:
+        for name in properties:
+            count = group[f'count_{name}']
+            if not count:
+                continue
+            key = (source, station_key(group['latitude'], group['longitude']), name, group['hour'])
+            row = merged.get(key)
+            if row is None:
+                merged[key] = HourlyObservationRollup(
+                    source=source,
+                    station=key[1],
+                    observed_property=name,
+                    bucket=group['hour'],
+                    latitude=group['latitude'],
+                    longitude=group['longitude'],
+                    count=count,
+                    min_value=group[f'min_{name}'],
+                    max_value=group[f'max_{name}'],
+                    avg_value=group[f'avg_{name}'],
+                    sum_value=group[f'sum_{name}'],
+                )
+                continue
+            row.count += count
+            row.min_value = min(row.min_value, group[f'min_{name}'])
+            row.max_value = max(row.max_value, group[f'max_{name}'])
+            row.sum_value += group[f'sum_{name}']
+            row.avg_value = row.sum_value / row.count
+    return merged.values()
+
+
+def _sensor_rows(start: datetime) -> Iterable[HourlyObservationRollup]:
+    groups = Observation.objects.filter(result_time__gte=start).annotate(
+        hour=TruncHour('result_time', tzinfo=dt_timezone.utc)
+    ).values('sensor__sensor_id', 'observed_property', 'hour').annotate(
+        count=Count('result_value'),
+        min_value=Min('result_value'),
+        max_value=Max('result_value'),
+        avg_value=Avg('result_value'),
+        sum_value=Sum('result_value'),
+        lat=Max('latitude'),
+        lon=Max('longitude'),
+    ).order_by()
+    
+    for group in groups:
+        yield HourlyObservationRollup(
+            source='sensor',
+            station=group['sensor__sensor_id'],
+            observed_property=group['observed_property'],
+            bucket=group['hour'],
+            latitude=group['lat'],
+            longitude=group['lon'],
+            count=group['count'],
+            min_value=group['min_value'],
+            max_value=group['max_value'],
+            avg_value=group['avg_value'],
+            sum_value=group['sum_value'],
+        )
+
+
+def _device_rows(start: datetime) -> Iterable[HourlyObservationRollup]:
+    """Device payloads are free-form JSON, so numeric keys are aggregated here"""
+    stats: Dict[RollupKey, list] = {}
+    locations = {}
+    
+    readings = DeviceData.objects.filter(timestamp__gte=start).values_list(
+        'device__device_id', 'device__latitude', 'device__longitude', 'timestamp', 'data'
+    )
+    for device_id, latitude, longitude, timestamp, data in readings.iterator(chunk_size=5000):
+        if not isinstance(data, dict):
+            continue
+        locations[device_id] = (latitude, longitude)
+        hour = _hour(timestamp)
+        for name, value in data.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            key = ('device', device_id, name, hour)
+            entry = stats.get(key)
+            if entry is None:
+                stats[key] = [1, value, value, value]
+            else:
+                entry[0] += 1
+                entry[1] = min(entry[1], value)
+                entry[2] = max(entry[2], value)
+                entry[3] += value
+    
+    for (source, device_id, name, hour), (count, low, high, total) in stats.items():
+        latitude, longitude = locations[device_id]
+        yield HourlyObservationRollup(
+            source=source,
+            station=device_id,
+            observed_property=name,
+            bucket=hour,
+            latitude=latitude,
+            longitude=longitude,
+            count=count,
+            min_value=low,
+            max_value=high,
+            avg_value=total / count,
+            sum_value=total,
+        )
+
+
+def _upsert(model, rows: List, batch_size: int = 1000) -> int:
+    if rows:
+        model.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=UNIQUE_FIELDS,
+            update_fields=UPDATE_FIELDS,
+        )
+    return len(rows)
+
+
+def refresh_hourly(start: datetime) -> int:
+    """Recompute hourly rollups for every bucket from ``start`` (rounded down to the hour)"""
+    start = _hour(start)
+    rows = list(_sensor_rows(start))
+    for source, (model, properties) in WIDE_SOURCES.items():
+        rows.extend(_wide_rows(source, model, properties, start))
+    rows.extend(_device_rows(start))
+    return _upsert(HourlyObservationRollup, rows)
+
+
+def refresh_daily(start: datetime) -> int:
+    """Recompute daily rollups for every UTC day from ``start`` out of the hourly rollups"""
+    start = _hour(start).replace(hour=0)
+    groups = HourlyObservationRollup.objects.filter(bucket__gte=start).annotate(
+        day=TruncDay('bucket', tzinfo=dt_timezone.utc)
+    ).values('source', 'station', 'observed_property', 'day').annotate(
+        total_count=Sum('count'),
+        low=Min('min_value'),
+        high=Max('max_value'),
+        total=Sum('sum_value'),
+        lat=Max('latitude'),
+        lon=Max('longitude'),
+    ).order_by()
+    
+    rows = [
+        DailyObservationRollup(
+            source=group['source'],
+            station=group['station'],
+            observed_property=group['observed_property'],
+            bucket=group['day'],
+            latitude=group['lat'],
+            longitude=group['lon'],
+            count=group['total_count'],
+            min_value=group['low'],
+            max_value=group['high'],
+            avg_value=group['total'] / group['total_count'],
+            sum_value=group['total'],
+        )
+        for group in groups
+    ]
+    return _upsert(DailyObservationRollup, rows)
+
+
+def refresh_rollups(lookback_hours: float, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Refresh hourly rollups for the last ``lookback_hours`` and the days they fall in"""
+    start = (now or timezone.now()) - timedelta(hours=lookback_hours)
+    hourly = refresh_hourly(start)
+    daily = refresh_daily(start)
+    logger.info(f"Refreshed {hourly} hourly and {daily} daily observation rollups")
+    return {'hourly': hourly, 'daily': daily}
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from core.ngsi_ld_mapping import Address, Call, Column, EntityId, EntityMapping, GeoPoint, Iso, MappedNGSILDSerializer, Property
 from .models import (
     Observation,
     WeatherObservation,
@@ -47,179 +48,74 @@ class TrafficObservationSerializer(serializers.ModelSerializer):
 
 # ==================== NGSI-LD SERIALIZERS ====================
 
-class WeatherObservationNGSILDSerializer(serializers.ModelSerializer):
+def _station_name(label):
+    def name(location_name, latitude, longitude):
+        return location_name or f"{label} ({latitude}, {longitude})"
+    return name
+
+
+def aqi_category(aqi):
+    """Get AQI category based on value"""
+    if aqi is None:
+        return "unknown"
+    if aqi <= 50:
+        return "good"
+    elif aqi <= 100:
+        return "moderate"
+    elif aqi <= 150:
+        return "unhealthyForSensitiveGroups"
+    elif aqi <= 200:
+        return "unhealthy"
+    elif aqi <= 300:
+        return "veryUnhealthy"
+    else:
+        return "hazardous"
+
+
+class WeatherObservationNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Weather Observed"""
     
-    def to_representation(self, instance):
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.observation_id or f"urn:ngsi-ld:WeatherObserved:{instance.id}",
-            "type": "WeatherObserved",
-            "name": {
-                "type": "Property",
-                "value": instance.location_name or f"Weather Station ({instance.latitude}, {instance.longitude})"
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "addressLocality": instance.location_name or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "temperature": {
-                "type": "Property",
-                "value": instance.temperature,
-                "unitCode": "CEL",
-                "observedAt": instance.observed_at.isoformat() if instance.observed_at else None
-            },
-            "relativeHumidity": {
-                "type": "Property",
-                "value": instance.humidity,
-                "unitCode": "P1"
-            },
-            "atmosphericPressure": {
-                "type": "Property",
-                "value": instance.pressure,
-                "unitCode": "HPA"
-            },
-            "windSpeed": {
-                "type": "Property",
-                "value": instance.wind_speed,
-                "unitCode": "MTS"
-            },
-            "windDirection": {
-                "type": "Property",
-                "value": instance.wind_direction,
-                "unitCode": "DD"
-            },
-            "precipitation": {
-                "type": "Property",
-                "value": instance.precipitation,
-                "unitCode": "MMT"
-            },
-            "weatherType": {
-                "type": "Property",
-                "value": instance.weather_description or ""
-            },
-            "dateObserved": {
-                "type": "Property",
-                "value": instance.observed_at.isoformat() if instance.observed_at else None
-            },
-            "source": {
-                "type": "Property",
-                "value": instance.source or "manual"
-            }
-        }
+    mapping = EntityMapping("WeatherObserved", {
+        "name": Property(Call(_station_name("Weather Station"), "location_name", "latitude", "longitude")),
+        "location": GeoPoint(),
+        "address": Address(street=None, locality=Column("location_name", "")),
+        "temperature": Property("temperature", unit="CEL", observed_at="observed_at"),
+        "relativeHumidity": Property("humidity", unit="P1"),
+        "atmosphericPressure": Property("pressure", unit="HPA"),
+        "windSpeed": Property("wind_speed", unit="MTS"),
+        "windDirection": Property("wind_direction", unit="DD"),
+        "precipitation": Property("precipitation", unit="MMT"),
+        "weatherType": Property(Column("weather_description", "")),
+        "dateObserved": Property(Iso("observed_at")),
+        "source": Property(Column("source", "manual")),
+    }, id=EntityId("observation_id"))
     
     class Meta:
         model = WeatherObservation
         fields = "__all__"
 
 
-class AirQualityObservationNGSILDSerializer(serializers.ModelSerializer):
+class AirQualityObservationNGSILDSerializer(MappedNGSILDSerializer, serializers.ModelSerializer):
     """NGSI-LD compliant serializer for Air Quality Observed"""
     
-    def get_aqi_category(self, aqi):
-        """Get AQI category based on value"""
-        if aqi is None:
-            return "unknown"
-        if aqi <= 50:
-            return "good"
-        elif aqi <= 100:
-            return "moderate"
-        elif aqi <= 150:
-            return "unhealthyForSensitiveGroups"
-        elif aqi <= 200:
-            return "unhealthy"
-        elif aqi <= 300:
-            return "veryUnhealthy"
-        else:
-            return "hazardous"
+    mapping = EntityMapping("AirQualityObserved", {
+        "name": Property(Call(_station_name("Air Quality Station"), "location_name", "latitude", "longitude")),
+        "location": GeoPoint(),
+        "address": Address(street=None, locality=Column("location_name", "")),
+        "airQualityIndex": Property("aqi", observed_at="observed_at"),
+        "airQualityLevel": Property(Call(aqi_category, "aqi")),
+        "pm25": Property("pm25", unit="GQ"),
+        "pm10": Property("pm10", unit="GQ"),
+        "no2": Property("no2", unit="GQ"),
+        "o3": Property("o3", unit="GQ"),
+        "co": Property("co", unit="GQ"),
+        "so2": Property("so2", unit="GQ"),
+        "dateObserved": Property(Iso("observed_at")),
+        "source": Property(Column("source", "manual")),
+    }, id=EntityId("observation_id"))
     
-    def to_representation(self, instance):
-        return {
-            "@context": [
-                "https://uri.etsi.org/ngsi-ld/v1/ngsi-ld-core-context.jsonld",
-                "https://smartdatamodels.org/context.jsonld"
-            ],
-            "id": instance.observation_id or f"urn:ngsi-ld:AirQualityObserved:{instance.id}",
-            "type": "AirQualityObserved",
-            "name": {
-                "type": "Property",
-                "value": instance.location_name or f"Air Quality Station ({instance.latitude}, {instance.longitude})"
-            },
-            "location": {
-                "type": "GeoProperty",
-                "value": {
-                    "type": "Point",
-                    "coordinates": [instance.longitude, instance.latitude]
-                }
-            },
-            "address": {
-                "type": "Property",
-                "value": {
-                    "addressLocality": instance.location_name or "",
-                    "addressCountry": "VN"
-                }
-            },
-            "airQualityIndex": {
-                "type": "Property",
-                "value": instance.aqi,
-                "observedAt": instance.observed_at.isoformat() if instance.observed_at else None
-            },
-            "airQualityLevel": {
-                "type": "Property",
-                "value": self.get_aqi_category(instance.aqi)
-            },
-            "pm25": {
-                "type": "Property",
-                "value": instance.pm25,
-                "unitCode": "GQ"
-            },
-            "pm10": {
-                "type": "Property",
-                "value": instance.pm10,
-                "unitCode": "GQ"
-            },
-            "no2": {
-                "type": "Property",
-                "value": instance.no2,
-                "unitCode": "GQ"
-            },
-            "o3": {
-                "type": "Property",
-                "value": instance.o3,
-                "unitCode": "GQ"
-            },
-            "co": {
-                "type": "Property",
-                "value": instance.co,
-                "unitCode": "GQ"
-            },
-            "so2": {
-                "type": "Property",
-                "value": instance.so2,
-                "unitCode": "GQ"
-            },
-            "dateObserved": {
-                "type": "Property",
-                "value": instance.observed_at.isoformat() if instance.observed_at else None
-            },
-            "source": {
-                "type": "Property",
-                "value": instance.source or "manual"
-            }
-        }
+    def get_aqi_category(self, aqi):
+        return aqi_category(aqi)
     
     class Meta:
         model = AirQualityObservation
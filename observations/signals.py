@@ -0,0 +1,18 @@
+"""
+Signal handlers for the observations app
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from accounts.models import DeviceData
+from .current_state import update_current_state
+from .models import Observation, WeatherObservation, AirQualityObservation, TrafficObservation
+
+
+@receiver(post_save, sender=Observation)
+@receiver(post_save, sender=WeatherObservation)
+@receiver(post_save, sender=AirQualityObservation)
+@receiver(post_save, sender=TrafficObservation)
+@receiver(post_save, sender=DeviceData)
+def update_latest(sender, instance, **kwargs):
+    """Keep the current state in step with single-row saves (bulk writes update it directly)"""
+    update_current_state([instance])
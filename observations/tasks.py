@@ -0,0 +1,43 @@
+"""
+Celery tasks for observation storage maintenance
+"""
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from .partitions import PARTITIONED_MODELS, ensure_partitions, is_partitioned, prune, retention_cutoff
+from .rollups import refresh_rollups
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_observation_rollups(lookback_hours: float = None):
+    """Re-aggregate recent raw observations into the hourly/daily rollups"""
+    if lookback_hours is None:
+        lookback_hours = getattr(settings, 'OBSERVATION_ROLLUP_LOOKBACK_HOURS', 3)
+    return refresh_rollups(lookback_hours)
+
+
+@shared_task
+def maintain_observation_partitions():
+    """Create upcoming monthly partitions and drop raw data past retention"""
+    months_ahead = getattr(settings, 'OBSERVATION_PARTITIONS_AHEAD', 3)
+    cutoff = retention_cutoff(getattr(settings, 'OBSERVATION_RETENTION_MONTHS', 0))
+    summary = {'created': [], 'pruned': []}
+    
+    for label in PARTITIONED_MODELS:
+        table = apps.get_model(label)._meta.db_table
+        try:
+            if is_partitioned(table):
+                summary['created'].extend(ensure_partitions(label, months_ahead))
+            if cutoff:
+                summary['pruned'].extend(prune(label, cutoff))
+        except Exception as e:
+            logger.error(f"Partition maintenance failed for {table}: {e}")
+    
+    logger.info(
+        f"Partition maintenance: {len(summary['created'])} created, "
+        f"{len(summary['pruned'])} pruned"
+    )
+    return summary
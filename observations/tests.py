@@ -0,0 +1,155 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .aggregation import _subtract, aggregate
+from .current_state import update_current_state
+from .models import CurrentState, WeatherObservation, HourlyObservationRollup
+from .rollups import refresh_hourly
+from .writers import ObservationWriter
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class RollupTests(TestCase):
+    """Hourly rollups of location-keyed observation tables"""
+    
+    def test_nearby_coordinates_merge_into_one_station(self):
+        # Both points round to station "21.0000,105.8000"
+        for index, (latitude, temperature) in enumerate([(21.00001, 20.0), (21.00002, 21.0)]):
+            WeatherObservation.objects.create(
+                observation_id=f'near-{index}',
+                latitude=latitude,
+                longitude=105.8,
+                temperature=temperature,
+                observed_at=utc(2026, 10, 17, 10, 15 + index),
+            )
+        
+        refresh_hourly(utc(2026, 10, 17, 10))
+        
+        rollup = HourlyObservationRollup.objects.get(source='weather', observed_property='temperature')
+        self.assertEqual(rollup.station, '21.0000,105.8000')
+        self.assertEqual(rollup.count, 2)
+        self.assertEqual((rollup.min_value, rollup.max_value), (20.0, 21.0))
+        self.assertAlmostEqual(rollup.avg_value, 20.5)
+        self.assertAlmostEqual(rollup.sum_value, 41.0)
+
+
+class AggregationTests(TestCase):
+    """Buckets answered from rollups where they cover the range, raw rows elsewhere"""
+    
+    def setUp(self):
+        readings = [((9, 30), 18.0), ((10, 15), 20.0), ((10, 45), 22.0), ((11, 20), 30.0), ((11, 40), 26.0)]
+        for (hour, minute), temperature in readings:
+            WeatherObservation.objects.create(
+                observation_id=f'agg-{hour}-{minute}',
+                latitude=21.0,
+                longitude=105.8,
+                temperature=temperature,
+                observed_at=utc(2026, 10, 17, hour, minute),
+            )
+        # Hours 10 and 11 are rolled up; 11 is the latest (possibly partial) bucket
+        refresh_hourly(utc(2026, 10, 17, 10))
+        # Only the rollup still knows hour 10
+        WeatherObservation.objects.filter(observed_at__hour=10).delete()
+    
+    def temperature(self, bucket, start, end):
+        result = aggregate('weather', 'temperature', bucket, ['count', 'min', 'max', 'avg'], start, end)
+        self.assertEqual(len(result['series']), 1)
+        return result['series'][0]
+    
+    def test_subtract_splits_ranges(self):
+        inside, outside = _subtract([(0, 10), (12, 14)], (3, 6))
+        self.assertEqual(inside, [(3, 6)])
+        self.assertEqual(outside, [(0, 3), (6, 10), (12, 14)])
+        
+        inside, outside = _subtract([(0, 10)], (5, 5))
+        self.assertEqual((inside, outside), ([], [(0, 10)]))
+    
+    def test_coverage_split_between_rollups_and_raw(self):
+        series = self.temperature('1h', utc(2026, 10, 17, 9), utc(2026, 10, 17, 12))
+        
+        self.assertEqual(series['station'], '21.0000,105.8000')
+        self.assertEqual(series['time'], [
+            utc(2026, 10, 17, 9).isoformat(), utc(2026, 10, 17, 10).isoformat(), utc(2026, 10, 17, 11).isoformat(),
+        ])
+        # 9h: raw (before the first rollup), 10h: rollup, 11h: raw (latest rollup bucket)
+        self.assertEqual(series['count'], [1, 2, 2])
+        self.assertEqual(series['min'], [18.0, 20.0, 26.0])
+        self.assertEqual(series['max'], [18.0, 22.0, 30.0])
+    
+    def test_bucket_folds_rollup_and_raw_partials(self):
+        series = self.temperature('2h', utc(2026, 10, 17, 10), utc(2026, 10, 17, 12))
+        
+        self.assertEqual(series['time'], [utc(2026, 10, 17, 10).isoformat()])
+        self.assertEqual(series['count'], [4])
+        self.assertEqual((series['min'], series['max']), ([20.0], [30.0]))
+        self.assertEqual(series['avg'], [24.5])
+
+
+class CurrentStateTests(TestCase):
+    """Latest value per station"""
+    
+    def observation(self, minute, **values):
+        return WeatherObservation(
+            observation_id=f'state-{minute}',
+            latitude=21.0,
+            longitude=105.8,
+            observed_at=utc(2026, 10, 17, 10, minute),
+            **values
+        )
+    
+    def test_older_batch_does_not_overwrite_newer_state(self):
+        update_current_state([self.observation(30, temperature=25.0, humidity=60.0)])
+        update_current_state([self.observation(10, temperature=20.0, pressure=1000.0)])
+        
+        state = CurrentState.objects.get(source='weather')
+        self.assertEqual(state.observed_at, utc(2026, 10, 17, 10, 30))
+        self.assertEqual(state.values['temperature']['value'], 25.0)
+        self.assertEqual(state.values['humidity']['value'], 60.0)
+        # A property only the older batch carried is still kept
+        self.assertEqual(state.values['pressure']['value'], 1000.0)
+    
+    def test_latest_rejects_invalid_radius(self):
+        client = APIClient()
+        response = client.get('/api/v1/weather/latest/', {'lat': 21, 'lon': 105.8, 'radius': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/api/v1/air-quality/latest/', {'lat': 21, 'lon': 105.8, 'radius': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ObservationWriterTests(TestCase):
+    """Bulk observation inserts keyed on (observation_id, time)"""
+    
+    def add(self, writer, hour, temperature=25.0):
+        writer.add(
+            observation_id='writer-1',
+            latitude=21.0,
+            longitude=105.8,
+            temperature=temperature,
+            observed_at=utc(2026, 10, 17, hour),
+        )
+    
+    def test_existing_observation_is_skipped(self):
+        with ObservationWriter(WeatherObservation) as writer:
+            self.add(writer, 10)
+        with ObservationWriter(WeatherObservation) as writer:
+            self.add(writer, 10, temperature=30.0)
+        
+        self.assertEqual(
+            list(WeatherObservation.objects.values_list('temperature', flat=True)), [25.0]
+        )
+    
+    def test_same_id_at_another_time_is_a_new_row(self):
+        with ObservationWriter(WeatherObservation) as writer:
+            self.add(writer, 10)
+            self.add(writer, 10, temperature=30.0)
+            self.add(writer, 11, temperature=26.0)
+        
+        self.assertEqual(writer.sent, 2)
+        self.assertEqual(
+            sorted(WeatherObservation.objects.values_list('temperature', flat=True)), [25.0, 26.0]
+        )
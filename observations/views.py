@@ -3,6 +3,10 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
 from datetime import timedelta
+from core.mixins import get_nearby_params
+from core.streaming import ngsi_ld_response
+from .aggregation import AggregateMixin
+from .current_state import latest_state
 from .models import (
     Observation,
     WeatherObservation,
@@ -19,11 +23,12 @@ from .serializers import (
 )
 
 
-class ObservationViewSet(viewsets.ModelViewSet):
+class ObservationViewSet(AggregateMixin, viewsets.ModelViewSet):
     """ViewSet for Observations"""
     
     queryset = Observation.objects.all()
     serializer_class = ObservationSerializer
+    aggregate_source = 'sensor'
     
     def get_queryset(self):
         """Filter observations"""
@@ -50,11 +55,12 @@ class ObservationViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class WeatherObservationViewSet(viewsets.ModelViewSet):
+class WeatherObservationViewSet(AggregateMixin, viewsets.ModelViewSet):
     """ViewSet for Weather Observations"""
     
     queryset = WeatherObservation.objects.all()
     serializer_class = WeatherObservationSerializer
+    aggregate_source = 'weather'
     
     def get_queryset(self):
         """Filter weather observations"""
@@ -74,24 +80,16 @@ class WeatherObservationViewSet(viewsets.ModelViewSet):
         lat = request.query_params.get('lat', None)
         lon = request.query_params.get('lon', None)
         
-        queryset = WeatherObservation.objects.all()
-        
+        # Read the current-state row instead of sorting the history table;
+        # with lat/lon, the latest station within radius km, nearest first on ties
         if lat and lon:
-            # Find nearest location
-            lat = float(lat)
-            lon = float(lon)
-            radius = 0.5  # ~50km
-            
-            queryset = queryset.filter(
-                latitude__range=(lat - radius, lat + radius),
-                longitude__range=(lon - radius, lon + radius)
-            )
-        
-        observation = queryset.order_by('-observed_at').first()
-        
-        if observation:
-            serializer = self.get_serializer(observation)
-            return Response(serializer.data)
+            lat, lon, radius, _ = get_nearby_params(request, default_radius=50)
+            state = latest_state('weather', lat, lon, radius)
+        else:
+            state = latest_state('weather')
+        
+        if state:
+            return Response(state.snapshot)
         else:
             return Response({'message': 'No data found'}, status=404)
     
@@ -99,8 +97,7 @@ class WeatherObservationViewSet(viewsets.ModelViewSet):
     def ngsi_ld(self, request):
         """Get weather observations in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = WeatherObservationNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, WeatherObservationNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -110,11 +107,12 @@ class WeatherObservationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class AirQualityObservationViewSet(viewsets.ModelViewSet):
+class AirQualityObservationViewSet(AggregateMixin, viewsets.ModelViewSet):
     """ViewSet for Air Quality Observations"""
     
     queryset = AirQualityObservation.objects.all()
     serializer_class = AirQualityObservationSerializer
+    aggregate_source = 'air_quality'
     
     def get_queryset(self):
         """Filter air quality observations"""
@@ -134,24 +132,16 @@ class AirQualityObservationViewSet(viewsets.ModelViewSet):
         lat = request.query_params.get('lat', None)
         lon = request.query_params.get('lon', None)
         
-        queryset = AirQualityObservation.objects.all()
-        
+        # Read the current-state row instead of sorting the history table;
+        # with lat/lon, the latest station within radius km, nearest first on ties
         if lat and lon:
-            # Find nearest location
-            lat = float(lat)
-            lon = float(lon)
-            radius = 0.5
-            
-            queryset = queryset.filter(
-                latitude__range=(lat - radius, lat + radius),
-                longitude__range=(lon - radius, lon + radius)
-            )
-        
-        observation = queryset.order_by('-observed_at').first()
-        
-        if observation:
-            serializer = self.get_serializer(observation)
-            return Response(serializer.data)
+            lat, lon, radius, _ = get_nearby_params(request, default_radius=50)
+            state = latest_state('air_quality', lat, lon, radius)
+        else:
+            state = latest_state('air_quality')
+        
+        if state:
+            return Response(state.snapshot)
         else:
             return Response({'message': 'No data found'}, status=404)
     
@@ -159,8 +149,7 @@ class AirQualityObservationViewSet(viewsets.ModelViewSet):
     def ngsi_ld(self, request):
         """Get air quality observations in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = AirQualityObservationNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, AirQualityObservationNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -170,11 +159,12 @@ class AirQualityObservationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class TrafficObservationViewSet(viewsets.ModelViewSet):
+class TrafficObservationViewSet(AggregateMixin, viewsets.ModelViewSet):
     """ViewSet for Traffic Observations"""
     
     queryset = TrafficObservation.objects.all()
     serializer_class = TrafficObservationSerializer
+    aggregate_source = 'traffic'
     
     def get_queryset(self):
         """Filter traffic observations"""
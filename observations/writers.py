@@ -0,0 +1,136 @@
+"""
+Buffered bulk writer for observation ingestion
+"""
+import threading
+import time
+from typing import List, Optional
+from django.conf import settings
+from django.db import models
+from .current_state import SOURCES, update_current_state
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def conflict_fields(model: type) -> List[str]:
+    """Fields of the model's unique (observation_id, time) constraint, if it has one"""
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and 'observation_id' in constraint.fields:
+            return list(constraint.fields)
+    return []
+
+
+class ObservationWriter:
+    """
+    Buffer observation rows and insert them with ``bulk_create``.
+    
+    Rows are flushed when ``batch_size`` rows are buffered, when a row is
+    added ``flush_interval`` seconds or more after the last flush, or when
+    the writer is closed. The interval is only checked on ``add``: there is
+    no background flush, as rows belong to the caller's transaction, so a
+    partly filled buffer waits for the next row or ``close()``.
+    
+    Rows whose (``observation_id``, time) already exists are skipped, so
+    re-running a sync or backfill is safe. The conflict target is the
+    model's unique constraint on those fields (see ``conflict_fields``),
+    the one partitioned tables can enforce. Duplicates inside one flush
+    are dropped before sending, keeping the first row. ``sent`` counts rows
+    sent to the database, including ones the database skipped.
+    
+    Usage::
+        
+        with ObservationWriter(WeatherObservation) as writer:
+            for row in rows:
+                writer.add(observation_id=..., latitude=..., ...)
+    """
+    
+    def __init__(
+        self,
+        model: type,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        ignore_conflicts: bool = True
+    ):
+        self.model = model
+        self.batch_size = batch_size or getattr(settings, 'OBSERVATION_WRITER_BATCH_SIZE', 1000)
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else getattr(settings, 'OBSERVATION_WRITER_FLUSH_INTERVAL', 5.0)
+        )
+        self.ignore_conflicts = ignore_conflicts
+        self.conflict_fields = conflict_fields(model) if ignore_conflicts else []
+        self.sent = 0
+        self.flushes = 0
+        self._buffer: List[models.Model] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def add(self, **fields) -> models.Model:
+        """Buffer one row given as model field values"""
+        return self.add_instance(self.model(**fields))
+    
+    def add_instance(self, instance: models.Model) -> models.Model:
+        """Buffer an unsaved model instance"""
+        with self._lock:
+            self._buffer.append(instance)
+            due = (
+                len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+        return instance
+    
+    def flush(self) -> int:
+        """Write all buffered rows; returns the number of rows sent"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+        
+        if not rows:
+            return 0
+        
+        if self.conflict_fields:
+            # ON CONFLICT (observation_id, time) DO UPDATE SET observation_id =
+            # EXCLUDED.observation_id: a no-op update, i.e. the row is skipped.
+            # PostgreSQL rejects a batch that hits the same row twice.
+            seen = set()
+            unique_rows = []
+            for row in rows:
+                key = tuple(getattr(row, field) for field in self.conflict_fields)
+                if key not in seen:
+                    seen.add(key)
+                    unique_rows.append(row)
+            self.model.objects.bulk_create(
+                unique_rows,
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=self.conflict_fields,
+                update_fields=self.conflict_fields[:1]
+            )
+            rows = unique_rows
+        else:
+            self.model.objects.bulk_create(
+                rows,
+                batch_size=self.batch_size,
+                ignore_conflicts=self.ignore_conflicts
+            )
+        if self.model in SOURCES:
+            update_current_state(rows)
+        self.sent += len(rows)
+        self.flushes += 1
+        logger.debug(f"Flushed {len(rows)} {self.model.__name__} rows")
+        return len(rows)
+    
+    def close(self) -> int:
+        """Flush remaining rows"""
+        return self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        # Do not write a partial buffer when the caller failed
+        if exc_type is None:
+            self.close()
+        return False
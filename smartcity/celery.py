@@ -22,4 +22,24 @@ app.conf.beat_schedule = {
         'task': 'integrations.tasks.sync_air_quality_data',
         'schedule': crontab(minute='*/30'),  # Every 30 minutes
     },
+    'refresh-observation-rollups': {
+        'task': 'observations.tasks.refresh_observation_rollups',
+        'schedule': crontab(minute=5),  # Every hour
+    },
+    'maintain-observation-partitions': {
+        'task': 'observations.tasks.maintain_observation_partitions',
+        'schedule': crontab(hour=2, minute=30),  # Daily
+    },
+    'dispatch-orion-outbox': {
+        'task': 'entities.tasks.dispatch_orion_outbox',
+        'schedule': crontab(minute='*'),  # Every minute (commits also trigger a run)
+    },
+    'ensure-orion-subscriptions': {
+        'task': 'entities.tasks.ensure_orion_subscriptions',
+        'schedule': crontab(minute=20),  # Every hour (re-creates lost subscriptions)
+    },
+    'reconcile-orion-entities': {
+        'task': 'entities.tasks.reconcile_orion_entities',
+        'schedule': crontab(hour=3, minute=40),  # Daily (repairs broker drift)
+    },
 }
@@ -175,10 +175,123 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Observation ingestion: rows per bulk INSERT and max seconds a row stays buffered
+OBSERVATION_WRITER_BATCH_SIZE = int(os.getenv('OBSERVATION_WRITER_BATCH_SIZE', '1000'))
+OBSERVATION_WRITER_FLUSH_INTERVAL = float(os.getenv('OBSERVATION_WRITER_FLUSH_INTERVAL', '5'))
+
+# Max concurrent provider requests per sync task (also capped by each
+# provider's rate_limit_per_minute)
+SYNC_MAX_WORKERS = int(os.getenv('SYNC_MAX_WORKERS', '8'))
+
+# Max readings accepted by one batch upload to /auth/devices/readings/batch/
+DEVICE_READINGS_BATCH_MAX_ITEMS = int(os.getenv('DEVICE_READINGS_BATCH_MAX_ITEMS', '5000'))
+
+# Device API key authentication: in-process key cache and how often
+# coalesced last_used timestamps are written back (seconds)
+DEVICE_API_KEY_CACHE_SIZE = int(os.getenv('DEVICE_API_KEY_CACHE_SIZE', '10000'))
+DEVICE_API_KEY_CACHE_TTL = float(os.getenv('DEVICE_API_KEY_CACHE_TTL', '60'))
+DEVICE_API_KEY_LAST_USED_FLUSH_INTERVAL = float(os.getenv('DEVICE_API_KEY_LAST_USED_FLUSH_INTERVAL', '60'))
+
+# Geohash length stored for located models (9 chars ~ 5 m cells)
+GEOHASH_PRECISION = int(os.getenv('GEOHASH_PRECISION', '9'))
+
+# Geo query backend: "geohash" (default) or "postgis" (run
+# `manage.py setup_postgis` first to create the geo_point columns)
+GEO_BACKEND = os.getenv('GEO_BACKEND', 'geohash')
+
+# Seconds a resolved external provider API key stays cached per (provider, user)
+API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', '60'))
+
+# External API usage: seconds between usage_count flushes, and the Redis
+# instance holding the per-provider quota buckets (empty = per-process buckets)
+API_USAGE_FLUSH_INTERVAL = float(os.getenv('API_USAGE_FLUSH_INTERVAL', '30'))
+API_USAGE_REDIS_URL = os.getenv('API_USAGE_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+
+# Observation storage: months of raw rows kept (0 = keep forever), monthly
+# partitions created ahead of time, and hours re-aggregated by each rollup run
+OBSERVATION_RETENTION_MONTHS = int(os.getenv('OBSERVATION_RETENTION_MONTHS', '0'))
+OBSERVATION_PARTITIONS_AHEAD = int(os.getenv('OBSERVATION_PARTITIONS_AHEAD', '3'))
+OBSERVATION_ROLLUP_LOOKBACK_HOURS = float(os.getenv('OBSERVATION_ROLLUP_LOOKBACK_HOURS', '3'))
+
+# Django cache: shared Redis when CACHE_REDIS_URL (default REDIS_URL) is set,
+# otherwise per-process memory
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', os.getenv('REDIS_URL', ''))
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a dashboard summary/statistics result stays cached per city
+# (writes invalidate it earlier)
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', '30'))
+
+# Public GET response cache: seconds an entry is fresh (0 = disabled), extra
+# seconds it may be served stale while one request refreshes it, and how
+# long that refresh lock is held at most
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '60'))
+RESPONSE_CACHE_STALE_TTL = int(os.getenv('RESPONSE_CACHE_STALE_TTL', '30'))
+RESPONSE_CACHE_LOCK_TIMEOUT = int(os.getenv('RESPONSE_CACHE_LOCK_TIMEOUT', '10'))
+
+# Rows fetched per database round trip by streaming NGSI-LD exports (?stream=json|ndjson)
+NGSI_LD_STREAM_CHUNK_SIZE = int(os.getenv('NGSI_LD_STREAM_CHUNK_SIZE', '2000'))
+
 # Orion-LD Configuration
 ORION_LD_URL = os.getenv('ORION_LD_URL', 'http://localhost:1026')
 ORION_LD_API_VERSION = os.getenv('ORION_LD_API_VERSION', 'v2')
 
+# Orion-LD HTTP connection pool (per process, keep-alive)
+ORION_LD_POOL_CONNECTIONS = int(os.getenv('ORION_LD_POOL_CONNECTIONS', '10'))
+ORION_LD_POOL_MAXSIZE = int(os.getenv('ORION_LD_POOL_MAXSIZE', '20'))
+ORION_LD_MAX_RETRIES = int(os.getenv('ORION_LD_MAX_RETRIES', '3'))
+ORION_LD_RETRY_BACKOFF = float(os.getenv('ORION_LD_RETRY_BACKOFF', '0.5'))
+
+# (connect, read) timeouts in seconds per operation
+ORION_LD_CONNECT_TIMEOUT = float(os.getenv('ORION_LD_CONNECT_TIMEOUT', '3.05'))
+ORION_LD_TIMEOUTS = {
+    'default': (ORION_LD_CONNECT_TIMEOUT, float(os.getenv('ORION_LD_READ_TIMEOUT', '10'))),
+    'query': (ORION_LD_CONNECT_TIMEOUT, float(os.getenv('ORION_LD_QUERY_READ_TIMEOUT', '30'))),
+    'temporal': (ORION_LD_CONNECT_TIMEOUT, float(os.getenv('ORION_LD_TEMPORAL_READ_TIMEOUT', '60'))),
+    'batch': (ORION_LD_CONNECT_TIMEOUT, float(os.getenv('ORION_LD_BATCH_READ_TIMEOUT', '60'))),
+}
+
+# Max entities per entityOperations request
+ORION_LD_BATCH_SIZE = int(os.getenv('ORION_LD_BATCH_SIZE', '100'))
+
+# Page size used by the streaming iter_entities/iter_temporal_entities queries
+ORION_LD_PAGE_SIZE = int(os.getenv('ORION_LD_PAGE_SIZE', '500'))
+
+# Max in-flight requests per event loop for AsyncOrionLDClient (e.g. the
+# concurrent batch upsert chunks of the air quality sync)
+ORION_LD_ASYNC_MAX_CONCURRENCY = int(os.getenv('ORION_LD_ASYNC_MAX_CONCURRENCY', '50'))
+
+# Orion-LD outbox dispatcher (entities/outbox.py)
+ORION_OUTBOX_BATCH_SIZE = int(os.getenv('ORION_OUTBOX_BATCH_SIZE', '500'))  # rows claimed per batch
+ORION_OUTBOX_MAX_ATTEMPTS = int(os.getenv('ORION_OUTBOX_MAX_ATTEMPTS', '10'))  # then marked "failed"
+ORION_OUTBOX_RETRY_BACKOFF = float(os.getenv('ORION_OUTBOX_RETRY_BACKOFF', '5'))  # seconds, doubled per attempt
+ORION_OUTBOX_MAX_BACKOFF = float(os.getenv('ORION_OUTBOX_MAX_BACKOFF', '3600'))
+ORION_OUTBOX_LEASE = int(os.getenv('ORION_OUTBOX_LEASE', '120'))  # seconds a claimed batch is held by one worker
+
+# Orion-LD subscriptions notifying /api/v1/orion/notify/ (entities/subscriptions.py)
+ORION_NOTIFICATION_URL = os.getenv('ORION_NOTIFICATION_URL', '')  # the endpoint as reachable from Orion-LD
+ORION_NOTIFICATION_TOKEN = os.getenv('ORION_NOTIFICATION_TOKEN', '')  # required on notifications; empty disables the endpoint
+ORION_SUBSCRIPTION_THROTTLING = int(os.getenv('ORION_SUBSCRIPTION_THROTTLING', '1'))  # min seconds between notifications
+# entity type -> watchedAttributes (and optional throttling/context) of its subscription
+ORION_SUBSCRIPTIONS = {
+    'WeatherObserved': {'watchedAttributes': ['dateObserved', 'temperature']},
+    'AirQualityObserved': {'watchedAttributes': ['dateObserved', 'airQualityIndex']},
+    'OffStreetParking': {'watchedAttributes': ['availableSpotNumber', 'status']},
+    'Streetlight': {'watchedAttributes': ['status', 'illuminanceLevel']},
+}
+
 # External APIs
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
 OPENAQ_API_KEY = os.getenv('OPENAQ_API_KEY', '')
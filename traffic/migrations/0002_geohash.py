@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:55
+
+import core.geo
+from django.db import migrations
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name in ('BusStation', 'TrafficFlow', 'TrafficIncident', 'ParkingSpot'):
+        core.geo.backfill_geohash(apps.get_model('traffic', model_name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('traffic', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='busstation',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='parkingspot',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='trafficflow',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='trafficincident',
+            name='geohash',
+            field=core.geo.GeohashField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from core.geo import GeohashField
 from django.utils import timezone
 
 
@@ -8,6 +9,7 @@ class BusStation(models.Model):
     description = models.TextField(blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     station_type = models.CharField(max_length=50, choices=[("bus_stop", "Bus Stop"), ("bus_terminal", "Bus Terminal"), ("metro_station", "Metro Station")], default="bus_stop")
@@ -33,6 +35,7 @@ class TrafficFlow(models.Model):
     road_segment = models.CharField(max_length=255, blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     congestion_level = models.CharField(max_length=20, choices=[("free", "Free"), ("light", "Light"), ("moderate", "Moderate"), ("heavy", "Heavy"), ("severe", "Severe")], default="free")
     average_speed = models.FloatField(help_text="km/h")
@@ -57,6 +60,7 @@ class TrafficIncident(models.Model):
     description = models.TextField(blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     status = models.CharField(max_length=20, choices=[("reported", "Reported"), ("verified", "Verified"), ("in_progress", "In Progress"), ("resolved", "Resolved")], default="reported")
@@ -79,6 +83,7 @@ class ParkingSpot(models.Model):
     description = models.TextField(blank=True, null=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    geohash = GeohashField()
     address = models.CharField(max_length=500, blank=True, null=True)
     city = models.CharField(max_length=100, default="Ho Chi Minh")
     parking_type = models.CharField(max_length=50, choices=[("on_street", "On Street"), ("off_street", "Off Street"), ("parking_lot", "Parking Lot"), ("parking_garage", "Parking Garage")], default="on_street")
@@ -0,0 +1,32 @@
+"""
+Signal handlers for the traffic app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from core.response_cache import invalidate_responses
+from core.summary import invalidate_summaries
+from entities.tracking import track_mapping
+from .models import BusStation, TrafficFlow, TrafficIncident, ParkingSpot
+from .serializers import (
+    BusStationNGSILDSerializer,
+    TrafficFlowNGSILDSerializer,
+    TrafficIncidentNGSILDSerializer,
+    ParkingSpotNGSILDSerializer,
+)
+
+
+@receiver([post_save, post_delete], sender=BusStation)
+@receiver([post_save, post_delete], sender=TrafficFlow)
+@receiver([post_save, post_delete], sender=TrafficIncident)
+@receiver([post_save, post_delete], sender=ParkingSpot)
+def invalidate_caches(sender, **kwargs):
+    """Cached traffic summaries, statistics and responses are stale after any write"""
+    invalidate_summaries('traffic')
+    invalidate_responses(sender)
+
+
+# Saved rows are mirrored as entities and their changed attributes queued for Orion-LD
+track_mapping(BusStation, BusStationNGSILDSerializer.mapping)
+track_mapping(TrafficFlow, TrafficFlowNGSILDSerializer.mapping)
+track_mapping(TrafficIncident, TrafficIncidentNGSILDSerializer.mapping)
+track_mapping(ParkingSpot, ParkingSpotNGSILDSerializer.mapping)
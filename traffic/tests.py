@@ -1,3 +1,254 @@
-from django.test import TestCase
+import json
+import math
+import threading
+import time
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from core.geo import covering_cells, geohash_bounds, geohash_encode, haversine_km, nearby
+from core.geoquery import GeoQueryError, parse_geo_query
+from core.postgis import postgis_enabled
+from core.response_cache import response_key
+from .models import ParkingSpot
+from .views import ParkingSpotViewSet
+
+
+@override_settings(RESPONSE_CACHE_TTL=60, RESPONSE_CACHE_STALE_TTL=30, RESPONSE_CACHE_LOCK_TIMEOUT=10)
+class ResponseCacheTests(TestCase):
+    """Public GET responses served from the shared cache"""
+    
+    url = '/api/v1/traffic/parking/'
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.spot = ParkingSpot.objects.create(
+            entity_id='urn:ngsi-ld:OffStreetParking:cache-1',
+            name='Bai xe 1',
+            latitude=21.0285,
+            longitude=105.8542,
+            total_spaces=50,
+            available_spaces=20,
+        )
+    
+    def test_miss_then_hit(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_conditional_request_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+    
+    def test_write_invalidates(self):
+        self.client.get(self.url)
+        
+        self.spot.available_spaces = 3
+        self.spot.save()
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['available_spaces'], 3)
+    
+    def test_expired_entry_is_served_stale_while_locked(self):
+        key = response_key(ParkingSpot, self.client.get(self.url).wsgi_request)
+        entry = cache.get(key)
+        entry['fresh_until'] = time.time() - 1
+        cache.set(key, entry)
+        cache.add(f'{key}:lock', 1)
+        
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.content, entry['content'])
+    
+    def test_waiter_stops_when_lock_is_released_without_entry(self):
+        url = f'{self.url}999999/'
+        key = response_key(ParkingSpot, self.client.get(url).wsgi_request)
+        cache.add(f'{key}:lock', 1)
+        # The holder finishes with a 404, which is never stored
+        release = threading.Timer(0.2, cache.delete, [f'{key}:lock'])
+        release.start()
+        
+        started = time.monotonic()
+        response = self.client.get(url)
+        release.join()
+        
+        self.assertEqual(response.status_code, 404)
+        self.assertLess(time.monotonic() - started, 2)
+    
+    def test_stream_requests_bypass_the_cache(self):
+        request = self.client.get(f'{self.url}ngsi-ld/', {'stream': 'ndjson'}).wsgi_request
+        
+        self.assertFalse(ParkingSpotViewSet(action_map={'get': 'ngsi_ld'}).is_cacheable(request))
+
+
+CENTER = (21.0285, 105.8542)
+
+
+def spot(name, latitude, longitude):
+    return ParkingSpot.objects.create(
+        entity_id=f'urn:ngsi-ld:OffStreetParking:{name}', name=name, latitude=latitude, longitude=longitude
+    )
+
+
+class GeohashIndexTests(TestCase):
+    """Geohash prefix index and distance-ordered nearby queries"""
+    
+    def setUp(self):
+        cache.clear()
+        lat, lon = CENTER
+        # Roughly 0.6, 1.3, 1.7 and 5.6 km from the centre
+        self.spots = [
+            spot('far', lat + 0.05, lon),
+            spot('second', lat + 0.012, lon),
+            spot('nearest', lat - 0.005, lon),
+            spot('third', lat, lon - 0.016),
+        ]
+    
+    def test_geohash_encode_and_bounds(self):
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        min_lat, max_lat, min_lon, max_lon = geohash_bounds(geohash_encode(*CENTER, 7))
+        self.assertTrue(min_lat <= CENTER[0] < max_lat and min_lon <= CENTER[1] < max_lon)
+    
+    def test_geohash_is_stored_on_save(self):
+        stored = ParkingSpot.objects.get(name='nearest')
+        self.assertEqual(stored.geohash, geohash_encode(stored.latitude, stored.longitude, len(stored.geohash)))
+        
+        stored.latitude += 1
+        stored.save()
+        stored.refresh_from_db()
+        self.assertEqual(stored.geohash, geohash_encode(stored.latitude, stored.longitude, len(stored.geohash)))
+    
+    def test_covering_cells_contain_the_whole_circle(self):
+        radius = 2.0
+        cells = covering_cells(*CENTER, radius)
+        self.assertTrue(cells)
+        for bearing in range(0, 360, 15):
+            # Points just inside the circle, all around it
+            dlat = radius * 0.99 / 111.32 * math.cos(math.radians(bearing))
+            dlon = radius * 0.99 / (111.32 * math.cos(math.radians(CENTER[0]))) * math.sin(math.radians(bearing))
+            point = geohash_encode(CENTER[0] + dlat, CENTER[1] + dlon, 12)
+            self.assertTrue(any(point.startswith(cell) for cell in cells), bearing)
+        
+        # Too large for a prefix filter to help
+        self.assertIsNone(covering_cells(*CENTER, 5000))
+    
+    def test_nearby_is_ordered_by_distance_within_the_radius(self):
+        rows = list(nearby(ParkingSpot.objects.all(), *CENTER, 2))
+        
+        self.assertEqual([row.name for row in rows], ['nearest', 'second', 'third'])
+        for row in rows:
+            self.assertAlmostEqual(row.distance, haversine_km(*CENTER, row.latitude, row.longitude), places=6)
+        self.assertEqual([row.name for row in nearby(ParkingSpot.objects.all(), *CENTER, 2, limit=2)],
+                         ['nearest', 'second'])
+        self.assertEqual(len(nearby(ParkingSpot.objects.all(), *CENTER, 10)), 4)
+    
+    def test_nearby_endpoint(self):
+        response = APIClient().get('/api/v1/traffic/parking/nearby/',
+                                   {'lat': CENTER[0], 'lon': CENTER[1], 'radius': 2, 'limit': 2})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], ['nearest', 'second'])
+        self.assertLess(response.json()[0]['distance'], response.json()[1]['distance'])
+        
+        for params in ({'lat': CENTER[0]}, {'lat': 'x', 'lon': 1}, {'lat': 91, 'lon': 1}, {'lat': 1, 'lon': 1, 'radius': 0}):
+            self.assertEqual(APIClient().get('/api/v1/traffic/parking/nearby/', params).status_code, 400)
+
+
+class GeoQueryTests(TestCase):
+    """NGSI-LD georel / geometry / coordinates filters on list endpoints"""
+    
+    url = '/api/v1/traffic/parking/'
+    
+    def setUp(self):
+        cache.clear()
+        lat, lon = CENTER
+        spot('centre', lat, lon)
+        spot('north', lat + 0.012, lon)
+        spot('far', lat + 0.05, lon)
+    
+    def query(self, georel, geometry, coordinates):
+        return APIClient().get(self.url, {'georel': georel, 'geometry': geometry, 'coordinates': coordinates})
+    
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item['name'] for item in response.json()['results'])
+    
+    def square(self, lat, lon, half):
+        ring = [[lon - half, lat - half], [lon + half, lat - half], [lon + half, lat + half],
+                [lon - half, lat + half], [lon - half, lat - half]]
+        return json.dumps([ring])
+    
+    def test_parse(self):
+        query = parse_geo_query('near;maxDistance==2000;minDistance==10', 'Point', '[105.85, 21.03]')
+        self.assertEqual((query['relation'], query['max_distance'], query['min_distance']), ('near', 2000, 10))
+        self.assertEqual(query['geometry'], {'type': 'Point', 'coordinates': [105.85, 21.03]})
+        
+        invalid = [
+            ('near;maxDistance==100', 'Point', None),
+            ('touches', 'Point', '[105.85, 21.03]'),
+            ('near;maxDistance==abc', 'Point', '[105.85, 21.03]'),
+            ('near;radius==100', 'Point', '[105.85, 21.03]'),
+            ('near', 'Point', '[105.85, 21.03]'),
+            ('near;maxDistance==100', 'Polygon', self.square(21.03, 105.85, 0.01)),
+            ('near;maxDistance==100', 'Point', '[105.85]'),
+            ('near;maxDistance==100', 'Point', 'not json'),
+            ('disjoint', 'Point', '[105.85, 21.03]'),
+            ('within', 'LineString', '[[105.85, 21.03], [105.86, 21.04]]'),
+            ('within', 'Polygon', '[[[105.85, 21.03], [105.86, 21.04]]]'),
+        ]
+        for georel, geometry, coordinates in invalid:
+            with self.assertRaises(GeoQueryError, msg=(georel, geometry, coordinates)):
+                parse_geo_query(georel, geometry, coordinates)
+    
+    def test_near(self):
+        point = json.dumps([CENTER[1], CENTER[0]])
+        self.assertEqual(self.names(self.query('near;maxDistance==2000', 'Point', point)), ['centre', 'north'])
+        self.assertEqual(self.names(self.query('near;minDistance==2000', 'Point', point)), ['far'])
+        self.assertEqual(
+            self.names(self.query('near;minDistance==500;maxDistance==2000', 'Point', point)), ['north']
+        )
+    
+    def test_within_and_disjoint(self):
+        area = self.square(CENTER[0] + 0.006, CENTER[1], 0.009)
+        self.assertEqual(self.names(self.query('within', 'Polygon', area)), ['centre', 'north'])
+        self.assertEqual(self.names(self.query('disjoint', 'Polygon', area)), ['far'])
+        
+        multi = json.dumps([json.loads(self.square(CENTER[0], CENTER[1], 0.001)),
+                            json.loads(self.square(CENTER[0] + 0.05, CENTER[1], 0.001))])
+        self.assertEqual(self.names(self.query('within', 'MultiPolygon', multi)), ['centre', 'far'])
+    
+    def test_equals_point(self):
+        point = json.dumps([CENTER[1], CENTER[0]])
+        self.assertEqual(self.names(self.query('equals', 'Point', point)), ['centre'])
+    
+    def test_invalid_query_is_rejected(self):
+        for georel, geometry, coordinates in [
+            ('near', 'Point', '[105.85, 21.03]'),
+            ('within', 'Polygon', 'not json'),
+            ('overlaps', 'Polygon', self.square(21.03, 105.85, 0.01)),
+        ]:
+            response = self.query(georel, geometry, coordinates)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.json())
+        
+        self.assertEqual(APIClient().get(self.url, {'georel': 'within'}).status_code, 400)
+    
+    def test_geohash_backend_is_used_without_postgis(self):
+        self.assertFalse(postgis_enabled(ParkingSpot))
+        with override_settings(GEO_BACKEND='postgis'):
+            # PostGIS needs PostgreSQL; other databases keep the geohash index
+            self.assertEqual(postgis_enabled(ParkingSpot), connection.vendor == 'postgresql')
@@ -2,7 +2,11 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.db.models import Count, Avg
+from django.db.models import Count, Avg, Sum
+from core.mixins import AtomicWriteMixin, NearbyMixin
+from core.response_cache import CachedResponseMixin
+from core.streaming import ngsi_ld_response
+from core.summary import cached_summary, count_if, filter_city
 from .models import BusStation, TrafficFlow, TrafficIncident, ParkingSpot
 from .serializers import (
     BusStationSerializer, TrafficFlowSerializer, TrafficIncidentSerializer, ParkingSpotSerializer,
@@ -10,12 +14,12 @@ from .serializers import (
 )
 
 
-class BusStationViewSet(viewsets.ModelViewSet):
+class BusStationViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = BusStation.objects.all()
     serializer_class = BusStationSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -28,17 +32,18 @@ class BusStationViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = BusStation.objects.count()
-        by_status = list(BusStation.objects.values("status").annotate(count=Count("id")))
-        by_city = list(BusStation.objects.values("city").annotate(count=Count("id")))
-        return Response({"total": total, "by_status": by_status, "by_city": by_city})
+        def compute():
+            by_status = list(BusStation.objects.values("status").annotate(count=Count("id")).order_by())
+            by_city = list(BusStation.objects.values("city").annotate(count=Count("id")).order_by())
+            total = sum(item["count"] for item in by_status)
+            return {"total": total, "by_status": by_status, "by_city": by_city}
+        return Response(cached_summary("traffic", "bus_stations", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         """Get all bus stations in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = BusStationNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, BusStationNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -48,12 +53,12 @@ class BusStationViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class TrafficFlowViewSet(viewsets.ModelViewSet):
+class TrafficFlowViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = TrafficFlow.objects.all()
     serializer_class = TrafficFlowSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -66,17 +71,17 @@ class TrafficFlowViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = TrafficFlow.objects.count()
-        avg_speed = TrafficFlow.objects.aggregate(avg=Avg("average_speed"))["avg"] or 0
-        by_congestion = list(TrafficFlow.objects.values("congestion_level").annotate(count=Count("id")))
-        return Response({"total": total, "average_speed": round(avg_speed, 2), "by_congestion_level": by_congestion})
+        def compute():
+            totals = TrafficFlow.objects.aggregate(total=Count("id"), avg_speed=Avg("average_speed"))
+            by_congestion = list(TrafficFlow.objects.values("congestion_level").annotate(count=Count("id")).order_by())
+            return {"total": totals["total"], "average_speed": round(totals["avg_speed"] or 0, 2), "by_congestion_level": by_congestion}
+        return Response(cached_summary("traffic", "traffic_flows", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         """Get all traffic flows in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = TrafficFlowNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, TrafficFlowNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -86,12 +91,12 @@ class TrafficFlowViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class TrafficIncidentViewSet(viewsets.ModelViewSet):
+class TrafficIncidentViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = TrafficIncident.objects.all()
     serializer_class = TrafficIncidentSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -104,18 +109,25 @@ class TrafficIncidentViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total = TrafficIncident.objects.count()
-        active = TrafficIncident.objects.exclude(status="resolved").count()
-        by_type = list(TrafficIncident.objects.values("incident_type").annotate(count=Count("id")))
-        by_severity = list(TrafficIncident.objects.values("severity").annotate(count=Count("id")))
-        return Response({"total": total, "active_incidents": active, "by_type": by_type, "by_severity": by_severity})
+        def compute():
+            groups = list(TrafficIncident.objects.values("incident_type", "severity", "status").annotate(count=Count("id")).order_by())
+            by_type, by_severity = {}, {}
+            for group in groups:
+                by_type[group["incident_type"]] = by_type.get(group["incident_type"], 0) + group["count"]
+                by_severity[group["severity"]] = by_severity.get(group["severity"], 0) + group["count"]
+            return {
+                "total": sum(group["count"] for group in groups),
+                "active_incidents": sum(group["count"] for group in groups if group["status"] != "resolved"),
+                "by_type": [{"incident_type": key, "count": count} for key, count in by_type.items()],
+                "by_severity": [{"severity": key, "count": count} for key, count in by_severity.items()],
+            }
+        return Response(cached_summary("traffic", "incidents", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         """Get all incidents in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = TrafficIncidentNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, TrafficIncidentNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -125,12 +137,12 @@ class TrafficIncidentViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, content_type='application/ld+json')
 
 
-class ParkingSpotViewSet(viewsets.ModelViewSet):
+class ParkingSpotViewSet(CachedResponseMixin, AtomicWriteMixin, NearbyMixin, viewsets.ModelViewSet):
     queryset = ParkingSpot.objects.all()
     serializer_class = ParkingSpotSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'statistics', 'ngsi_ld', 'ngsi_ld_detail']:
+        if self.action in ['list', 'retrieve', 'statistics', 'nearby', 'ngsi_ld', 'ngsi_ld_detail']:
             return [AllowAny()]
         return [IsAuthenticated()]
     
@@ -143,18 +155,21 @@ class ParkingSpotViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def statistics(self, request):
-        total_lots = ParkingSpot.objects.count()
-        total_spaces = sum(ParkingSpot.objects.values_list("total_spots", flat=True))
-        available_spaces = sum(ParkingSpot.objects.values_list("available_spots", flat=True))
-        occupancy = round(((total_spaces - available_spaces) / total_spaces * 100), 2) if total_spaces > 0 else 0
-        return Response({"total_lots": total_lots, "total_spaces": total_spaces, "available_spaces": available_spaces, "occupancy_rate": occupancy})
+        def compute():
+            totals = ParkingSpot.objects.aggregate(
+                total_lots=Count("id"), total_spaces=Sum("total_spaces"), available_spaces=Sum("available_spaces")
+            )
+            total_spaces = totals["total_spaces"] or 0
+            available_spaces = totals["available_spaces"] or 0
+            occupancy = round(((total_spaces - available_spaces) / total_spaces * 100), 2) if total_spaces > 0 else 0
+            return {"total_lots": totals["total_lots"], "total_spaces": total_spaces, "available_spaces": available_spaces, "occupancy_rate": occupancy}
+        return Response(cached_summary("traffic", "parking", None, compute))
     
     @action(detail=False, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld(self, request):
         """Get all parking spots in NGSI-LD format"""
         queryset = self.get_queryset()
-        serializer = ParkingSpotNGSILDSerializer(queryset, many=True)
-        return Response(serializer.data, content_type='application/ld+json')
+        return ngsi_ld_response(request, queryset, ParkingSpotNGSILDSerializer)
     
     @action(detail=True, methods=['get'], url_path='ngsi-ld')
     def ngsi_ld_detail(self, request, pk=None):
@@ -169,21 +184,24 @@ class TrafficSummaryViewSet(viewsets.ViewSet):
     
     def list(self, request):
         city = request.query_params.get("city")
-        stations_qs = BusStation.objects.all()
-        flows_qs = TrafficFlow.objects.all()
-        incidents_qs = TrafficIncident.objects.all()
-        parking_qs = ParkingSpot.objects.all()
-        if city:
-            stations_qs = stations_qs.filter(city__icontains=city)
-            flows_qs = flows_qs.filter(city__icontains=city)
-            incidents_qs = incidents_qs.filter(city__icontains=city)
-            parking_qs = parking_qs.filter(city__icontains=city)
-        avg_speed = flows_qs.aggregate(avg=Avg("average_speed"))["avg"] or 0
-        total_parking = sum(parking_qs.values_list("total_spaces", flat=True))
-        available_parking = sum(parking_qs.values_list("available_spaces", flat=True))
-        return Response({
-            "bus_stations": {"total": stations_qs.count(), "active": stations_qs.filter(status="active").count()},
-            "traffic_flow": {"average_speed": round(avg_speed, 2)},
-            "incidents": {"total": incidents_qs.count(), "active": incidents_qs.exclude(status="resolved").count()},
-            "parking": {"total_lots": parking_qs.count(), "total_spaces": total_parking, "available_spaces": available_parking}
-        })
+        return Response(cached_summary("traffic", "summary", city, lambda: self.summarize(city)))
+    
+    @staticmethod
+    def summarize(city):
+        """One conditional aggregate query per model"""
+        stations = filter_city(BusStation.objects.all(), city).aggregate(
+            total=Count("id"), active=count_if(status="active")
+        )
+        flows = filter_city(TrafficFlow.objects.all(), city).aggregate(average_speed=Avg("average_speed"))
+        incidents = filter_city(TrafficIncident.objects.all(), city).aggregate(
+            total=Count("id"), resolved=count_if(status="resolved")
+        )
+        parking = filter_city(ParkingSpot.objects.all(), city).aggregate(
+            total_lots=Count("id"), total_spaces=Sum("total_spaces"), available_spaces=Sum("available_spaces")
+        )
+        return {
+            "bus_stations": {"total": stations["total"], "active": stations["active"]},
+            "traffic_flow": {"average_speed": round(flows["average_speed"] or 0, 2)},
+            "incidents": {"total": incidents["total"], "active": incidents["total"] - incidents["resolved"]},
+            "parking": {"total_lots": parking["total_lots"], "total_spaces": parking["total_spaces"] or 0, "available_spaces": parking["available_spaces"] or 0}
+        }